@@ -0,0 +1,59 @@
+'''
+Records per second bulk_decode indexes and decodes from a capture file of
+RFC 5246 TLSPlaintext records, by the size of the pool.
+
+    python -m benchmarks.bulk_throughput [records]
+
+Every record carries a Handshake with the ClientHello of codec_throughput.
+The pools go up to the number of CPUs.
+'''
+import os
+import sys
+import tempfile
+import time
+
+import fast_parser
+from bulk_decode import BulkDecoder
+from python_codec import Codec
+from benchmarks.codec_throughput import client_hello
+from benchmarks.specs import rfc5246
+
+
+def fragment_length(record):
+    return len(record.fragment)
+
+
+def write_capture(path, records):
+    codec = Codec(fast_parser.parse(rfc5246()))
+    t = codec.python_type
+    with open(path, 'wb') as f:
+        for i in range(records):
+            f.write(codec.encode('TLSPlaintext', t('TLSPlaintext')(
+                t('ContentType').handshake, t('ProtocolVersion')(3, 3), 0,
+                client_hello(codec, i))))
+
+
+def main(records=100000):
+    records = int(records)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'capture.bin')
+        write_capture(path, records)
+        print('{} records, {} bytes'.format(records, os.path.getsize(path)))
+
+        start = time.perf_counter()
+        len(BulkDecoder(path, rfc5246(), 'TLSPlaintext'))
+        print('index            {:>10.0f} records/s'.format(
+            records / (time.perf_counter() - start)))
+
+        for processes in range(1, (os.cpu_count() or 1) + 1):
+            decoder = BulkDecoder(path, rfc5246(), 'TLSPlaintext', processes)
+            decoder.offsets
+            start = time.perf_counter()
+            for _ in decoder.map(fragment_length):
+                pass
+            print('decode {:>2} procs {:>10.0f} records/s'.format(
+                processes, records / (time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
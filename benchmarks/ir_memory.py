@@ -0,0 +1,48 @@
+'''
+Memory held by the parse tree and by its IR, and the time rust_compiler
+takes to compile either of them.
+
+    python -m benchmarks.ir_memory [groups]
+'''
+import gc
+import sys
+import timeit
+import tracemalloc
+
+import fast_parser
+from ir import lower
+from rust_compiler import compile_packet_representation
+from benchmarks.specs import many_definitions
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def best(function, repeat=5):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(groups=1000):
+    code = many_definitions(groups)
+    tree, tree_size = traced(lambda: fast_parser.parse(code))
+    ir, ir_size = traced(lambda: lower(tree))
+
+    print('{} chars, {} definitions'.format(len(code), len(ir)))
+    print('{:<8} {:>10} {:>10}'.format('', 'memory', 'compile'))
+    print('{:<8} {:>8.1f}MB {:>8.1f}ms'.format(
+        'tree', tree_size / 2**20,
+        best(lambda: compile_packet_representation(tree)) * 1000))
+    print('{:<8} {:>8.1f}MB {:>8.1f}ms'.format(
+        'ir', ir_size / 2**20,
+        best(lambda: compile_packet_representation(ir)) * 1000))
+    print('lower    {:>19.1f}ms'.format(best(lambda: lower(tree)) * 1000))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
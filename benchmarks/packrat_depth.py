@@ -0,0 +1,43 @@
+'''
+Parse time of nested cryptographic structures by nesting depth.
+
+    python -m benchmarks.packrat_depth [max_depth]
+'''
+import sys
+import timeit
+
+import pypeg2
+
+import fast_parser
+import packrat
+from grammar import Definitions
+from benchmarks.specs import nested_structures
+
+parsers = [
+    ('pypeg2', pypeg2.parse),
+    ('packrat', packrat.parse),
+    ('fast', fast_parser.parse),
+]
+
+
+def measure(parse, code, repeat=3):
+    number = 5
+    return min(timeit.repeat(lambda: parse(code, Definitions),
+                             number=number, repeat=repeat)) / number
+
+
+def main(max_depth=64):
+    print('{:>6} {:>8}'.format('depth', 'chars') +
+          ''.join(' {:>10}'.format(name) for name, _ in parsers))
+
+    depth = 1
+    while depth <= max_depth:
+        code = nested_structures(depth)
+        times = [measure(parse, code) for _, parse in parsers]
+        print('{:>6} {:>8}'.format(depth, len(code)) +
+              ''.join(' {:>9.2f}ms'.format(t * 1000) for t in times))
+        depth *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,63 @@
+'''
+Per source latency of a session.Compiler against parsing and compiling
+every source on its own, for a stream of RFC 5246 variants that differ in
+one definition each, like the inputs of a build daemon.
+
+    python -m benchmarks.session_latency [sources] [parser]
+'''
+import statistics
+import sys
+import time
+
+import parsers
+from grammar import Definitions
+from rust_compiler import compile_packet_representation
+from session import Compiler
+from benchmarks.specs import rfc5246
+
+
+def sources(count):
+    code = rfc5246()
+    for i in range(count):
+        yield code.replace('opaque verify_data<12..255>;',
+                           'opaque verify_data<12..{}>;'.format(256 + i))
+
+
+def per_call(sources, backend):
+    parse = parsers.backends[backend]
+    for source in sources:
+        yield compile_packet_representation(parse(source, Definitions))
+
+
+def session(sources, backend):
+    for result in Compiler(backend).compile_many(sources):
+        yield result.code
+
+
+def latencies(results):
+    times = []
+    start = time.perf_counter()
+    for _ in results:
+        end = time.perf_counter()
+        times.append(end - start)
+        start = end
+    return times
+
+
+def main(count=50, backend='pypeg2'):
+    count = int(count)
+    expected = list(per_call(sources(2), backend))
+    assert list(session(sources(2), backend)) == expected
+
+    print('{} sources of {} chars, {} parser'.format(
+        count, len(next(sources(1))), backend))
+    print('{:<10} {:>10} {:>10} {:>10}'.format('', 'first', 'median', 'mean'))
+    for name, run in [('per call', per_call), ('session', session)]:
+        times = latencies(run(sources(count), backend))
+        print('{:<10} {:>8.2f}ms {:>8.2f}ms {:>8.2f}ms'.format(
+            name, times[0] * 1000, statistics.median(times) * 1000,
+            statistics.mean(times) * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,122 @@
+'''
+Synthetic presentation language inputs for the benchmarks.
+'''
+import os
+
+
+def nested_structures(depth):
+    '''A named stream-ciphered structure containing depth levels of
+    digitally-signed structures, like the example of RFC 5246 section 4.7.'''
+    code = 'uint8 field{0}<0..255>;'.format(depth)
+    for i in reversed(range(depth)):
+        code = 'digitally-signed struct {{\n{0}  uint8 field{1};\n{0}  {2}\n{0}}};'.format(
+            '  ' * (i + 1), i, code)
+    return 'stream-ciphered struct {{\n  {}\n}} UserType;\n'.format(code)
+
+
+def many_definitions(count):
+    '''count groups of enums, structures with vectors and variants, and
+    cryptographic structures, named apart by their index.'''
+    group = '''enum {{
+  hello_request(0), client_hello(1), server_hello(2), finished(20), (255)
+}} HandshakeType{0};
+
+opaque SessionID{0}<0..32>;
+
+struct {{
+  uint8 major;
+  uint8 minor;
+}} ProtocolVersion{0};
+
+struct {{
+  ProtocolVersion{0} client_version;
+  opaque random[32];
+  SessionID{0} session_id;
+  uint8 cipher_suites<2..2^16-2>;
+  opaque compression_methods<1..2^8-1>;
+}} ClientHello{0};
+
+struct {{
+  HandshakeType{0} msg_type;
+  uint24 length;
+  select (HandshakeType{0}) {{
+    case hello_request: HelloRequest;
+    case client_hello: ClientHello{0};
+    case server_hello: ServerHello;
+    case finished: Finished;
+  }} body;
+}} Handshake{0};
+
+stream-ciphered struct {{
+  opaque content<0..2^14>;
+  digitally-signed struct {{
+    uint8 signature<0..255>;
+  }};
+}} Record{0};
+'''
+    return ''.join(group.format(i) for i in range(count))
+
+
+def many_structs(count):
+    '''count flat structures of scalars and vectors, each referring to the
+    one before it.'''
+    struct = '''struct {{
+  uint8 tag;
+  uint16 length;
+  opaque body<0..2^16-1>;
+  uint32 values[16];
+  {1} previous;
+}} Struct{0};
+
+'''
+    return ''.join(struct.format(i, 'Struct{}'.format(i - 1) if i else 'uint8')
+                   for i in range(count))
+
+
+def wide_enum(count):
+    '''An enum of count members with explicit values.'''
+    members = ''.join('  member{0}({0}),\n'.format(i) for i in range(count))
+    return 'enum {{\n{}  ({})\n}} WideEnum;\n'.format(
+        members, max(count, 1) * 2 - 1)
+
+
+def many_variant_cases(count):
+    '''A structure selecting between count cases of an enum.'''
+    cases = ''.join('    case member{0}: Case{0};\n'.format(i)
+                    for i in range(count))
+    return wide_enum(count) + '''
+struct {{
+  WideEnum kind;
+  select (WideEnum) {{
+{}  }} body;
+}} Selected;
+'''.format(cases)
+
+
+def crypto_structures(count):
+    '''count structures, each nesting structures under the cryptographic
+    attributes that the grammar accepts.'''
+    struct = '''stream-ciphered struct {{
+  uint8 sequence{0};
+  digitally-signed struct {{
+    uint8 signature<0..255>;
+  }};
+  block-ciphered struct {{
+    opaque content<0..2^14>;
+  }};
+  aead-ciphered struct {{
+    opaque nonce[8];
+  }};
+}} Protected{0};
+
+'''
+    return ''.join(struct.format(i) for i in range(count))
+
+
+def rfc5246():
+    '''The definitions of RFC 5246, adapted to the grammar, see
+    rfc5246.spec.'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'rfc5246.spec')
+    with open(path) as f:
+        return f.read()
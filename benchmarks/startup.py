@@ -0,0 +1,78 @@
+'''
+Import and start-up time of the command line tools, from fresh
+interpreters with -X importtime.
+
+    python -m benchmarks.startup [runs]
+
+For every entry module, the import time is the median cumulative time
+python -X importtime reports for it, and the modules that took longest
+are listed from the last run. cli is the wall time of compile_specs on
+RFC 5246, from starting the interpreter to its exit.
+'''
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+entry_modules = ['compile_specs', 'session', 'build_server', 'rust_codec']
+
+
+def import_times(module):
+    '''The self and cumulative import time of every module imported by
+    import module in a fresh interpreter, in seconds, by module name.'''
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              'import {}'.format(module)],
+                             cwd=root, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, check=True)
+    times = {}
+    for line in process.stderr.decode().splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def import_time(module, runs=5):
+    return statistics.median(import_times(module)[module][1]
+                             for _ in range(runs))
+
+
+def cli_time(runs=5):
+    spec = os.path.join(root, 'benchmarks', 'rfc5246.spec')
+    command = [sys.executable, os.path.join(root, 'compile_specs.py'), '-q',
+               spec]
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=root, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure(runs=5):
+    '''The import time of compile_specs and the cli time, for the suite.'''
+    return {'import_s': import_time('compile_specs', runs),
+            'cli_s': cli_time(runs)}
+
+
+def main(runs=5):
+    runs = int(runs)
+    for module in entry_modules:
+        print('{:<16} {:>8.1f}ms'.format(module, import_time(module, runs) * 1000))
+    print('{:<16} {:>8.1f}ms'.format('cli', cli_time(runs) * 1000))
+
+    print('\nslowest imports of compile_specs, own time')
+    times = import_times('compile_specs')
+    for name, (own, cumulative) in sorted(times.items(),
+                                          key=lambda i: -i[1][0])[:10]:
+        print('  {:<28} {:>6.1f}ms {:>8.1f}ms'.format(name, own * 1000,
+                                                      cumulative * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
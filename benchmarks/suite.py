@@ -0,0 +1,171 @@
+'''
+Parse and compile times and peak memory of synthetic specifications and of
+RFC 5246, written as JSON that can be compared across commits.
+
+    python -m benchmarks.suite -o before.json
+    python -m benchmarks.suite -o after.json --compare before.json
+
+With --compare, every metric that grew by more than --threshold (10% by
+default) relative to the baseline is reported and the exit status is 1.
+--scale multiplies the sizes of the synthetic specifications. The startup
+case is the import time of compile_specs and the wall time of its command
+line, see benchmarks.startup.
+'''
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+import parsers
+from grammar import Definitions
+from rust_compiler import compile_packet_representation
+from benchmarks import specs
+
+# name, generator, size at scale 1
+cases = [
+    ('structs', specs.many_structs, 1000),
+    ('nesting', specs.nested_structures, 32),
+    ('wide_enum', specs.wide_enum, 1000),
+    ('variant_cases', specs.many_variant_cases, 500),
+    ('crypto', specs.crypto_structures, 200),
+    ('definitions', specs.many_definitions, 100),
+    ('rfc5246', None, None),
+]
+
+metrics = ['parse_s', 'compile_s', 'peak_bytes', 'import_s', 'cli_s']
+
+
+def generate(scale=1.0):
+    '''The (name, code) of every case.'''
+    for name, generator, size in cases:
+        if generator is None:
+            yield name, specs.rfc5246()
+        else:
+            yield name, generator(max(1, int(size * scale)))
+
+
+def best(function, repeat):
+    gc.collect()
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def peak(function):
+    '''The largest amount of memory allocated while function runs.'''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(code, parse, repeat=3):
+    ast = parse(code, Definitions)
+    return {
+        'chars': len(code),
+        'definitions': len(ast),
+        'parse_s': best(lambda: parse(code, Definitions), repeat),
+        'compile_s': best(lambda: compile_packet_representation(ast), repeat),
+        # parsing and compiling together, since the tree stays alive
+        'peak_bytes': peak(lambda: compile_packet_representation(
+            parse(code, Definitions))),
+    }
+
+
+def _revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(parser='pypeg2', scale=1.0, repeat=3, only=None, log=None):
+    results = {}
+    for name, code in generate(scale):
+        if only and name not in only:
+            continue
+        results[name] = measure(code, parsers.backends[parser], repeat)
+        if log is not None:
+            log('{:<14} {:>8} chars {:>9.1f}ms parse {:>9.1f}ms compile '
+                '{:>8.1f}MB'.format(name, results[name]['chars'],
+                                    results[name]['parse_s'] * 1000,
+                                    results[name]['compile_s'] * 1000,
+                                    results[name]['peak_bytes'] / 2**20))
+    if not only or 'startup' in only:
+        from benchmarks import startup
+        # does not depend on parser and scale
+        results['startup'] = startup.measure(max(repeat, 5))
+        if log is not None:
+            log('{:<14} {:>9.1f}ms import {:>11.1f}ms cli'.format(
+                'startup', results['startup']['import_s'] * 1000,
+                results['startup']['cli_s'] * 1000))
+    return {
+        'meta': {
+            'revision': _revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parser': parser,
+            'scale': scale,
+            'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'cases': results,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    '''Return (case, metric, old, new) for every metric of a case in both
+    results that grew by more than threshold.'''
+    regressions = []
+    for name, new in sorted(current['cases'].items()):
+        old = baseline['cases'].get(name)
+        if old is None or old.get('chars') != new.get('chars'):
+            continue
+        for metric in metrics:
+            if old.get(metric) and new.get(metric, 0) > old[metric] * (1 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-o', '--output', help='write the results to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative growth reported as a regression')
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--parser', choices=sorted(parsers.backends), default='pypeg2')
+    parser.add_argument('cases', nargs='*', help='run only these cases')
+    args = parser.parse_args(argv)
+
+    results = run(args.parser, args.scale, args.repeat, args.cases,
+                  log=lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for name, metric, old, new in regressions:
+            print('{}: {} {:.4g} -> {:.4g} (+{:.0%})'.format(
+                name, metric, old, new, new / old - 1), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
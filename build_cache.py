@@ -0,0 +1,184 @@
+'''
+A content-addressed on-disk cache of parsed definitions and their Rust code.
+
+Entries are keyed by a hash of the definition's text, the parser options
+and the versions of the grammar and of the compiler. A version is the hash
+of the source files it is built from, so editing grammar.py or
+rust_compiler.py changes every key: old entries are never returned again.
+They live in a directory named after the version and prune() deletes the
+directories of all other versions.
+
+    cache = Cache('.spec-cache')
+    key = cache.key(text, backend='fast')
+    entry = cache.get(key)
+    if entry is None:
+        ast = parsers.parse(text, backend='fast')
+        entry = cache.put(key, ast, compile_packet_representation(ast))
+
+The cache is bounded by max_size bytes. get() refreshes the modification
+time of an entry, evict() deletes the least recently used entries until the
+cache fits again; put() calls it once its own estimate of the size is
+exceeded.
+'''
+import collections
+import hashlib
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+
+import fast_parser
+import grammar
+import ir
+import packrat
+import parsers
+import rust_compiler
+
+Entry = collections.namedtuple('Entry', ['ast', 'code'])
+
+default_max_size = 256 * 2**20
+
+grammar_modules = [grammar, parsers, fast_parser, packrat]
+compiler_modules = [ir, rust_compiler]
+
+
+def _source_hash(modules):
+    h = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+_version = None
+
+def version():
+    '''The combined grammar and compiler version.'''
+    global _version
+    if _version is None:
+        versions = '{}:{}'.format(_source_hash(grammar_modules),
+                                  _source_hash(compiler_modules))
+        _version = hashlib.sha256(versions.encode()).hexdigest()[:16]
+    return _version
+
+
+class _Pickler(pickle.Pickler):
+    # Namespace members point back to their namespace with a weak reference
+    def reducer_override(self, obj):
+        if type(obj) is weakref.ReferenceType:
+            return weakref.ref, (obj(),)
+        return NotImplemented
+
+
+def dumps(entry):
+    # the code comes first, so it can be read without unpickling the tree
+    f = io.BytesIO()
+    pickle.dump(entry.code, f, pickle.HIGHEST_PROTOCOL)
+    _Pickler(f, pickle.HIGHEST_PROTOCOL).dump(entry.ast)
+    return f.getvalue()
+
+
+def load(f, load_ast=True):
+    code = pickle.load(f)
+    ast = pickle.load(f) if load_ast else None
+    return Entry(ast, code)
+
+
+class Cache(object):
+    def __init__(self, directory, max_size=default_max_size):
+        self.root = directory
+        self.directory = os.path.join(directory, version())
+        self.max_size = max_size
+        self._size = None
+
+    def key(self, text, **options):
+        h = hashlib.sha256()
+        h.update(version().encode())
+        h.update(repr(sorted(options.items())).encode())
+        h.update(b'\0')
+        h.update(text.encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, load_ast=True):
+        '''Return the Entry for key or None. Unpickling the tree takes about
+        as long as parsing it with fast_parser, without load_ast the
+        entry's ast is None.'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = load(f, load_ast)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def put(self, key, ast, code):
+        entry = Entry(ast, code)
+        data = dumps(entry)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, other processes may read path
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+        return entry
+
+    def _entries(self):
+        for directory, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_size=None):
+        '''Delete the least recently used entries until the cache is not
+        larger than max_size.'''
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def prune(self):
+        '''Delete the entries of all other grammar and compiler versions.'''
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.root, name)
+            if path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = 0
@@ -0,0 +1,285 @@
+'''
+A resident compile server, so editors and build tools do not pay for
+starting Python and importing pyPEG2 on every request.
+
+    python build_server.py [--port PORT | --socket PATH] [-j WORKERS]
+
+Clients send one JSON object per line and get one JSON object per line
+back, responses to compile requests in the order they finish:
+
+    {"id": 1, "op": "compile", "source": "opaque Datum[3];"}
+    {"id": 1, "code": "Datum: u8[3]"}
+
+    {"id": 2, "op": "compile", "source": "...", "emit": "codecs"}
+    {"id": 3, "op": "cancel", "target": 2}
+    {"id": 3, "cancelled": true}
+    {"id": 2, "error": {"message": "cancelled"}}
+
+    {"id": 4, "op": "stats"}
+    {"id": 4, "queued": 0, "running": 1, "completed": 17, ...,
+     "latency_ms": {"p50": 0.9, "p90": 2.1, "p99": 7.5}}
+
+"parser" selects the parser backend of a compile request, "emit" is
+types (the default), decoders or codecs like in compile_specs; decoders
+come without rust_codec.runtime. A source that does not parse is answered
+with its error message, line and offset.
+
+Parsing and compiling run in a process pool, every worker with its own
+session.Compiler, so the event loop only moves lines. At most one request
+per worker is handed to the pool, the others wait in the server, where a
+cancel removes them at once. A request already in a worker is answered
+as cancelled at once as well, but it finishes there and keeps the worker
+until then; its result is dropped. Ids are strings or numbers, unique
+among the requests of a connection in progress. The latency of a request
+is measured from its arrival to its response; the percentiles are over
+the last 1000.
+'''
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+
+import parsers
+import rust_codec
+from session import Compiler
+
+emits = ['types', 'decoders', 'codecs']
+
+_compilers = {}
+
+
+def compile_request(source, backend='fast', emit='types'):
+    '''Compile source in a worker process. Return the code and None, or None
+    and the error.'''
+    compiler = _compilers.get(backend)
+    if compiler is None:
+        compiler = _compilers[backend] = Compiler(backend)
+    try:
+        result = compiler.compile(source)
+    except SyntaxError as e:
+        return None, {'message': e.msg, 'lineno': e.lineno, 'offset': e.offset}
+    if emit == 'types':
+        return result.code, None
+    return rust_codec.compile_decoders(result.ir, encoders=emit == 'codecs'), None
+
+
+def _valid_id(value):
+    return value is None or isinstance(value, (str, int, float))
+
+
+def percentiles(values, points=(50, 90, 99)):
+    '''The nearest-rank percentiles of values, by name.'''
+    values = sorted(values)
+    result = collections.OrderedDict()
+    for point in points:
+        name = 'p{}'.format(point)
+        if not values:
+            result[name] = None
+            continue
+        rank = max(1, -(-point * len(values) // 100))
+        result[name] = values[rank - 1]
+    return result
+
+
+class BuildServer(object):
+    def __init__(self, workers=None, backend='fast', executor=None,
+                 history=1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.executor = executor
+        if executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.latencies = collections.deque(maxlen=history)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.connections = 0
+
+    def stats(self):
+        return collections.OrderedDict([
+            ('queued', self.queued),
+            ('running', self.running),
+            ('completed', self.completed),
+            ('failed', self.failed),
+            ('cancelled', self.cancelled),
+            ('connections', self.connections),
+            ('workers', self.workers),
+            ('latency_ms', percentiles([t * 1000 for t in self.latencies])),
+        ])
+
+    async def compile(self, source, backend=None, emit='types'):
+        '''Compile source in the pool, return the code and the error.'''
+        loop = asyncio.get_running_loop()
+        self.queued += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+
+        def release(future):
+            # a worker cannot be stopped, so the slot of a cancelled
+            # request is only free once its worker is done with it
+            if not future.cancelled():
+                future.exception()
+            self.running -= 1
+            self.slots.release()
+
+        try:
+            future = loop.run_in_executor(self.executor, compile_request, source,
+                                          backend or self.backend, emit)
+        except Exception:
+            self.running -= 1
+            self.slots.release()
+            raise
+        future.add_done_callback(release)
+        return await asyncio.shield(future)
+
+    async def _answer(self, request, send):
+        start = asyncio.get_running_loop().time()
+        response = {'id': request.get('id')}
+        source = request.get('source')
+        emit = request.get('emit', 'types')
+        backend = request.get('parser')
+        if not isinstance(source, str):
+            code, error = None, {'message': 'bad request: no source'}
+        elif emit not in emits:
+            code, error = None, {'message': 'unknown emit {!r}'.format(emit)}
+        elif backend is not None and backend not in parsers.backends:
+            code, error = None, {'message': 'unknown parser {!r}'.format(backend)}
+        else:
+            try:
+                code, error = await self.compile(source, backend, emit)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                response['error'] = {'message': 'cancelled'}
+                await send(response)
+                raise
+            except Exception as e:
+                code, error = None, {'message': 'internal error: {!r}'.format(e)}
+
+        if error is None:
+            response['code'] = code
+            self.completed += 1
+        else:
+            response['error'] = error
+            self.failed += 1
+        self.latencies.append(asyncio.get_running_loop().time() - start)
+        await send(response)
+
+    async def handle(self, reader, writer):
+        '''Serve one client connection.'''
+        self.connections += 1
+        lock = asyncio.Lock()
+        # the compile requests in progress, by id if they have one
+        pending = set()
+        tasks = {}
+
+        async def send(response):
+            async with lock:
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode())
+                    op = request.get('op', 'compile')
+                    key = request.get('id')
+                    for field in ['id', 'target']:
+                        if not _valid_id(request.get(field)):
+                            raise ValueError('{} is not a string or a number'.format(field))
+                    if op == 'compile' and key is not None and key in tasks:
+                        raise ValueError('id {!r} is in progress'.format(key))
+                except (ValueError, AttributeError) as e:
+                    await send({'id': None,
+                                'error': {'message': 'bad request: {}'.format(e)}})
+                    continue
+
+                if op == 'compile':
+                    task = asyncio.ensure_future(self._answer(request, send))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    if key is not None:
+                        tasks[key] = task
+                        task.add_done_callback(lambda t, key=key: tasks.pop(key))
+                elif op == 'cancel':
+                    task = tasks.get(request.get('target'))
+                    cancelled = task is not None and task.cancel()
+                    await send({'id': request.get('id'), 'cancelled': cancelled})
+                elif op == 'stats':
+                    response = collections.OrderedDict(id=request.get('id'))
+                    response.update(self.stats())
+                    await send(response)
+                else:
+                    await send({'id': request.get('id'),
+                                'error': {'message': 'unknown op {!r}'.format(op)}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in list(pending):
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        '''Listen on a Unix socket at path or on host and port, and return
+        the asyncio server.'''
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(server, host, port, path):
+    listener = await server.start(host, port, path)
+    address = path or '{}:{}'.format(*listener.sockets[0].getsockname()[:2])
+    sys.stderr.write('listening on {}\n'.format(address))
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7353)
+    parser.add_argument('--socket', metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('--parser', choices=sorted(parsers.backends),
+                        default='fast')
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = BuildServer(args.workers, args.parser)
+        try:
+            await serve(server, args.host, args.port, args.socket)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
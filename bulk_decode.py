@@ -0,0 +1,168 @@
+'''
+Decodes the records of a capture file in a pool of processes, each
+reading its share of the records from its own memory map of the file.
+
+    decoder = BulkDecoder('capture.bin', spec, 'TLSPlaintext')
+    for length in decoder.map(fragment_length):
+        ...
+    totals = decoder.reduce(count_types, collections.Counter)
+
+The records are framed like in record_stream. One pass over a map of
+the file in this process finds where every record starts, and the index
+of their offsets is cut into shards of consecutive records. The workers
+map the file too and decode the records of a shard with a
+python_compiler.CompiledCodec of spec, so only the offsets of the records
+are sent to them and only what function returns comes back.
+
+function is called in the workers with each decoded record, which like
+the values of python_codec refers to the map of the file and is only
+valid during the call. It and the results have to be picklable, so
+function is a function of a module. map() yields the results in the
+order of the records, or as the shards finish if ordered is false.
+reduce() folds the records of every shard into initial() and returns the
+result of every shard in order, for the caller to combine.
+'''
+import array
+import functools
+import mmap
+import multiprocessing
+import os
+import struct
+
+from python_codec import CodecError
+from python_compiler import CompiledCodec
+from record_stream import framing
+import parsers
+
+_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+def record_offsets(buf, framing, name='record'):
+    '''An array of the offset of every record in buf and of its end.'''
+    offsets = array.array('Q')
+    append = offsets.append
+    header = framing.header
+    width = framing.width
+    ceiling = framing.ceiling
+    prefix = header + width
+    size = len(buf)
+    pos = 0
+    if width in _formats:
+        unpack_from = struct.Struct('>{}x{}'.format(header, _formats[width])).unpack_from
+    else:
+        unpack_from = None
+    while pos < size:
+        append(pos)
+        if pos + prefix > size:
+            raise CodecError('truncated {}'.format(name))
+        if unpack_from is not None:
+            length, = unpack_from(buf, pos)
+        else:
+            length = framing.length(buf, pos)
+        if length > ceiling:
+            raise CodecError('invalid length {} of {}'.format(length, name))
+        pos += prefix + length
+    if pos > size:
+        raise CodecError('truncated {}'.format(name))
+    append(pos)
+    return offsets
+
+
+def _open(path, spec, name):
+    '''The map of the file and the codec decoding its records.'''
+    with open(path, 'rb') as f:
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    return view, CompiledCodec(parsers.parse(spec)).decode, name
+
+
+# the _open() of the file of a worker process, set by _start
+_worker = None
+
+
+def _start(path, spec, name):
+    global _worker
+    _worker = _open(path, spec, name)
+
+
+def _records(offsets, worker):
+    view, decode, name = worker or _worker
+    start = offsets[0]
+    for end in offsets[1:]:
+        yield decode(name, view[start:end])
+        start = end
+
+
+def _map(function, offsets, worker=None):
+    return [function(record) for record in _records(offsets, worker)]
+
+
+def _reduce(function, initial, offsets, worker=None):
+    value = initial()
+    for record in _records(offsets, worker):
+        value = function(value, record)
+    return value
+
+
+class BulkDecoder(object):
+    def __init__(self, path, spec, name, processes=None, shard_size=4096):
+        '''spec is the text of the specification, name the type of the
+        records, processes the size of the pool, by default the number of
+        CPUs, and shard_size the number of records of a shard.'''
+        self.path = path
+        self.spec = spec
+        self.name = name
+        self.processes = processes or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self._offsets = None
+
+    @property
+    def offsets(self):
+        '''The array of the offsets of the records and of the end of the
+        last one.'''
+        if self._offsets is None:
+            codec = CompiledCodec(parsers.parse(self.spec))
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    self._offsets = array.array('Q', [0])
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                        self._offsets = record_offsets(
+                            m, framing(codec.table, self.name), self.name)
+        return self._offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def shards(self):
+        '''The offsets of the records of every shard, and of its end.'''
+        offsets = self.offsets
+        return [offsets[i:i + self.shard_size + 1]
+                for i in range(0, len(offsets) - 1, self.shard_size)]
+
+    def _run(self, task, ordered=True):
+        shards = self.shards()
+        processes = min(self.processes, len(shards))
+        if not shards:
+            return
+        if processes == 1:
+            # not worth a pool, the file is decoded in this process
+            worker = _open(self.path, self.spec, self.name)
+            for shard in shards:
+                yield task(shard, worker=worker)
+            return
+        with multiprocessing.Pool(processes, _start,
+                                  (self.path, self.spec, self.name)) as pool:
+            run = pool.imap if ordered else pool.imap_unordered
+            for result in run(task, shards):
+                yield result
+
+    def map(self, function, ordered=True):
+        '''Yield what function returns for every record.'''
+        for results in self._run(functools.partial(_map, function), ordered):
+            for result in results:
+                yield result
+
+    def reduce(self, function, initial):
+        '''The list of function folded over the records of every shard,
+        starting with initial().'''
+        return list(self._run(functools.partial(_reduce, function, initial)))
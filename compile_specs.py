@@ -0,0 +1,371 @@
+'''
+Compiles many specification files to Rust in parallel.
+
+    python compile_specs.py [-j JOBS] [-o OUTPUT_DIR] FILE...
+
+Every file is parsed and compiled in a worker process. The Rust code of
+all files with the same module name (the file name without its extension)
+is merged into OUTPUT_DIR/<module>.rs, in the order the files were given,
+so the output does not depend on which worker finished first. Without
+OUTPUT_DIR the modules are written to stdout. The time spent on each file
+is reported on stderr.
+
+Files ending in .txt are read as RFCs with rfc_extractor, all others are
+expected to contain presentation language only.
+
+With --cache-dir, the parsed tree and the Rust code of every definition
+are kept in a build_cache.Cache, and unchanged definitions are neither
+parsed nor compiled again.
+
+With --check, the definitions of all files are indexed in one
+symbols.SymbolTable and undefined types, bad variant selectors and
+conflicting redefinitions are reported on stderr.
+
+With --emit decoders, the modules contain the zero-copy decoders of
+rust_codec instead of plain type declarations, with --emit codecs the
+encoders as well and with --emit views also the views of the structures,
+which decode their fields when they are accessed. They are generated in
+the main process from the IR of all files, because whether a type borrows
+from the input depends on the types it refers to. A variant without a case
+for every member of its selector is an error, with --partial-variants
+those members are decoded as Error::InvalidValue.
+
+--size-report FILE writes the bounds of the encoded size of every type,
+from wire_size, to FILE as JSON.
+
+With --incremental, the main process keeps the code of every definition in
+OUTPUT_DIR/.incremental.json and compiles only the definitions that
+changed, and those depending on them, see incremental.py. Modules whose
+code did not change are not written again.
+
+--profile FILE compiles in this process under a profiling.Profile, writes
+the cProfile statistics to FILE and reports the time of every phase and
+node type and the --slowest definitions on stderr. --flamegraph FILE
+writes the same profile as folded stacks for flamegraph.pl.
+'''
+import argparse
+import collections
+import contextlib
+import os
+import re
+import sys
+import time
+
+import ir
+import parsers
+import rfc_extractor
+from rust_compiler import compile_packet_representation
+
+# the modules of the optional features are imported where they are used,
+# a short build does not pay for them (python -m benchmarks.startup)
+
+FileResult = collections.namedtuple('FileResult', ['path', 'module', 'code',
+                                                   'definitions', 'cached',
+                                                   'error', 'parse_time',
+                                                   'compile_time', 'ir'])
+
+
+def module_name(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    name = re.sub(r'\W', '_', name).lower()
+    if name[:1].isdigit():
+        name = '_' + name
+    return name
+
+
+def is_rfc(path, input_format):
+    if input_format == 'auto':
+        return path.endswith('.txt')
+    return input_format == 'rfc'
+
+
+def _blocks(f, rfc):
+    '''Yield the text of every definition block in f and whether it has to
+    parse.'''
+    if rfc:
+        for block in rfc_extractor.extract_blocks(f):
+            yield block.text, False
+    else:
+        yield f.read(), True
+
+
+def compile_file(path, backend=None, input_format='auto', cache_dir=None,
+                 cache_size=None, keep_ir=False):
+    '''Parse and compile one file, this runs in the worker processes. With
+    keep_ir the result carries the IR of all definitions.'''
+    module = module_name(path)
+    cache = None
+    if cache_dir:
+        import build_cache
+        cache = build_cache.Cache(cache_dir, cache_size or build_cache.default_max_size)
+
+    code = []
+    definitions = [] if keep_ir else None
+    cached = 0
+    parse_time = compile_time = 0.0
+    try:
+        with open(path) as f:
+            for text, strict in _blocks(f, is_rfc(path, input_format)):
+                if cache is not None:
+                    key = cache.key(text, backend=backend)
+                    entry = cache.get(key, load_ast=keep_ir)
+                    if entry is not None:
+                        cached += 1
+                        if entry.code is not None:
+                            code.append(entry.code)
+                        if keep_ir and entry.ast is not None:
+                            definitions.extend(ir.lower(entry.ast))
+                        continue
+
+                start = time.perf_counter()
+                try:
+                    ast = parsers.parse(text, backend=backend)
+                except SyntaxError:
+                    if strict:
+                        raise
+                    ast = None
+                parsed = time.perf_counter()
+                block_code = None
+                if ast is not None:
+                    definition = ir.lower(ast)
+                    block_code = compile_packet_representation(definition)
+                    code.append(block_code)
+                    if keep_ir:
+                        definitions.extend(definition)
+                compiled = time.perf_counter()
+
+                parse_time += parsed - start
+                compile_time += compiled - parsed
+                if cache is not None:
+                    cache.put(key, ast, block_code)
+    except (OSError, SyntaxError, NotImplementedError) as e:
+        # a definition rust_compiler cannot compile fails the file like
+        # one that does not parse
+        return FileResult(path, module, '', 0, cached, str(e), parse_time,
+                          compile_time, None)
+
+    if keep_ir:
+        definitions = tuple(definitions)
+    return FileResult(path, module, '\n\n'.join(c for c in code if c),
+                      len(code), cached, None, parse_time, compile_time,
+                      definitions)
+
+
+def compile_files(paths, jobs=None, backend=None, input_format='auto',
+                  cache_dir=None, cache_size=None, keep_ir=False):
+    '''Compile paths in a process pool and return their FileResults in the
+    order of paths.'''
+    options = backend, input_format, cache_dir, cache_size, keep_ir
+    if jobs == 1 or len(paths) == 1:
+        # starting a worker costs more than most files take
+        return [compile_file(p, *options) for p in paths]
+    import concurrent.futures
+
+    # start with the largest files, so no worker is left with a big one
+    # at the end
+    def size(i):
+        try:
+            return os.path.getsize(paths[i])
+        except OSError:
+            return 0
+    order = sorted(range(len(paths)), key=size, reverse=True)
+
+    results = [None] * len(paths)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(compile_file, paths[i], *options): i
+                   for i in order}
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def merge_modules(results, prelude=None):
+    '''Merge the code of results into one string per module name, each
+    starting with prelude.'''
+    modules = collections.OrderedDict()
+    for result in results:
+        if result.code:
+            modules.setdefault(result.module, []).append(
+                '// {}\n\n{}\n'.format(result.path, result.code))
+    if prelude is not None:
+        for code in modules.values():
+            code.insert(0, prelude)
+    return collections.OrderedDict((name, '\n'.join(modules[name]))
+                                   for name in sorted(modules))
+
+
+def compile_decoders(results, table, encoders=False, views=False,
+                     partial_variants=False):
+    '''Replace the code of results by their decoders.'''
+    import rust_codec
+    return [r._replace(code=rust_codec.compile_decoders(
+                r.ir, table, encoders, views, partial_variants))
+            if r.ir is not None else r
+            for r in results]
+
+
+def symbol_table(results):
+    '''Index the IR of all results, which must have been compiled with
+    keep_ir.'''
+    import symbols
+    table = symbols.SymbolTable()
+    for result in results:
+        if result.ir is not None:
+            table.add(result.ir, result.path)
+    return table
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def report(results, wall_time, out):
+    width = max([len(r.path) for r in results] + [4])
+    out.write('{:<{}} {:>10} {:>10} {:>6} {:>6}\n'.format(
+        'file', width, 'parse', 'compile', 'defs', 'cached'))
+    for r in results:
+        if r.error:
+            out.write('{:<{}} error: {}\n'.format(r.path, width, r.error))
+        else:
+            out.write('{:<{}} {:>8.1f}ms {:>8.1f}ms {:>6} {:>6}\n'.format(
+                r.path, width, r.parse_time * 1000, r.compile_time * 1000,
+                r.definitions, r.cached))
+
+    cpu_time = sum(r.parse_time + r.compile_time for r in results)
+    out.write('{} files in {:.2f}s wall time, {:.2f}s in parse and compile\n'.format(
+        len(results), wall_time, cpu_time))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='+', metavar='FILE')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('-o', '--output-dir',
+                        help='write one <module>.rs per module into this directory')
+    parser.add_argument('--parser', choices=sorted(parsers.backends),
+                        default='fast')
+    parser.add_argument('--format', choices=['auto', 'rfc', 'spec'],
+                        default='auto', dest='input_format')
+    parser.add_argument('--cache-dir',
+                        help='reuse parsed and compiled definitions from this directory')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                        help='evict the least recently used entries above this size')
+    parser.add_argument('--incremental', action='store_true',
+                        help='compile only changed definitions, needs -o')
+    parser.add_argument('--emit', choices=['types', 'decoders', 'codecs', 'views'],
+                        default='types',
+                        help='type declarations only, zero-copy decoders, '
+                             'decoders and encoders or all of them and views')
+    parser.add_argument('--partial-variants', action='store_true',
+                        help='decode the members of a selector without a case '
+                             'as invalid values instead of failing')
+    parser.add_argument('--size-report', metavar='FILE',
+                        help='write the encoded size bounds of all types as JSON')
+    parser.add_argument('--check', action='store_true',
+                        help='report undefined and conflicting types')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write cProfile statistics of an in-process build')
+    parser.add_argument('--flamegraph', metavar='FILE',
+                        help='write the profile as folded stacks')
+    parser.add_argument('--slowest', type=int, default=10, metavar='N',
+                        help='number of definitions in the profile report')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report timings')
+    args = parser.parse_args(argv)
+    if args.incremental and not args.output_dir:
+        parser.error('--incremental needs --output-dir')
+    if args.incremental and (args.check or args.size_report or
+                             args.emit != 'types'):
+        parser.error('--incremental only emits types')
+
+    cache_size = args.cache_size * 2**20
+    if args.cache_dir:
+        import build_cache
+        build_cache.Cache(args.cache_dir, cache_size).prune()
+
+    profile = None
+    jobs = args.jobs
+    if args.profile or args.flamegraph:
+        import profiling
+        # the hooks only see calls in this process
+        profile = profiling.Profile(cprofile=bool(args.profile))
+        jobs = 1
+
+    start = time.perf_counter()
+    decoders = args.emit in ('decoders', 'codecs', 'views')
+    keep_ir = args.check or decoders or bool(args.size_report)
+    with contextlib.ExitStack() as stack:
+        if profile is not None:
+            stack.enter_context(profile)
+        if args.incremental:
+            import incremental
+            build = incremental.IncrementalBuild(
+                os.path.join(args.output_dir, '.incremental.json'), args.parser)
+            results = build.compile_files(args.files, args.input_format)
+            build.save()
+        else:
+            results = compile_files(args.files, jobs, args.parser,
+                                    args.input_format, args.cache_dir,
+                                    cache_size, keep_ir)
+        table = symbol_table(results) if keep_ir else None
+        if decoders:
+            import rust_codec
+            try:
+                modules = merge_modules(compile_decoders(results, table,
+                                                         args.emit != 'decoders',
+                                                         args.emit == 'views',
+                                                         args.partial_variants),
+                                        rust_codec.runtime)
+            except rust_codec.GenerationError as e:
+                sys.stderr.write('error: {}\n'.format(e))
+                return 1
+        else:
+            modules = merge_modules(results)
+
+    if args.profile:
+        profile.dump(args.profile)
+    if args.flamegraph:
+        with open(args.flamegraph, 'w') as f:
+            profile.write_folded(f)
+
+    if args.size_report:
+        import json
+        import wire_size
+        with open(args.size_report, 'w') as f:
+            json.dump(wire_size.report(table), f, indent=2)
+            f.write('\n')
+
+    problems = table.check() if args.check else []
+    for problem in problems:
+        sys.stderr.write('{}\n'.format(problem))
+
+    if args.cache_dir:
+        build_cache.Cache(args.cache_dir, cache_size).evict()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name, code in modules.items():
+            path = os.path.join(args.output_dir, name + '.rs')
+            if args.incremental and _read(path) == code:
+                continue
+            with open(path, 'w') as f:
+                f.write(code)
+    else:
+        for name, code in modules.items():
+            sys.stdout.write('// module {}\n\n{}\n'.format(name, code))
+
+    if not args.quiet:
+        report(results, time.perf_counter() - start, sys.stderr)
+        if profile is not None:
+            profile.write(sys.stderr, args.slowest)
+
+    return 1 if problems or any(r.error for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
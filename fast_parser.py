@@ -0,0 +1,328 @@
+'''
+A predictive parser for the presentation language.
+
+pypeg2 tries every alternative of Definitions.grammar in turn and re-scans
+the same text for each of them. This parser tokenizes the input once and
+picks the production from the next one or two tokens (`struct`, `enum`,
+`select`, a cryptographic attribute or a type name) without backtracking.
+It builds the same objects pypeg2 builds from grammar.py, so the result can
+be fed to rust_compiler unchanged.
+'''
+import bisect
+import re
+
+from pypeg2 import Symbol
+
+from grammar import Type, Int, Definitions, CryptographicAttribute, \
+                    ScalarField, VariableVectorBounds, VariableVectorField, \
+                    ConstantVectorField, ExternalEnumEntry, ExternalEnum, \
+                    InternalEnumEntry, InternalEnum, VariantCase, Variant, \
+                    UnnamedStructure, NamedStructure
+
+cryptographic_attributes = frozenset(['digitally-signed',
+                                      'stream-ciphered',
+                                      'block-ciphered',
+                                      'aead-ciphered',
+                                      'public-key-encrypted'])
+
+_token = re.compile(r'\s*(?:(\w+(?:\^\w+)?(?:-\w+)*)|(\.\.|[{}()\[\]<>;,:]))')
+_newline = re.compile(r'\n')
+
+EOF = ''
+
+
+def tokenize(text):
+    '''Split text into a list of tokens and a list of their offsets.'''
+    tokens = []
+    offsets = []
+    pos = 0
+    end = len(text.rstrip())
+    match = _token.match
+    while pos < end:
+        m = match(text, pos)
+        if m is None:
+            return tokens, offsets, len(text) - len(text[pos:].lstrip())
+        group = 1 if m.start(1) >= 0 else 2
+        tokens.append(m.group(group))
+        offsets.append(m.start(group))
+        pos = m.end()
+
+    tokens.append(EOF)
+    offsets.append(end)
+    return tokens, offsets, None
+
+
+class Parser(object):
+    def __init__(self, text, filename=None):
+        self.text = text
+        self.filename = filename
+        self.tokens, self.offsets, error_offset = tokenize(text)
+        self.newlines = [m.start() for m in _newline.finditer(text)]
+        self.i = 0
+
+        if error_offset is not None:
+            raise self.syntax_error('unexpected character {!r}'.format(text[error_offset]),
+                                    error_offset)
+
+    def parse(self, thing):
+        try:
+            method = self._entry_points[thing]
+        except KeyError:
+            raise TypeError('cannot parse {!r}'.format(thing))
+
+        result = method(self)
+        if not isinstance(result, thing):
+            raise self.syntax_error('expecting {}'.format(thing.__name__),
+                                    self.offsets[0])
+        if self.tokens[self.i] != EOF:
+            raise self.syntax_error('unexpected {!r}'.format(self.tokens[self.i]))
+        return result
+
+    def position(self, offset):
+        return bisect.bisect(self.newlines, offset) + 1, offset
+
+    def syntax_error(self, msg, offset=None):
+        if offset is None:
+            offset = self.offsets[self.i]
+        error = SyntaxError(msg)
+        error.lineno, _ = self.position(offset)
+        line_start = self.text.rfind('\n', 0, offset) + 1
+        line_end = self.text.find('\n', offset)
+        if line_end < 0:
+            line_end = len(self.text)
+        error.text = self.text[line_start:line_end]
+        error.offset = offset - line_start + 1
+        if self.filename:
+            error.filename = self.filename
+        return error
+
+    def peek(self, n=0):
+        return self.tokens[self.i + n] if self.i + n < len(self.tokens) else EOF
+
+    def expect(self, token):
+        if self.tokens[self.i] != token:
+            raise self.syntax_error('expecting {!r}'.format(token))
+        self.i += 1
+
+    def symbol(self, cls=Symbol, offset=None):
+        token = self.tokens[self.i]
+        m = cls.regex.match(token)
+        if m is None or m.end() != len(token):
+            raise self.syntax_error('expecting {}'.format(cls.__name__))
+        obj = cls(token)
+        if offset is None:
+            offset = self.offsets[self.i]
+        obj.position_in_text = self.position(offset)
+        self.i += 1
+        return obj
+
+    def definitions(self):
+        result = Definitions()
+        result.position_in_text = self.position(self.offsets[self.i])
+        tokens = self.tokens
+        while True:
+            token = tokens[self.i]
+            if token == EOF or token == '}':
+                break
+            if token == 'select' and tokens[self.i + 1] == '(':
+                break
+            result.append(self.definition())
+        return result
+
+    def definition(self):
+        n = 1 if self.tokens[self.i] in cryptographic_attributes else 0
+        token = self.peek(n)
+
+        if token == 'struct' and self.peek(n + 1) == '{':
+            return self.structure()
+        elif token == 'enum' and n == 0 and self.peek(1) == '{':
+            return self.enum()
+        else:
+            return self.field()
+
+    def cryptographic_attribute(self):
+        token = self.tokens[self.i]
+        if token not in cryptographic_attributes:
+            return None
+        obj = CryptographicAttribute(token)
+        obj.position_in_text = self.position(self.offsets[self.i])
+        self.i += 1
+        return obj
+
+    def field(self):
+        start = self.position(self.offsets[self.i])
+        attribute = self.cryptographic_attribute()
+        typ = self.symbol(Type)
+        name = self.symbol()
+
+        token = self.tokens[self.i]
+        if token == ';':
+            self.i += 1
+            obj = ScalarField()
+            if attribute is not None:
+                obj.cryptographic_attribute = attribute
+            obj.type = typ
+        elif attribute is not None:
+            raise self.syntax_error('expecting \';\'')
+        elif token == '<':
+            bounds_start = self.position(self.offsets[self.i])
+            self.i += 1
+            bounds = VariableVectorBounds()
+            bounds.floor = self.symbol(Int)
+            self.expect('..')
+            bounds.ceiling = self.symbol(Int)
+            self.expect('>')
+            bounds.position_in_text = bounds_start
+            self.expect(';')
+
+            obj = VariableVectorField()
+            obj.vector_type = typ
+            obj.vector_bounds = bounds
+        elif token == '[':
+            self.i += 1
+            size = self.symbol(Int)
+            self.expect(']')
+            self.expect(';')
+
+            obj = ConstantVectorField()
+            obj.vector_type = typ
+            obj.vector_size = size
+        else:
+            raise self.syntax_error('expecting \';\', \'<\' or \'[\'')
+
+        obj.name = name
+        obj.position_in_text = start
+        return obj
+
+    def enum(self):
+        start = self.position(self.offsets[self.i])
+        self.expect('enum')
+        self.expect('{')
+
+        if self.peek(1) == '(':
+            obj = ExternalEnum()
+            entry = self.external_enum_entry
+        else:
+            obj = InternalEnum()
+            entry = self.internal_enum_entry
+
+        # like pypeg2, entries after the first one start at their comma
+        entries = [entry(self.offsets[self.i])]
+        while self.tokens[self.i] == ',':
+            comma = self.offsets[self.i]
+            self.i += 1
+            if self.tokens[self.i] == '(' and type(obj) is ExternalEnum:
+                self.i += 1
+                obj.enum_width = self.symbol(Int)
+                self.expect(')')
+                break
+            entries.append(entry(comma))
+        self.expect('}')
+
+        if type(obj) is InternalEnum or self.tokens[self.i] != ';':
+            obj.name = self.symbol()
+        self.expect(';')
+
+        for e in entries:
+            obj[e.name] = e
+        obj.position_in_text = start
+        return obj
+
+    def external_enum_entry(self, offset):
+        obj = ExternalEnumEntry()
+        obj.position_in_text = self.position(offset)
+        obj.name = self.symbol()
+        self.expect('(')
+        obj.value = self.symbol(Int)
+        self.expect(')')
+        return obj
+
+    def internal_enum_entry(self, offset):
+        obj = InternalEnumEntry()
+        obj.position_in_text = self.position(offset)
+        obj.name = self.symbol()
+        return obj
+
+    def variant(self):
+        obj = Variant()
+        obj.position_in_text = self.position(self.offsets[self.i])
+        self.expect('select')
+        self.expect('(')
+        obj.variant_type = self.symbol(Type)
+        self.expect(')')
+        self.expect('{')
+
+        obj.variant_cases = [self.variant_case()]
+        while self.tokens[self.i] == 'case':
+            obj.variant_cases.append(self.variant_case())
+
+        self.expect('}')
+        obj.name = self.symbol()
+        self.expect(';')
+        return obj
+
+    def variant_case(self):
+        obj = VariantCase()
+        obj.position_in_text = self.position(self.offsets[self.i])
+        obj.cases = []
+        while self.tokens[self.i] == 'case':
+            self.i += 1
+            obj.cases.append(self.symbol(offset=self.offsets[self.i - 1]))
+            self.expect(':')
+        if not obj.cases:
+            raise self.syntax_error('expecting \'case\'')
+        obj.type = self.symbol(Type)
+        self.expect(';')
+        return obj
+
+    def structure(self):
+        start = self.position(self.offsets[self.i])
+        attribute = self.cryptographic_attribute()
+        self.expect('struct')
+        self.expect('{')
+        definitions = self.definitions()
+
+        variant = None
+        if self.tokens[self.i] == 'select':
+            variant = self.variant()
+        self.expect('}')
+
+        if self.tokens[self.i] == ';' and variant is None:
+            obj = UnnamedStructure()
+            if attribute is not None:
+                obj.cryptographic_attribute = attribute
+                obj[None] = definitions
+            else:
+                # pypeg2 flattens the fields into an unattributed structure
+                for e in definitions:
+                    obj[getattr(e, 'name', None)] = e
+        else:
+            obj = NamedStructure()
+            if attribute is not None:
+                obj.cryptographic_attribute = attribute
+            obj[None] = definitions
+            if variant is not None:
+                obj.structure_variant = variant
+            obj.name = self.symbol()
+        self.expect(';')
+
+        obj.position_in_text = start
+        return obj
+
+    _entry_points = {
+        Definitions:         definitions,
+        ScalarField:         field,
+        VariableVectorField: field,
+        ConstantVectorField: field,
+        ExternalEnum:        enum,
+        InternalEnum:        enum,
+        NamedStructure:      structure,
+        UnnamedStructure:    structure,
+        Variant:             variant,
+    }
+
+
+def parse(text, thing=Definitions, filename=None):
+    '''Parse text following thing and return the resulting things or
+    raise a SyntaxError, like pypeg2.parse().'''
+    return Parser(text, filename).parse(thing)
@@ -1,10 +1,30 @@
-from pypeg2 import *
+import re
+
+from pypeg2 import Enum, K, Keyword, List, Namespace, Symbol, attr, csl, \
+                   maybe_some, name, optional, some
 
 class Type(Symbol):
     pass
 
 class Int(Symbol):
-    pass
+    # the RFCs write bounds like <0..2^16-1>
+    regex = re.compile(r'\w+(?:\^\w+)?(?:-\w+)?')
+
+    def __int__(self):
+        value, _, subtrahend = str(self).partition('-')
+        base, _, exponent = value.partition('^')
+
+        result = _literal(base)
+        if exponent:
+            result **= _literal(exponent)
+        if subtrahend:
+            result -= _literal(subtrahend)
+        return result
+
+def _literal(text):
+    if text[:2].lower() == '0x':
+        return int(text, 16)
+    return int(text)
 
 class Definitions(List):
     pass # grammar will be defined at the end of this file
@@ -0,0 +1,246 @@
+'''
+Recompiles only the definitions that changed since the last build.
+
+    build = IncrementalBuild('out/.incremental.json', backend='fast')
+    results = build.compile_files(['tls.spec', 'rfc5246.txt'])
+    build.save()
+
+A specification file is split into its top level definitions, an RFC into
+its definition blocks. The state file keeps, for every one of them, the
+hash of its text, the types it defines and references and its compiled
+Rust code. The next build parses and compiles only definitions whose text
+is new, and those referencing a type whose definition was added, changed
+or removed (transitively), and splices the code of all others from the
+state. The code is the same as that of compile_specs.compile_file.
+
+The state is discarded when the grammar, the compiler or the parser
+backend changes.
+'''
+import collections
+import hashlib
+import json
+import os
+import time
+
+import ir
+import parsers
+from fast_parser import tokenize
+from ir import StructDef, FieldDef, VectorField
+from rust_compiler import Pair, compile_definition, join_definitions
+
+Entry = collections.namedtuple('Entry', ['hash', 'defines', 'references',
+                                         'pairs'])
+
+
+def split_definitions(text):
+    '''Split presentation language into the text of its top level
+    definitions. Text that does not tokenize is returned whole.'''
+    tokens, offsets, error = tokenize(text)
+    if error is not None:
+        return [text]
+
+    chunks = []
+    depth = 0
+    start = 0
+    for token, offset in zip(tokens, offsets):
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+        elif token == ';' and depth == 0:
+            chunks.append(text[start:offset + 1])
+            start = offset + 1
+    if text[start:].strip():
+        chunks.append(text[start:])
+    return chunks
+
+
+def _hash(text):
+    return hashlib.sha256(text.strip().encode()).hexdigest()
+
+
+def names(node, defines, references, top_level=True):
+    '''Add the types defined and referenced by an IR node to the sets. At
+    the top level, a field declares a type.'''
+    typ = type(node)
+    if typ is FieldDef or typ is VectorField:
+        references.add(node.type)
+        if top_level:
+            defines.add(node.name)
+    elif node.name is not None:
+        defines.add(node.name)
+    if typ is StructDef:
+        for field in node.fields:
+            names(field, defines, references, top_level=False)
+        if node.variant is not None:
+            references.add(node.variant.selector)
+            references.update(c.type for c in node.variant.cases)
+
+
+class IncrementalBuild(object):
+    def __init__(self, path, backend=None):
+        self.path = path
+        self.backend = backend
+        self.files = {}
+        self.parsed = 0
+        self.reused = 0
+        self._load()
+
+    def _version(self):
+        import build_cache
+        return '{}:{}'.format(build_cache.version(), self.backend)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get('version') != self._version():
+            return
+        self.files = {
+            path: [Entry(e['hash'], frozenset(e['defines']),
+                         frozenset(e['references']),
+                         None if e['pairs'] is None else
+                         [Pair(*p) for p in e['pairs']])
+                   for e in entries]
+            for path, entries in state['files'].items()}
+
+    def save(self):
+        state = {
+            'version': self._version(),
+            'files': {
+                path: [{'hash': e.hash, 'defines': sorted(e.defines),
+                        'references': sorted(e.references),
+                        'pairs': None if e.pairs is None else
+                                 [list(p) for p in e.pairs]}
+                       for e in entries]
+                for path, entries in self.files.items()},
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _compile(self, text, strict, times):
+        start = time.perf_counter()
+        try:
+            ast = parsers.parse(text, backend=self.backend)
+        except SyntaxError:
+            if strict:
+                raise
+            ast = None
+        parsed = time.perf_counter()
+        times[0] += parsed - start
+        if ast is None:
+            return Entry(_hash(text), frozenset(), frozenset(), None)
+
+        defines, references = set(), set()
+        definitions = ir.lower(ast)
+        for node in definitions:
+            names(node, defines, references)
+        pairs = [compile_definition(node) for node in definitions]
+        times[1] += time.perf_counter() - parsed
+        return Entry(_hash(text), frozenset(defines), frozenset(references),
+                     pairs)
+
+    def _chunks(self, path, input_format):
+        import compile_specs
+        with open(path) as f:
+            blocks = list(compile_specs._blocks(
+                f, compile_specs.is_rfc(path, input_format)))
+        for text, strict in blocks:
+            if strict:
+                for chunk in split_definitions(text):
+                    yield chunk, strict
+            else:
+                yield text, strict
+
+    def compile_files(self, paths, input_format='auto'):
+        '''Compile paths and return their compile_specs.FileResults in the
+        order of paths.'''
+        # compile_specs imports this module for --incremental, and session
+        # only needs split_definitions
+        import compile_specs
+        chunks = collections.OrderedDict()
+        errors = {}
+        for path in paths:
+            try:
+                chunks[path] = list(self._chunks(path, input_format))
+            except OSError as e:
+                errors[path] = str(e)
+
+        # reuse entries by the hash of their text
+        entries = {}
+        changed = set()
+        for path, texts in chunks.items():
+            previous = collections.defaultdict(list)
+            for entry in self.files.get(path, []):
+                previous[entry.hash].append(entry)
+            current = []
+            for text, _ in texts:
+                reusable = previous.get(_hash(text))
+                current.append(reusable.pop(0) if reusable else None)
+            for removed in previous.values():
+                for entry in removed:
+                    changed |= entry.defines
+            entries[path] = current
+
+        times = collections.defaultdict(lambda: [0.0, 0.0])
+        compiled = set()
+
+        def compile_chunk(path, i):
+            text, strict = chunks[path][i]
+            entry = self._compile(text, strict, times[path])
+            entries[path][i] = entry
+            compiled.add((path, i))
+            changed.update(entry.defines)
+
+        # compile new text, then the definitions referring to a changed
+        # type until no more types change
+        for path in chunks:
+            try:
+                for i, entry in enumerate(entries[path]):
+                    if entry is None:
+                        compile_chunk(path, i)
+            except SyntaxError as e:
+                errors[path] = str(e)
+        while True:
+            dependents = [(path, i) for path in chunks if path not in errors
+                          for i, entry in enumerate(entries[path])
+                          if (path, i) not in compiled and
+                          entry.references & changed]
+            if not dependents:
+                break
+            for path, i in dependents:
+                compile_chunk(path, i)
+
+        self.parsed += len(compiled)
+        results = []
+        for path in paths:
+            module = compile_specs.module_name(path)
+            parse_time, compile_time = times[path]
+            if path in errors:
+                self.files.pop(path, None)
+                results.append(compile_specs.FileResult(
+                    path, module, '', 0, 0, errors[path], parse_time,
+                    compile_time, None))
+                continue
+
+            self.files[path] = entries[path]
+            cached = sum(1 for i in range(len(entries[path]))
+                         if (path, i) not in compiled)
+            self.reused += cached
+            blocks = [e.pairs for e in entries[path] if e.pairs is not None]
+            if compile_specs.is_rfc(path, input_format):
+                code = [join_definitions(pairs) for pairs in blocks]
+            else:
+                # a specification is compiled as a whole by compile_file
+                code = [join_definitions([p for pairs in blocks for p in pairs])]
+            results.append(compile_specs.FileResult(
+                path, module, '\n\n'.join(c for c in code if c), len(blocks),
+                cached, None, parse_time, compile_time, None))
+        return results
@@ -0,0 +1,119 @@
+'''
+A compact, immutable representation of parsed definitions.
+
+pypeg2 objects carry a __dict__, an OrderedDict per Namespace, positions
+and weak references to their namespace. lower() turns such a tree into
+namedtuples, once, and rust_compiler works on those.
+
+    StructDef    name, cryptographic_attribute, fields, variant
+    EnumDef      name, members, width
+    EnumMember   name, value
+    FieldDef     name, type, cryptographic_attribute
+    VectorField  name, type, size, floor, ceiling
+    VariantDef   name, selector, cases
+    VariantCaseDef labels, type
+
+Unnamed structures and unset attributes are None, fields, members, cases
+and labels are tuples and all numbers are ints. A constant vector has a
+size, a variable vector a floor and a ceiling. The members of an enum that
+is never converted to external representation have no value.
+'''
+import collections
+
+from grammar import Definitions, ScalarField, VariableVectorField, \
+                    ConstantVectorField, ExternalEnum, InternalEnum, \
+                    NamedStructure, UnnamedStructure
+
+
+class StructDef(collections.namedtuple('StructDef', ['name',
+                                                     'cryptographic_attribute',
+                                                     'fields', 'variant'])):
+    __slots__ = ()
+
+    @property
+    def encoded_fields(self):
+        '''The fields without the enums declared among them, which are
+        types and take no room in the encoding.'''
+        return tuple(f for f in self.fields if type(f) is not EnumDef)
+
+
+class EnumDef(collections.namedtuple('EnumDef', ['name', 'members', 'width'])):
+    __slots__ = ()
+
+    @property
+    def external(self):
+        return not self.members or self.members[0].value is not None
+
+
+EnumMember = collections.namedtuple('EnumMember', ['name', 'value'])
+
+FieldDef = collections.namedtuple('FieldDef', ['name', 'type',
+                                               'cryptographic_attribute'])
+
+
+class VectorField(collections.namedtuple('VectorField', ['name', 'type', 'size',
+                                                         'floor', 'ceiling'])):
+    __slots__ = ()
+
+    @property
+    def variable(self):
+        return self.ceiling is not None
+
+
+VariantDef = collections.namedtuple('VariantDef', ['name', 'selector', 'cases'])
+
+VariantCaseDef = collections.namedtuple('VariantCaseDef', ['labels', 'type'])
+
+
+def _str(symbol):
+    return None if symbol is None else str(symbol)
+
+
+def structure_fields(ast):
+    '''The fields of a NamedStructure or UnnamedStructure parse tree.'''
+    values = list(ast.data.values())
+    # pypeg2 adds the fields of an unattributed UnnamedStructure directly
+    if len(values) == 1 and type(values[0]) is Definitions:
+        return values[0]
+    return values
+
+
+def lower(ast):
+    '''Turn a parse tree from grammar.py into IR. Definitions become a tuple.'''
+    typ = type(ast)
+    if typ is Definitions:
+        return tuple(lower(a) for a in ast)
+    elif typ is ScalarField:
+        return FieldDef(str(ast.name), str(ast.type),
+                        _str(getattr(ast, 'cryptographic_attribute', None)))
+    elif typ is ConstantVectorField:
+        return VectorField(str(ast.name), str(ast.vector_type),
+                           int(ast.vector_size), None, None)
+    elif typ is VariableVectorField:
+        bounds = ast.vector_bounds
+        return VectorField(str(ast.name), str(ast.vector_type), None,
+                           int(bounds.floor), int(bounds.ceiling))
+    elif typ is ExternalEnum:
+        width = getattr(ast, 'enum_width', None)
+        return EnumDef(_str(getattr(ast, 'name', None)),
+                       tuple(EnumMember(str(e.name), int(e.value))
+                             for e in ast.data.values()),
+                       None if width is None else int(width))
+    elif typ is InternalEnum:
+        return EnumDef(str(ast.name),
+                       tuple(EnumMember(str(e.name), None)
+                             for e in ast.data.values()),
+                       None)
+    elif typ in (NamedStructure, UnnamedStructure):
+        variant = getattr(ast, 'structure_variant', None)
+        if variant is not None:
+            variant = VariantDef(str(variant.name), str(variant.variant_type),
+                                 tuple(VariantCaseDef(tuple(map(str, c.cases)),
+                                                      str(c.type))
+                                       for c in variant.variant_cases))
+        return StructDef(_str(getattr(ast, 'name', None)),
+                         _str(getattr(ast, 'cryptographic_attribute', None)),
+                         tuple(lower(f) for f in structure_fields(ast)),
+                         variant)
+    else:
+        raise NotImplementedError(typ)
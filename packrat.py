@@ -0,0 +1,93 @@
+'''
+Position-keyed packrat memoization for the pypeg2 grammar.
+
+pypeg2 memoizes every rule by the remaining text, which means hashing a
+copy of the rest of the input on every store and lookup, and it does not
+advance the text position when it reuses a memoized result, so positions
+drift after NamedStructure fails and UnnamedStructure re-reads the same
+struct body. PackratParser keys the memory by (rule, text position)
+instead and replays the position change on every hit. The memory lives in
+the parser, so every parse() call starts with an empty one.
+'''
+import pypeg2
+
+from grammar import Definitions
+
+
+class _RuleMemory(dict):
+    '''Results of one grammar rule, keyed by the length of the remaining
+    text, i.e. by position.'''
+    __slots__ = ('parser', 'replay')
+
+    def __init__(self, parser, replay):
+        self.parser = parser
+        self.replay = replay
+
+    def __getitem__(self, text):
+        t, r, lines = dict.__getitem__(self, len(text))
+        consumed = len(text) - len(t)
+        if self.replay and consumed:
+            if lines is None:
+                lines = text.count('\n', 0, consumed)
+                dict.__setitem__(self, len(text), (t, r, lines))
+            pos = self.parser._pos
+            pos[0] += lines
+            pos[1] += consumed
+        return t, r
+
+    def __setitem__(self, text, result):
+        t, r = result
+        dict.__setitem__(self, len(text), (t, r, None))
+
+
+class _Memory(dict):
+    __slots__ = ('parser',)
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __missing__(self, key):
+        # whitespace is skipped without position tracking, the position is
+        # updated by the rule that asked for the skip
+        replay = key != id(self.parser.whitespace)
+        memory = self[key] = _RuleMemory(self.parser, replay)
+        return memory
+
+
+class PackratParser(pypeg2.Parser):
+    def __init__(self):
+        super().__init__()
+        self._memory = _Memory(self)
+        self._pos = None
+
+    def clear_memory(self, thing=None):
+        if thing is None:
+            self._memory = _Memory(self)
+        else:
+            self._memory.pop(id(thing), None)
+
+    def parse(self, text, thing, filename=None):
+        self.text = text
+        if filename:
+            self.filename = filename
+        # the memory is keyed by position, so it is only valid for one text
+        self._memory = _Memory(self)
+        self._pos = pos = [1, 0]
+        t, _ = self._skip(text, pos)
+        t, r = self._parse(t, thing, pos)
+        if type(r) == SyntaxError:
+            raise r
+        return t, r
+
+
+def parse(text, thing=Definitions, filename=None):
+    '''Parse text following thing like pypeg2.parse(), memoizing every
+    grammar rule by its position in text.'''
+    parser = PackratParser()
+    parser.text = text
+    parser.filename = filename
+
+    t, r = parser.parse(text, thing)
+    if t:
+        raise parser.last_error
+    return r
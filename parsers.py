@@ -0,0 +1,32 @@
+'''
+Selects the parser backend used to turn presentation language into the
+syntax tree defined in grammar.py.
+
+    pypeg2  the reference implementation driven by the grammar attributes
+    packrat pypeg2 with the position-keyed memory of packrat.py
+    fast    the predictive parser in fast_parser.py
+'''
+import pypeg2
+
+import fast_parser
+import packrat
+from grammar import Definitions
+
+backends = {
+    'pypeg2':  pypeg2.parse,
+    'packrat': packrat.parse,
+    'fast':    fast_parser.parse,
+}
+
+default_backend = 'pypeg2'
+
+
+def parse(text, thing=Definitions, backend=None):
+    if backend is None:
+        backend = default_backend
+
+    try:
+        parse_with = backends[backend]
+    except KeyError:
+        raise ValueError('unknown parser backend {!r}'.format(backend))
+    return parse_with(text, thing)
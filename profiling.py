@@ -0,0 +1,168 @@
+'''
+Where the time of a build goes.
+
+    with Profile(cprofile=True) as profile:
+        results = compile_specs.compile_files(paths, jobs=1)
+    profile.write(sys.stderr, slowest=10)
+    profile.dump('build.prof')          # pstats, for snakeviz or gprof2dot
+    with open('build.folded', 'w') as f:
+        profile.write_folded(f)         # for flamegraph.pl or speedscope
+
+While a Profile is active, parsers.parse, ir.lower, rust_compiler._compile,
+typename and fieldname and rust_codec.compile_decoders are replaced by
+wrappers that time every call, so builds without a Profile pay nothing.
+Only calls in the current process are seen: compile with jobs=1.
+
+Every call is counted under its phase (parse, lower, compile, decoders)
+and the type of the node it works on: the parse tree classes of grammar.py
+for lower, the IR classes for compile and typename and fieldname by their
+own names. own is the time spent in a call minus the time of the hooked
+calls it made, so the own time of compile nodes is mostly string
+formatting. The cost of a definition is the time lower and compile spent
+on it; parsing is not split by definition.
+'''
+import cProfile
+import collections
+import time
+
+import ir
+import parsers
+import rust_codec
+import rust_compiler
+
+Timing = collections.namedtuple('Timing', ['count', 'total', 'own'])
+
+Cost = collections.namedtuple('Cost', ['name', 'phase', 'seconds'])
+
+
+def _node_type(args):
+    return type(args[0]).__name__
+
+
+def _definition_name(node):
+    name = getattr(node, 'name', None)
+    if name is None:
+        return '<unnamed {}>'.format(type(node).__name__)
+    return str(name)
+
+
+class Profile(object):
+    def __init__(self, cprofile=False):
+        self.profiler = cProfile.Profile() if cprofile else None
+        self.phases = collections.OrderedDict()
+        self.nodes = collections.OrderedDict()
+        self.definitions = []
+        self.folded = collections.Counter()
+        self._stack = []
+        self._patched = []
+
+    def __enter__(self):
+        self._patch(parsers, 'parse', 'parse', lambda args: 'parse')
+        self._patch(ir, 'lower', 'lower', _node_type)
+        self._patch(rust_compiler, '_compile', 'compile', _node_type)
+        self._patch(rust_compiler, 'typename', 'compile', lambda args: 'typename')
+        self._patch(rust_compiler, 'fieldname', 'compile', lambda args: 'fieldname')
+        self._patch(rust_codec, 'compile_decoders', 'decoders',
+                    lambda args: 'compile_decoders')
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        for module, attr, original in reversed(self._patched):
+            setattr(module, attr, original)
+        del self._patched[:]
+        return False
+
+    def _patch(self, module, attr, phase, key):
+        original = getattr(module, attr)
+        stack = self._stack
+        clock = time.perf_counter
+
+        def hooked(*args, **kwargs):
+            # a frame is [phase, key, node, time of the hooked calls made]
+            frame = [phase, key(args), args[0] if args else None, 0.0]
+            stack.append(frame)
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stack.pop()
+                self._record(frame, elapsed, stack[-1] if stack else None)
+
+        self._patched.append((module, attr, original))
+        setattr(module, attr, hooked)
+
+    def _record(self, frame, elapsed, caller):
+        phase, key, node, children = frame
+        own = elapsed - children
+        if caller is not None:
+            caller[3] += elapsed
+        timing = self.phases.setdefault(phase, [0, 0.0, 0.0])
+        timing[2] += own
+        if caller is None or caller[0] != phase:
+            timing[0] += 1
+            timing[1] += elapsed
+        timing = self.nodes.setdefault((phase, key), [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        timing[2] += own
+        root = self._stack[0][0] if self._stack else phase
+        self.folded[';'.join([root] + [f[1] for f in self._stack] + [key])] += own
+
+        # the children of Definitions and of the tuple lower() returns
+        if (caller is not None and caller[0] == phase and
+                caller[1] in ('Definitions', 'tuple') and
+                phase in ('lower', 'compile')):
+            self.definitions.append(Cost(_definition_name(node), phase, elapsed))
+
+    def phase_timings(self):
+        '''The Timing of every phase, by phase name.'''
+        return collections.OrderedDict((phase, Timing(*t))
+                                       for phase, t in self.phases.items())
+
+    def node_timings(self):
+        '''The Timing of every node type, by (phase, node type).'''
+        return collections.OrderedDict((key, Timing(*t))
+                                       for key, t in self.nodes.items())
+
+    def slowest(self, count=10):
+        '''The count definitions lower and compile together spent the most
+        time on, as (name, seconds).'''
+        costs = collections.Counter()
+        for cost in self.definitions:
+            costs[cost.name] += cost.seconds
+        return costs.most_common(count)
+
+    def dump(self, path):
+        '''Write the cProfile statistics to path, in the pstats format.'''
+        if self.profiler is None:
+            raise ValueError('profile was created without cprofile=True')
+        self.profiler.dump_stats(path)
+
+    def write_folded(self, out):
+        '''Write the own time of every stack of hooked calls in
+        microseconds, in the folded format of flamegraph.pl.'''
+        for stack, seconds in sorted(self.folded.items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds:
+                out.write('{} {}\n'.format(stack, microseconds))
+
+    def write(self, out, slowest=10):
+        out.write('{:<32} {:>8} {:>10} {:>10}\n'.format(
+            'phase', 'calls', 'total', 'own'))
+        for phase, timing in self.phase_timings().items():
+            out.write('{:<32} {:>8} {:>8.1f}ms {:>8.1f}ms\n'.format(
+                phase, timing.count, timing.total * 1000, timing.own * 1000))
+        for (phase, key), timing in sorted(self.node_timings().items(),
+                                           key=lambda i: -i[1].own):
+            out.write('  {:<30} {:>8} {:>8.1f}ms {:>8.1f}ms\n'.format(
+                '{} {}'.format(phase, key), timing.count,
+                timing.total * 1000, timing.own * 1000))
+        if slowest:
+            out.write('slowest definitions\n')
+            for name, seconds in self.slowest(slowest):
+                out.write('  {:<40} {:>8.2f}ms\n'.format(name, seconds * 1000))
@@ -0,0 +1,605 @@
+'''
+Decodes and encodes the wire format of the definitions in Python, for
+replaying and analysing captured records with the specification the Rust
+code is generated from.
+
+    codec = Codec(parsers.parse(spec))
+    hello = codec.decode('ClientHello', data)
+    hello.cipher_suites[0]          # a memoryview of 2 bytes of data
+    data = codec.encode('ClientHello', hello._replace(session_id=b''))
+
+Structures decode to namedtuples and enums with a wire format to IntEnums,
+codec.python_type(name) returns them. Vectors of opaque and uint8 decode to memoryviews
+of the input, they are not copied, vectors of other integers to tuples of
+ints and other vectors to tuples of their elements. A type alias (opaque
+SessionID<0..32>;) decodes to the value of its type, a variant to the
+value of its case, which is selected like in rust_codec. Cryptographically
+protected structures are read the way rust_codec reads them, a
+digitally-signed one as a DigitallySigned. Field names that are Python
+keywords get a trailing underscore.
+
+The decoder and encoder of a type are built once, when the type is first
+used. Consecutive fields of a fixed size, integers, enums, constant opaque
+vectors and structures made of those, are read and written by a single
+precompiled struct.Struct, and so are all elements of a vector of such a
+type. Anything that does not decode or encode raises CodecError.
+
+Encoding takes any sequence in place of a tuple and any bytes-like object
+in place of a memoryview.
+'''
+import collections
+import enum
+import functools
+import keyword
+import struct
+
+from ir import StructDef, EnumDef, FieldDef, VectorField, lower
+from rust_compiler import implicit_types, typename, fieldname
+from symbols import SymbolTable
+from wire_size import prefix_width, enum_width
+
+DigitallySigned = collections.namedtuple('DigitallySigned', [
+    'hash_algorithm', 'signature_algorithm', 'signature'])
+
+byte_types = {'opaque', 'uint8'}
+
+_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+class CodecError(ValueError):
+    pass
+
+
+def python_name(name):
+    if keyword.iskeyword(name):
+        return name + '_'
+    return name
+
+
+# A type of a fixed layout. decode_format and encode_format are struct
+# formats without byte order; convert(raw, buf, at) takes the unpacked
+# values from the iterator raw and returns the value of the type, which
+# starts at offset at of buf; split(value, raw) appends the values to pack
+# to the list raw.
+_Piece = collections.namedtuple('_Piece', ['decode_format', 'encode_format',
+                                           'size', 'convert', 'split'])
+
+# decode(buf, pos) returns the value and the position after it,
+# encode(value, out) appends the encoded value to the bytearray out.
+_Type = collections.namedtuple('_Type', ['decode', 'encode', 'piece'])
+
+
+def _take_int(raw, buf, at):
+    return next(raw)
+
+
+def _put_int(value, raw):
+    raw.append(value)
+
+
+def _take_u24(raw, buf, at):
+    return next(raw) << 16 | next(raw)
+
+
+def _put_u24(value, raw):
+    if not 0 <= value < 1 << 24:
+        raise CodecError('uint24 out of range: {}'.format(value))
+    raw.append(value >> 16)
+    raw.append(value & 0xffff)
+
+
+def _uint_piece(size):
+    if size in _formats:
+        return _Piece(_formats[size], _formats[size], size, _take_int, _put_int)
+    elif size == 3:
+        return _Piece('BH', 'BH', 3, _take_u24, _put_u24)
+
+    def convert(raw, buf, at):
+        return int.from_bytes(next(raw), 'big')
+
+    def split(value, raw):
+        raw.append(value.to_bytes(size, 'big'))
+    fmt = '{}s'.format(size)
+    return _Piece(fmt, fmt, size, convert, split)
+
+
+def _bytes_piece(size):
+    def convert(raw, buf, at):
+        return buf[at:at + size]
+
+    def split(value, raw):
+        if len(value) != size:
+            raise CodecError('expected {} bytes, got {}'.format(size, len(value)))
+        raw.append(bytes(value))
+    return _Piece('{}x'.format(size), '{}s'.format(size), size, convert, split)
+
+
+def _enum_piece(cls, width):
+    piece = _uint_piece(width)
+    take = piece.convert
+    members = {int(m): m for m in cls}
+
+    def convert(raw, buf, at):
+        value = take(raw, buf, at)
+        member = members.get(value)
+        if member is None:
+            raise CodecError('invalid value {} of {}'.format(value, cls.__name__))
+        return member
+
+    def split(value, raw):
+        if value not in members:
+            raise CodecError('invalid value {} of {}'.format(value, cls.__name__))
+        piece.split(int(value), raw)
+    return piece._replace(convert=convert, split=split)
+
+
+def _maker(cls):
+    '''cls._make without checking the number of values.'''
+    return functools.partial(tuple.__new__, cls)
+
+
+def _struct_piece(cls, pieces):
+    '''The piece of a structure whose fields are all pieces.'''
+    offsets = []
+    offset = 0
+    for p in pieces:
+        offsets.append(offset)
+        offset += p.size
+    converts = list(zip([p.convert for p in pieces], offsets))
+    splits = [p.split for p in pieces]
+    make = _maker(cls)
+
+    def convert(raw, buf, at):
+        return make([c(raw, buf, at + o) for c, o in converts])
+
+    def split(value, raw):
+        if len(value) != len(splits):
+            raise CodecError('{} has {} fields, got {}'.format(
+                cls.__name__, len(splits), len(value)))
+        for s, v in zip(splits, value):
+            s(v, raw)
+    return _Piece(''.join(p.decode_format for p in pieces),
+                  ''.join(p.encode_format for p in pieces),
+                  offset, convert, split)
+
+
+def _run(pieces):
+    '''decode(buf, pos) returning the list of the values of pieces and the
+    position after them, and encode(values, out), for consecutive pieces.'''
+    decoder = struct.Struct('>' + ''.join(p.decode_format for p in pieces))
+    encoder = struct.Struct('>' + ''.join(p.encode_format for p in pieces))
+    unpack_from = decoder.unpack_from
+    pack = encoder.pack
+    size = decoder.size
+    offsets = []
+    offset = 0
+    for p in pieces:
+        offsets.append(offset)
+        offset += p.size
+    converts = list(zip([p.convert for p in pieces], offsets))
+    splits = [p.split for p in pieces]
+
+    if all(p.convert is _take_int for p in pieces):
+        def decode(buf, pos):
+            return list(unpack_from(buf, pos)), pos + size
+
+        def encode(values, out):
+            out += pack(*values)
+    else:
+        def decode(buf, pos):
+            raw = iter(unpack_from(buf, pos))
+            return [c(raw, buf, pos + o) for c, o in converts], pos + size
+
+        def encode(values, out):
+            raw = []
+            for s, v in zip(splits, values):
+                s(v, raw)
+            out += pack(*raw)
+    return decode, encode
+
+
+def _single(piece):
+    '''The _Type of a piece on its own.'''
+    decode_run, encode_run = _run([piece])
+
+    def decode(buf, pos):
+        values, pos = decode_run(buf, pos)
+        return values[0], pos
+
+    def encode(value, out):
+        encode_run([value], out)
+    return _Type(decode, encode, piece)
+
+
+def _reader(width):
+    '''read(buf, pos) of an unsigned integer of width bytes, which struct
+    has no format for.'''
+    def read(buf, pos):
+        if pos + width > len(buf):
+            raise CodecError('truncated length')
+        return int.from_bytes(buf[pos:pos + width], 'big')
+    return read
+
+
+def _writer(width):
+    if width in _formats:
+        return struct.Struct('>' + _formats[width]).pack
+    return lambda value: value.to_bytes(width, 'big')
+
+
+def _elements(element, size, name):
+    '''decode(buf, start, end) and encode(values) of the elements of a
+    vector, its bytes from start to end.'''
+    if element.piece is not None and element.piece.size == 0:
+        element = element._replace(piece=None)
+    piece = element.piece
+
+    if piece is not None and piece.convert is _take_int:
+        fmt = piece.decode_format
+        if size == 1:
+            def decode(buf, start, end):
+                return buf[start:end]
+
+            def encode(values):
+                return values
+        else:
+            def decode(buf, start, end):
+                count, rest = divmod(end - start, size)
+                if rest:
+                    raise CodecError('invalid length {} of {}'.format(end - start, name))
+                return struct.unpack_from('>{}{}'.format(count, fmt), buf, start)
+
+            def encode(values):
+                return struct.pack('>{}{}'.format(len(values), fmt), *values)
+    elif piece is not None:
+        convert = piece.convert
+        split = piece.split
+
+        def decode(buf, start, end):
+            count, rest = divmod(end - start, size)
+            if rest:
+                raise CodecError('invalid length {} of {}'.format(end - start, name))
+            raw = iter(struct.unpack_from('>' + piece.decode_format * count, buf, start))
+            return tuple([convert(raw, buf, at) for at in range(start, end, size)])
+
+        def encode(values):
+            raw = []
+            for v in values:
+                split(v, raw)
+            return struct.pack('>' + piece.encode_format * len(values), *raw)
+    else:
+        decode_element = element.decode
+        encode_element = element.encode
+
+        def decode(buf, start, end):
+            # the elements must not extend beyond the vector
+            buf = buf[:end]
+            values = []
+            while start < end:
+                value, start = decode_element(buf, start)
+                values.append(value)
+            return tuple(values)
+
+        def encode(values):
+            out = bytearray()
+            for v in values:
+                encode_element(v, out)
+            return out
+    return decode, encode
+
+
+def _vector(node, element, size):
+    name = node.name
+    decode_elements, encode_elements = _elements(element, size, name)
+    if not node.variable:
+        length = node.size
+        if node.type in byte_types:
+            return _single(_bytes_piece(length))
+
+        def decode(buf, pos):
+            end = pos + length
+            if end > len(buf):
+                raise CodecError('truncated {}'.format(name))
+            return decode_elements(buf, pos, end), end
+
+        def encode(value, out):
+            data = encode_elements(value)
+            if len(data) != length:
+                raise CodecError('invalid length {} of {}'.format(len(data), name))
+            out += data
+        return _Type(decode, encode, None)
+
+    floor, ceiling = node.floor, node.ceiling
+    width = prefix_width(ceiling)
+    write = _writer(width)
+    # the usual widths are unpacked here, without another call
+    unpack_from = read = None
+    if width in _formats:
+        unpack_from = struct.Struct('>' + _formats[width]).unpack_from
+    else:
+        read = _reader(width)
+
+    def decode(buf, pos):
+        length = unpack_from(buf, pos)[0] if read is None else read(buf, pos)
+        if length < floor or length > ceiling:
+            raise CodecError('invalid length {} of {}'.format(length, name))
+        start = pos + width
+        end = start + length
+        if end > len(buf):
+            raise CodecError('truncated {}'.format(name))
+        return decode_elements(buf, start, end), end
+
+    def encode(value, out):
+        data = encode_elements(value)
+        if not floor <= len(data) <= ceiling:
+            raise CodecError('invalid length {} of {}'.format(len(data), name))
+        out += write(len(data))
+        out += data
+    return _Type(decode, encode, None)
+
+
+def _digitally_signed():
+    head = struct.Struct('>BBH')
+    unpack_from = head.unpack_from
+    pack = head.pack
+
+    def decode(buf, pos):
+        hash_algorithm, signature_algorithm, length = unpack_from(buf, pos)
+        start = pos + 4
+        if start + length > len(buf):
+            raise CodecError('truncated signature')
+        return DigitallySigned(hash_algorithm, signature_algorithm,
+                               buf[start:start + length]), start + length
+
+    def encode(value, out):
+        if len(value.signature) > 0xffff:
+            raise CodecError('invalid length {} of signature'.format(len(value.signature)))
+        out += pack(value.hash_algorithm, value.signature_algorithm,
+                    len(value.signature))
+        out += value.signature
+    return _Type(decode, encode, None)
+
+
+def _rest():
+    '''A ciphered structure, the rest of the input.'''
+    def decode(buf, pos):
+        return buf[pos:], len(buf)
+
+    def encode(value, out):
+        out += value
+    return _Type(decode, encode, None)
+
+
+class Codec(object):
+    def __init__(self, definitions, table=None):
+        '''definitions are given as IR or as a parse tree, table has to
+        contain all types they refer to, by default it is built from
+        definitions alone.'''
+        if not isinstance(definitions, tuple):
+            definitions = lower(definitions)
+        if table is None:
+            table = SymbolTable().add(definitions)
+        self.table = table
+        self.types = {}
+        self._types = {}
+
+    def decode_from(self, name, data, offset=0, selector=None):
+        '''Decode the type name from data at offset, return the value and
+        the offset after it. A structure whose variant is selected by no
+        field of its own takes the value of the selector.'''
+        typ = self._type(name)
+        buf = data if type(data) is memoryview else memoryview(data)
+        try:
+            if selector is None:
+                return typ.decode(buf, offset)
+            return typ.decode(buf, offset, selector)
+        except struct.error:
+            raise CodecError('truncated {}'.format(name))
+
+    def decode(self, name, data, selector=None):
+        '''Decode the type name from all of data.'''
+        value, end = self.decode_from(name, data, 0, selector)
+        if end != len(data):
+            raise CodecError('{} trailing bytes after {}'.format(len(data) - end, name))
+        return value
+
+    def encode(self, name, value, selector=None):
+        out = bytearray()
+        typ = self._type(name)
+        try:
+            if selector is None:
+                typ.encode(value, out)
+            else:
+                typ.encode(value, out, selector)
+        except struct.error as e:
+            raise CodecError('cannot encode {}: {}'.format(name, e))
+        return bytes(out)
+
+    def python_type(self, name):
+        '''The namedtuple of the structure or the IntEnum of the enum
+        called name. Unnamed structures are known by their Rust name once
+        the type containing them is used.'''
+        if name not in self.types:
+            self._type(name)
+        return self.types[name]
+
+    # types
+
+    def _type(self, name):
+        typ = self._types.get(name)
+        if typ is not None:
+            return typ
+        if name in implicit_types:
+            typ = _single(_uint_piece(implicit_types[name]['size']))
+            self._types[name] = typ
+            return typ
+
+        definition = self.table.get(name)
+        if definition is None:
+            raise CodecError('undefined type {}'.format(name))
+        # a type containing itself refers to itself through these
+        self._types[name] = _Type(lambda *args: self._types[name].decode(*args),
+                                  lambda *args: self._types[name].encode(*args),
+                                  None)
+        node = definition.node
+        try:
+            if type(node) is StructDef:
+                typ = self._structure(node, None)
+            else:
+                typ = self._node(node, None)
+        except BaseException:
+            del self._types[name]
+            raise
+        self._types[name] = typ
+        return typ
+
+    def _node(self, node, parent):
+        typ = type(node)
+        if typ is FieldDef:
+            return self._type(node.type)
+        elif typ is VectorField:
+            element = self._type(node.type)
+            size = None
+            if element.piece is not None:
+                size = element.piece.size
+            return _vector(node, element, size)
+        elif typ is EnumDef:
+            return self._enum(node)
+
+        attr = node.cryptographic_attribute
+        if attr is None:
+            return self._structure(node, parent)
+        # the plaintext gets its namedtuple all the same
+        self._structure(node, parent)
+        if attr == 'digitally-signed':
+            return _digitally_signed()
+        elif attr == 'public-key-encrypted':
+            return _vector(VectorField(fieldname(node), 'opaque', None, 0, 2**16 - 1),
+                           self._type('opaque'), 1)
+        return _rest()
+
+    def _enum(self, node):
+        if not node.external:
+            raise CodecError('enum {} has no wire format'.format(node.name))
+        cls = enum.IntEnum(node.name or 'Enum', [(m.name, m.value)
+                                                 for m in node.members])
+        if node.name is not None:
+            self.types[node.name] = cls
+        return _single(_enum_piece(cls, enum_width(node)))
+
+    def _structure(self, node, parent):
+        name = typename(node, parent, with_crypto_attr=False)
+        names = [python_name(fieldname(f)) for f in node.encoded_fields]
+        if node.variant is not None:
+            names.append(python_name(node.variant.name))
+        cls = collections.namedtuple(name, names)
+        self.types[name] = cls
+        make = _maker(cls)
+
+        fields = [self._node(f, node) for f in node.encoded_fields]
+        if node.variant is None and all(f.piece is not None for f in fields):
+            return _single(_struct_piece(cls, [f.piece for f in fields]))
+
+        # consecutive pieces are decoded together
+        steps = []
+        pieces = []
+        for field in fields + [None]:
+            if field is not None and field.piece is not None:
+                pieces.append(field.piece)
+                continue
+            if pieces:
+                decode, encode = _run(pieces)
+                steps.append((True, decode, encode, len(pieces)))
+                pieces = []
+            if field is not None:
+                steps.append((False, field.decode, field.encode, 1))
+
+        if node.variant is None:
+            return _Type(self._decode_fields(steps, make),
+                         self._encode_fields(steps, len(names), name), None)
+        return self._variant(node, steps, make, len(names), name)
+
+    def _decode_fields(self, steps, make):
+        decoders = [(run, decode) for run, decode, _, _ in steps]
+
+        def decode(buf, pos):
+            values = []
+            for run, step in decoders:
+                value, pos = step(buf, pos)
+                if run:
+                    values.extend(value)
+                else:
+                    values.append(value)
+            return make(values), pos
+        return decode
+
+    def _encode_fields(self, steps, count, name):
+        encoders = []
+        index = 0
+        for run, _, encode, n in steps:
+            encoders.append((run, encode, index, index + n))
+            index += n
+
+        def encode(value, out):
+            if len(value) != count:
+                raise CodecError('{} has {} fields, got {}'.format(name, count,
+                                                                    len(value)))
+            for run, step, start, end in encoders:
+                if run:
+                    step(value[start:end], out)
+                else:
+                    step(value[start], out)
+        return encode
+
+    def _variant(self, node, steps, make, count, name):
+        variant = node.variant
+        enum_definition = self.table.enum(variant.selector)
+        if enum_definition is None:
+            raise CodecError('select ({}) is not an enum'.format(variant.selector))
+        # the selector enum decodes to an IntEnum, keys are its values
+        arms = {}
+        for case in variant.cases:
+            typ = self._type(case.type)
+            for label in case.labels:
+                if label not in enum_definition.members:
+                    raise CodecError('{} is not a member of {}'.format(
+                        label, variant.selector))
+                arms.setdefault(enum_definition.members[label], typ)
+        decoders = {value: typ.decode for value, typ in arms.items()}
+        encoders = {value: typ.encode for value, typ in arms.items()}
+
+        index = None
+        for i, field in enumerate(node.encoded_fields):
+            if type(field) is FieldDef and field.type == variant.selector:
+                index = i
+
+        decode_fields = self._decode_fields(steps, list)
+        encode_fields = self._encode_fields(steps, count - 1, name)
+
+        def decode(buf, pos, selector=None):
+            values, pos = decode_fields(buf, pos)
+            if index is not None:
+                selector = values[index]
+            elif selector is None:
+                raise CodecError('{} needs the value of its selector'.format(name))
+            arm = decoders.get(selector)
+            if arm is None:
+                raise CodecError('no case for {} in {}'.format(selector, name))
+            value, pos = arm(buf, pos)
+            values.append(value)
+            return make(values), pos
+
+        def encode(value, out, selector=None):
+            if len(value) != count:
+                raise CodecError('{} has {} fields, got {}'.format(name, count,
+                                                                    len(value)))
+            encode_fields(value[:-1], out)
+            if index is not None:
+                selector = value[index]
+            elif selector is None:
+                raise CodecError('{} needs the value of its selector'.format(name))
+            arm = encoders.get(selector)
+            if arm is None:
+                raise CodecError('no case for {} in {}'.format(selector, name))
+            arm(value[-1], out)
+        return _Type(decode, encode, None)
@@ -0,0 +1,702 @@
+'''
+Generates Python decoders for the definitions, straight-line functions
+compiled once, as a faster python_codec.Codec.
+
+    codec = CompiledCodec(parsers.parse(spec))
+    hello = codec.decode('ClientHello', data)
+    print(compile_python_decoders(parsers.parse(spec)))
+
+compile_python_decoders() returns the source of a module with a function
+
+    _decode_ClientHello(buf, pos) -> (value, pos)
+
+for every type, which reads from the memoryview buf like rust_codec's
+parse(). Consecutive fields of a fixed layout are read by one
+struct.Struct unpack and built in place, length prefixes are read as wide
+as the ceiling of their vector and enums are validated by a lookup in a
+dict of their values, which also gives their member. Vectors and the
+other types are decoded by the same rules as in python_codec, into the
+same values, namedtuples and IntEnums the module declares.
+
+CompiledCodec compiles the source of a specification once per process, as
+long as it is among the last max_modules, and decodes with it. Encoding
+is python_codec's.
+
+With views, every structure also gets a function _view_ClientHello(buf,
+pos) that only finds the offsets of its fields, reading the length
+prefixes of the fields of a variable size and adding up the sizes of the
+others, and a View class that decodes a field when it is accessed:
+
+    hello = codec.view('ClientHello', data)
+    hello.cipher_suites             # decodes only the cipher suites
+
+Fields that are structures of a variable size, variants included, are
+views themselves.
+'''
+import collections
+import enum
+import struct
+
+from ir import StructDef, EnumDef, FieldDef, VectorField, lower
+from python_codec import Codec, CodecError, DigitallySigned, byte_types, \
+                         python_name
+from rust_compiler import implicit_types, typename, fieldname
+from symbols import SymbolTable
+from wire_size import WireSizes, prefix_width, enum_width
+
+_formats = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+# A type of a fixed layout: its struct format, the number of values
+# unpacking it gives, and build(raw, base, offset) and checks(raw), the
+# expression of its value and the statements validating it, given the
+# names of the unpacked values and the position of the type, base plus
+# offset. enum is the members dict of an enum.
+_Layout = collections.namedtuple('_Layout', ['format', 'size', 'raw', 'build',
+                                             'checks', 'enum'])
+
+
+def _at(base, offset):
+    if offset == 0:
+        return base
+    return '{} + {}'.format(base, offset)
+
+
+def _int_layout(size):
+    if size in _formats:
+        return _Layout(_formats[size], size, 1, lambda raw, base, offset: raw[0],
+                       lambda raw: [], None)
+    elif size == 3:
+        return _Layout('BH', 3, 2,
+                       lambda raw, base, offset: '({} << 16 | {})'.format(*raw),
+                       lambda raw: [], None)
+    return _Layout('{}s'.format(size), size, 1,
+                   lambda raw, base, offset: "int.from_bytes({}, 'big')".format(raw[0]),
+                   lambda raw: [], None)
+
+
+def _bytes_layout(size):
+    def build(raw, base, offset):
+        return 'buf[{}:{}]'.format(_at(base, offset), _at(base, offset + size))
+    return _Layout('{}x'.format(size), size, 0, build, lambda raw: [], None)
+
+
+def _selector_index(node):
+    '''The index of the field selecting the variant of a structure, None
+    if the selector is given from outside.'''
+    index = None
+    for i, field in enumerate(node.encoded_fields):
+        if type(field) is FieldDef and field.type == node.variant.selector:
+            index = i
+    return index
+
+
+class _Generator(object):
+    def __init__(self, table, views=False):
+        self.table = table
+        self.sizes = WireSizes(table)
+        # the names of the structures with views, if they get any
+        self.views = [] if views else None
+        self.lines = []
+        self.declarations = []
+        self.tail = []
+        self.structs = {}
+        self.layouts = {}
+        self.functions = {}
+        self.types = []
+        self.names = set()
+
+    # names in the module
+
+    def struct(self, fmt):
+        '''The name of the unpack_from of a precompiled struct format.'''
+        if fmt not in self.structs:
+            name = '_s{}'.format(len(self.structs))
+            self.structs[fmt] = name
+            self.declarations.append('{} = _Struct({!r}).unpack_from'.format(
+                name, '>' + fmt))
+        return self.structs[fmt]
+
+    def declare_class(self, name, fields):
+        self.types.append(name)
+        self.declarations.append('_t_{} = _namedtuple({!r}, {!r})'.format(
+            name, name, [python_name(f) for f in fields]))
+        return '_t_' + name
+
+    # layouts
+
+    def layout(self, name):
+        '''The _Layout of the type called name, or None.'''
+        if name in implicit_types:
+            return _int_layout(implicit_types[name]['size'])
+        if name not in self.layouts:
+            self.layouts[name] = None
+            definition = self.table.get(name)
+            if definition is not None:
+                if type(definition.node) is StructDef:
+                    self.function(name)
+                self.layouts[name] = self.node_layout(definition.node)
+        return self.layouts[name]
+
+    def node_layout(self, node):
+        typ = type(node)
+        if typ is FieldDef:
+            return self.layout(node.type)
+        elif typ is VectorField:
+            if not node.variable and node.type in byte_types:
+                return _bytes_layout(node.size)
+            return None
+        elif typ is EnumDef:
+            if not node.external or node.name is None:
+                return None
+            return self.enum_layout(node)
+        elif node.cryptographic_attribute is not None or node.variant is not None:
+            return None
+        layouts = [self.node_layout(f) for f in node.encoded_fields]
+        if None in layouts:
+            return None
+        return self.struct_layout('_t_' + typename(node, None, False), layouts)
+
+    def enum_layout(self, node):
+        members = '_m_' + node.name
+        inner = _int_layout(enum_width(node))
+
+        def build(raw, base, offset):
+            return '{}[{}]'.format(members, inner.build(raw, base, offset))
+
+        def checks(raw):
+            value = inner.build(raw, 'pos', 0)
+            return ['if {} not in {}:'.format(value, members),
+                    "    raise CodecError('invalid value %d of {}' % {})".format(
+                        node.name, value)]
+        return inner._replace(build=build, checks=checks, enum=members)
+
+    def struct_layout(self, cls, layouts):
+        def parts(raw, base, offset):
+            start = 0
+            for layout in layouts:
+                yield layout, raw[start:start + layout.raw], offset
+                start += layout.raw
+                offset += layout.size
+
+        def build(raw, base, offset):
+            values = [l.build(r, base, o) for l, r, o in parts(raw, base, offset)]
+            return '_new({}, ({}{}))'.format(cls, ', '.join(values),
+                                             ',' if len(values) == 1 else '')
+
+        def checks(raw):
+            return [c for l, r, _ in parts(raw, 'pos', 0) for c in l.checks(r)]
+        return _Layout(''.join(l.format for l in layouts), sum(l.size for l in layouts),
+                       sum(l.raw for l in layouts), build, checks, None)
+
+    # functions
+
+    def function(self, name):
+        '''The name of the decoder of the type called name, generated on
+        first use.'''
+        if name in self.functions:
+            return self.functions[name]
+        function = '_decode_' + name
+        self.functions[name] = function
+        if name in implicit_types:
+            self.layout_function(function, _int_layout(implicit_types[name]['size']))
+            return function
+
+        definition = self.table.get(name)
+        if definition is None:
+            self.error_function(function, 'undefined type {}'.format(name))
+        elif type(definition.node) is StructDef:
+            try:
+                self.structure(definition.node, None, function)
+            except CodecError as e:
+                # like the Codec, fail when the type is decoded
+                self.error_function(function, str(e))
+        elif type(definition.node) is EnumDef:
+            if not definition.node.external:
+                self.error_function(function, 'enum {} has no wire format'.format(name))
+            else:
+                self.declare_enum(definition.node)
+                self.layout_function(function, self.layout(name))
+        else:
+            lines = []
+            self.field(definition.node, None, 'value', lines)
+            self.emit(function, lines + ['return value, pos'])
+        return function
+
+    def emit(self, function, body, selector=False):
+        self.lines.append('')
+        self.lines.append('')
+        self.lines.append('def {}(buf, pos{}):'.format(
+            function, ', selector=None' if selector else ''))
+        self.lines.extend('    ' + line for line in body)
+
+    def error_function(self, function, message):
+        # it may stand for a structure taking a selector
+        self.emit(function, ['raise CodecError({!r})'.format(message)], True)
+
+    def layout_function(self, function, layout):
+        lines = []
+        self.run([layout], ['value'], lines)
+        self.emit(function, lines + ['return value, pos'])
+
+    def declare_enum(self, node):
+        if node.name in self.names:
+            return
+        self.names.add(node.name)
+        self.types.append(node.name)
+        self.declarations.append('_t_{0} = _IntEnum({0!r}, {1!r})'.format(
+            node.name, [(m.name, m.value) for m in node.members]))
+        self.declarations.append('_m_{0} = {{int(m): m for m in _t_{0}}}'.format(
+            node.name))
+
+    # statements
+
+    def run(self, layouts, targets, lines):
+        '''Unpack consecutive layouts at pos into the variables targets.'''
+        raw = ['r{}'.format(i) for i in range(sum(l.raw for l in layouts))]
+        unpack = '{}(buf, pos)'.format(self.struct(''.join(l.format for l in layouts)))
+        if not raw:
+            # nothing to unpack, but it checks the length
+            lines.append(unpack)
+        elif len(raw) == 1:
+            lines.append('{}, = {}'.format(raw[0], unpack))
+        else:
+            lines.append('{} = {}'.format(', '.join(raw), unpack))
+        start = 0
+        offset = 0
+        for layout, target in zip(layouts, targets):
+            values = raw[start:start + layout.raw]
+            lines.extend(layout.checks(values))
+            lines.append('{} = {}'.format(target, layout.build(values, 'pos', offset)))
+            start += layout.raw
+            offset += layout.size
+        lines.append('pos += {}'.format(offset))
+
+    def field(self, node, parent, target, lines):
+        '''Decode a field, an alias or a nested structure at pos into
+        target.'''
+        typ = type(node)
+        layout = self.node_layout(node) if typ is not StructDef else None
+        if layout is not None:
+            self.run([layout], [target], lines)
+        elif typ is FieldDef:
+            lines.append('{}, pos = {}(buf, pos)'.format(target, self.function(node.type)))
+        elif typ is VectorField:
+            self.vector(node, target, lines)
+        elif typ is EnumDef:
+            raise CodecError('enum {} has no wire format'.format(node.name))
+        else:
+            self.nested(node, parent, target, lines)
+
+    def nested_function(self, node, parent):
+        '''The decoder of a nested structure, generated on first use.'''
+        name = typename(node, parent, with_crypto_attr=False)
+        function = '_decode_' + name
+        if name not in self.functions:
+            self.functions[name] = function
+            self.structure(node, parent, function)
+        return function
+
+    def nested(self, node, parent, target, lines):
+        function = self.nested_function(node, parent)
+        attr = node.cryptographic_attribute
+        if attr is None:
+            lines.append('{}, pos = {}(buf, pos)'.format(target, function))
+        elif attr == 'digitally-signed':
+            lines.extend([
+                'r0, r1, n = {}(buf, pos)'.format(self.struct('BBH')),
+                'pos += 4',
+                'end = pos + n',
+                'if end > len(buf):',
+                "    raise CodecError('truncated signature')",
+                '{} = _new(DigitallySigned, (r0, r1, buf[pos:end]))'.format(target),
+                'pos = end',
+            ])
+        elif attr == 'public-key-encrypted':
+            self.vector(VectorField(fieldname(node), 'opaque', None, 0, 2**16 - 1),
+                        target, lines)
+        else:
+            lines.extend(['{} = buf[pos:]'.format(target), 'pos = len(buf)'])
+
+    def vector(self, node, target, lines):
+        self.vector_bounds(node, lines)
+        self.elements(node, target, lines)
+        lines.append('pos = end')
+
+    def vector_bounds(self, node, lines):
+        '''Read the length of a vector at pos, leaving pos at its first
+        element and end after its last.'''
+        name = node.name
+        if node.variable:
+            width = prefix_width(node.ceiling)
+            if width == 1:
+                lines.append('n = buf[pos]')
+            elif width in _formats:
+                lines.append('n, = {}(buf, pos)'.format(self.struct(_formats[width])))
+            else:
+                lines.extend(['if pos + {} > len(buf):'.format(width),
+                              "    raise CodecError('truncated length')",
+                              "n = int.from_bytes(buf[pos:pos + {}], 'big')".format(width)])
+            bounds = []
+            if node.floor:
+                bounds.append('n < {}'.format(node.floor))
+            if node.ceiling < 1 << (8 * width):
+                bounds.append('n > {}'.format(node.ceiling))
+            if bounds:
+                lines.extend(['if {}:'.format(' or '.join(bounds)),
+                              "    raise CodecError('invalid length %d of {}' % n)".format(
+                                  name)])
+            lines.extend(['pos += {}'.format(width), 'end = pos + n'])
+        else:
+            lines.extend(['n = {}'.format(node.size), 'end = pos + n'])
+        lines.extend(['if end > len(buf):',
+                      "    raise CodecError('truncated {}')".format(name)])
+
+    def elements(self, node, target, lines):
+        '''Decode the elements of a vector from pos to end into target.'''
+        name = node.type
+        if name in byte_types:
+            lines.append('{} = buf[pos:end]'.format(target))
+            return
+        layout = self.layout(name)
+        if layout is None or layout.size == 0:
+            lines.extend([
+                'sub = buf[:end]',
+                'items = []',
+                'while pos < end:',
+                '    item, pos = {}(sub, pos)'.format(self.function(name)),
+                '    items.append(item)',
+                '{} = tuple(items)'.format(target),
+            ])
+            return
+
+        size = layout.size
+        lines.extend(['count, rest = divmod(n, {})'.format(size),
+                      'if rest:',
+                      "    raise CodecError('invalid length %d of {}' % n)".format(
+                          node.name)])
+        if layout.raw == 1 and layout.build(['r'], 'i', 0) == 'r':
+            lines.append("{} = _unpack_from('>%d{}' % count, buf, pos)".format(
+                target, layout.format))
+        elif layout.enum is not None and layout.raw == 1:
+            lines.extend([
+                "{} = tuple(map({}.get, _unpack_from('>%d{}' % count, buf, pos)))".format(
+                    target, layout.enum, layout.format),
+                'if None in {}:'.format(target),
+                "    raise CodecError('invalid value of {}')".format(name),
+            ])
+        elif layout.raw == 0:
+            lines.append('{} = tuple([{} for i in range(pos, end, {})])'.format(
+                target, layout.build([], 'i', 0), size))
+        else:
+            lines.append('{} = tuple([{}(buf, i)[0] for i in range(pos, end, {})])'.format(
+                target, self.function(name), size))
+
+    def structure(self, node, parent, function):
+        name = typename(node, parent, with_crypto_attr=False)
+        names = [fieldname(f) for f in node.encoded_fields]
+        if node.variant is not None:
+            names.append(node.variant.name)
+        cls = self.declare_class(name, names)
+
+        lines = []
+        targets = ['v{}'.format(i) for i in range(len(names))]
+        layouts = []
+        for field, target in zip(node.encoded_fields + (None,), targets + [None]):
+            layout = None
+            if field is not None and type(field) is not StructDef:
+                layout = self.node_layout(field)
+            if layout is not None:
+                layouts.append((layout, target))
+                continue
+            if layouts:
+                self.run([l for l, _ in layouts], [t for _, t in layouts], lines)
+                layouts = []
+            if field is not None:
+                self.field(field, node, target, lines)
+
+        variant = node.variant
+        selector = False
+        if variant is not None:
+            index = _selector_index(node)
+            if index is None:
+                selector = True
+                lines.extend(['if selector is None:',
+                              "    raise CodecError('{} needs the value of its "
+                              "selector')".format(name)])
+            else:
+                lines.append('selector = v{}'.format(index))
+            arms = '_arms_' + name
+            lines.extend([
+                'arm = {}.get(selector)'.format(arms),
+                'if arm is None:',
+                "    raise CodecError('no case for %s in {}' % (selector,))".format(name),
+                '{}, pos = arm(buf, pos)'.format(targets[-1]),
+            ])
+            self.variant_arms(arms, variant)
+
+        lines.append('return _new({}, ({}{})), pos'.format(
+            cls, ', '.join(targets), ',' if len(targets) == 1 else ''))
+        self.emit(function, lines, selector)
+        if self.has_view(node):
+            self.view(node, name, names)
+
+    def variant_arms(self, arms, variant, function=None):
+        definition = self.table.enum(variant.selector)
+        if definition is None:
+            raise CodecError('select ({}) is not an enum'.format(variant.selector))
+        self.layout(variant.selector)
+        entries = collections.OrderedDict()
+        for case in variant.cases:
+            name = (function or self.function)(case.type)
+            for label in case.labels:
+                if label not in definition.members:
+                    raise CodecError('{} is not a member of {}'.format(
+                        label, variant.selector))
+                entries.setdefault(definition.members[label], name)
+        self.tail.append('{} = {{{}}}'.format(arms, ', '.join(
+            '{}: {}'.format(v, f) for v, f in entries.items())))
+
+    # views
+
+    def has_view(self, node):
+        '''Whether a structure gets a view, which is whether it decodes
+        without the value of a selector.'''
+        if self.views is None or node.cryptographic_attribute is not None:
+            return False
+        return node.variant is None or _selector_index(node) is not None
+
+    def view_function(self, name):
+        '''The function making the view of the type called name, its
+        decoder if it has none.'''
+        function = self.function(name)
+        definition = self.table.get(name)
+        if definition is not None and type(definition.node) is StructDef and \
+                self.has_view(definition.node):
+            return '_view_' + name
+        return function
+
+    def nested_view(self, node, parent):
+        function = self.nested_function(node, parent)
+        if self.has_view(node):
+            return '_view_' + typename(node, parent, with_crypto_attr=False)
+        return function
+
+    def skip(self, node, parent, lines):
+        '''Advance pos over a field of a variable size, reading only the
+        length prefixes of its views.'''
+        typ = type(node)
+        if typ is VectorField:
+            self.vector_bounds(node, lines)
+            lines.append('pos = end')
+        elif typ is FieldDef:
+            definition = self.table.get(node.type)
+            if definition is not None and type(definition.node) is VectorField:
+                self.skip(definition.node, None, lines)
+            else:
+                lines.append('_, pos = {}(buf, pos)'.format(self.view_function(node.type)))
+        elif typ is StructDef and node.cryptographic_attribute is None:
+            lines.append('_, pos = {}(buf, pos)'.format(self.nested_view(node, parent)))
+        else:
+            self.field(node, parent, '_', lines)
+
+    def view_field(self, node, parent, lines):
+        '''Decode a field at pos into value, as a view if it is a
+        structure of a variable size.'''
+        if not self.sizes.node_size(node).fixed:
+            if type(node) is FieldDef:
+                function = self.view_function(node.type)
+                if function.startswith('_view_'):
+                    lines.append('value, pos = {}(buf, pos)'.format(function))
+                    return
+            elif type(node) is StructDef and self.has_view(node):
+                lines.append('value, pos = {}(buf, pos)'.format(self.nested_view(node, parent)))
+                return
+        self.field(node, parent, 'value', lines)
+
+    def view(self, node, name, names):
+        '''The view class of a structure and _view_<name>(buf, pos), which
+        finds the offsets of its fields. Fields of a fixed size are
+        skipped by adding their sizes up.'''
+        lines = ['o0 = pos']
+        pending = 0
+        count = len(node.encoded_fields)
+        for i, field in enumerate(node.encoded_fields):
+            size = self.sizes.node_size(field)
+            if size.fixed:
+                pending += size.min
+                lines.append('o{} = pos + {}'.format(i + 1, pending))
+                continue
+            if pending:
+                lines.append('pos += {}'.format(pending))
+                pending = 0
+            self.skip(field, node, lines)
+            lines.append('o{} = pos'.format(i + 1))
+        if pending:
+            lines.append('pos += {}'.format(pending))
+
+        variant = node.variant
+        arms = '_view_arms_' + name
+        if variant is not None:
+            index = _selector_index(node)
+            lines.extend([
+                'selector = {}(buf, o{})[0]'.format(self.function(variant.selector), index),
+                'arm = {}.get(selector)'.format(arms),
+                'if arm is None:',
+                "    raise CodecError('no case for %s in {}' % (selector,))".format(name),
+                '_, pos = arm(buf, pos)',
+                'o{} = pos'.format(count + 1),
+            ])
+            self.variant_arms(arms, variant, self.view_function)
+            count += 1
+        lines.extend([
+            'if pos > len(buf):',
+            "    raise CodecError('truncated {}')".format(name),
+            'return _w_{}(buf, ({}{})), pos'.format(
+                name, ', '.join('o{}'.format(i) for i in range(count + 1)),
+                ',' if count == 0 else ''),
+        ])
+        self.emit('_view_' + name, lines)
+        self.views.append(name)
+
+        body = ['_name = {!r}'.format(name),
+                '_fields = {!r}'.format(tuple(python_name(n) for n in names))]
+        for i, field in enumerate(node.encoded_fields):
+            field_lines = []
+            self.view_field(field, node, field_lines)
+            body.extend([''] + self.view_property(names[i], i, field_lines))
+        if variant is not None:
+            body.extend([''] + self.view_property(names[-1], count - 1, [
+                'selector = self.{}'.format(python_name(names[_selector_index(node)])),
+                'value, pos = {}[selector](buf, pos)'.format(arms)]))
+        self.lines.extend(['', '', 'class _w_{}(_View):'.format(name),
+                           '    __slots__ = ()'])
+        self.lines.extend(('    ' + line).rstrip() for line in body)
+
+    def view_property(self, name, index, lines):
+        # the field is only validated now, a length inside it may point
+        # beyond the buffer
+        return ['@property',
+                'def {}(self):'.format(python_name(name)),
+                '    buf = self._buf',
+                '    pos = self._offsets[{}]'.format(index),
+                '    try:'] + ['        ' + line for line in lines] + [
+                '    except (_StructError, IndexError):',
+                '        raise CodecError({!r}) from None'.format('truncated ' + name),
+                '    return value']
+
+    def source(self):
+        decoders = ['    {!r}: {},'.format(n, f)
+                    for n, f in sorted(self.functions.items())]
+        types = ['    {!r}: _t_{},'.format(n, n) for n in self.types]
+        lines = self.declarations + self.lines + [''] + self.tail + [
+            '',
+            'decoders = {'] + decoders + ['}', '', 'types = {'] + types + ['}']
+        if self.views is not None:
+            lines += ['', 'views = {'] + ['    {!r}: _view_{},'.format(n, n)
+                                          for n in sorted(self.views)] + ['}']
+        return '\n'.join(lines) + '\n'
+
+
+def compile_python_decoders(definitions, table=None, views=False):
+    '''Return the source of the decoders of all types of table, by default
+    of those of definitions, given as IR or as a parse tree, and with views
+    the views of their structures.'''
+    if table is None:
+        if not isinstance(definitions, tuple):
+            definitions = lower(definitions)
+        table = SymbolTable().add(definitions)
+    generator = _Generator(table, views)
+    for definition in table:
+        generator.function(definition.name)
+    return generator.source()
+
+
+class View(object):
+    '''A structure whose fields are decoded when they are accessed, from
+    buf at the offsets of its fields and of its end.'''
+    __slots__ = ('_buf', '_offsets')
+    _name = None
+    _fields = ()
+
+    def __init__(self, buf, offsets):
+        self._buf = buf
+        self._offsets = offsets
+
+    def as_bytes(self):
+        return self._buf[self._offsets[0]:self._offsets[-1]]
+
+    def __repr__(self):
+        return '<{} view of {} bytes>'.format(self._name,
+                                              self._offsets[-1] - self._offsets[0])
+
+
+# the namespaces of the most recently loaded modules, by their source
+_modules = collections.OrderedDict()
+max_modules = 64
+
+
+def load(source):
+    '''The namespace of the module source, executed once per process
+    unless more than max_modules others were loaded since.'''
+    namespace = _modules.get(source)
+    if namespace is not None:
+        _modules.move_to_end(source)
+    else:
+        namespace = {
+            'CodecError': CodecError,
+            'DigitallySigned': DigitallySigned,
+            '_IntEnum': enum.IntEnum,
+            '_Struct': struct.Struct,
+            '_StructError': struct.error,
+            '_View': View,
+            '_namedtuple': collections.namedtuple,
+            '_new': tuple.__new__,
+            '_unpack_from': struct.unpack_from,
+        }
+        exec(compile(source, '<python_compiler>', 'exec'), namespace)
+        _modules[source] = namespace
+        if len(_modules) > max_modules:
+            _modules.popitem(last=False)
+    return namespace
+
+
+class CompiledCodec(Codec):
+    def __init__(self, definitions, table=None):
+        super(CompiledCodec, self).__init__(definitions, table)
+        self.source = compile_python_decoders(None, self.table, views=True)
+        namespace = load(self.source)
+        self._decoders = namespace['decoders']
+        self._python_types = namespace['types']
+        self._views = namespace['views']
+
+    def python_type(self, name):
+        return self._python_types[name]
+
+    def decode_from(self, name, data, offset=0, selector=None):
+        decode = self._decoders.get(name)
+        if decode is None:
+            raise CodecError('undefined type {}'.format(name))
+        buf = data if type(data) is memoryview else memoryview(data)
+        try:
+            if selector is None:
+                return decode(buf, offset)
+            return decode(buf, offset, selector)
+        except (struct.error, IndexError):
+            raise CodecError('truncated {}'.format(name))
+
+    def view(self, name, data):
+        '''The View of the structure name in all of data. Making it only
+        reads the length prefixes, a field is decoded, and validated, every
+        time it is accessed, fields that are structures of a variable size
+        to their views.'''
+        make = self._views.get(name)
+        if make is None:
+            raise CodecError('{} has no view'.format(name))
+        buf = data if type(data) is memoryview else memoryview(data)
+        try:
+            view, end = make(buf, 0)
+        except (struct.error, IndexError):
+            raise CodecError('truncated {}'.format(name))
+        if end != len(buf):
+            raise CodecError('{} trailing bytes after {}'.format(len(buf) - end, name))
+        return view
@@ -0,0 +1,158 @@
+'''
+Decodes a stream of records, from a binary file, a socket or an asyncio
+stream, one record at a time in a buffer of a fixed size.
+
+    stream = RecordStream(CompiledCodec(parsers.parse(spec)), 'TLSPlaintext')
+    with open('capture.bin', 'rb') as f:
+        for record in stream.messages(f):
+            print(record.type, len(record.fragment))
+
+    async for record in stream.amessages(reader):
+        ...
+
+The records are framed by the type: all of its fields but the last have
+a fixed size and the last is a variable vector, like the fragment of
+TLSPlaintext, whose length prefix gives the size of the record. The
+input is read into a single bytearray big enough for two of the largest
+records the ceiling of the vector allows, so memory does not depend on the
+size of the input, and a record longer than the ceiling is rejected as
+soon as its prefix is read.
+
+The values are decoded by the codec, a python_codec.Codec or a
+python_compiler.CompiledCodec, from a view of the buffer, so like the
+records of records() they are only valid until the next one is taken,
+unless the stream is created with copy=True.
+'''
+import collections
+
+from ir import StructDef, FieldDef, VectorField
+from python_codec import CodecError
+from wire_size import WireSizes, prefix_width
+
+
+class Framing(collections.namedtuple('Framing', ['header', 'width', 'ceiling'])):
+    '''The length prefix of the records of a type: width bytes after header
+    bytes of fixed fields, counting up to ceiling bytes that follow it.'''
+    __slots__ = ()
+
+    @property
+    def size(self):
+        '''The size of the largest record.'''
+        return self.header + self.width + self.ceiling
+
+    def length(self, buf, pos):
+        start = pos + self.header
+        return int.from_bytes(buf[start:start + self.width], 'big')
+
+
+def framing(table, name):
+    '''The Framing of the records of the type called name.'''
+    definition = table.get(name)
+    if definition is None or type(definition.node) is not StructDef:
+        raise CodecError('{} is not a structure'.format(name))
+    node = definition.node
+    fields = node.encoded_fields
+    if not fields or node.variant is not None:
+        raise CodecError('{} does not end with a vector'.format(name))
+    last = fields[-1]
+    if type(last) is FieldDef and table.get(last.type) is not None:
+        last = table.get(last.type).node
+    if type(last) is not VectorField or not last.variable:
+        raise CodecError('{} does not end with a variable vector'.format(name))
+
+    sizes = WireSizes(table)
+    header = 0
+    for field in fields[:-1]:
+        size = sizes.node_size(field)
+        if not size.fixed:
+            raise CodecError('{} of {} has no fixed size'.format(
+                getattr(field, 'name', None), name))
+        header += size.min
+    return Framing(header, prefix_width(last.ceiling), last.ceiling)
+
+
+class RecordStream(object):
+    def __init__(self, codec, name, copy=False):
+        self.codec = codec
+        self.name = name
+        self.copy = copy
+        self.framing = framing(codec.table, name)
+        self.buffer = bytearray(2 * self.framing.size)
+        self._view = memoryview(self.buffer)
+        self.start = self.end = 0
+
+    def _record(self):
+        '''The next whole record in the buffer, or None.'''
+        framing = self.framing
+        available = self.end - self.start
+        header = framing.header + framing.width
+        if available < header:
+            return None
+        length = framing.length(self._view, self.start)
+        if length > framing.ceiling:
+            raise CodecError('invalid length {} of {}'.format(length, self.name))
+        if available < header + length:
+            return None
+        start = self.start
+        self.start += header + length
+        return self._view[start:self.start]
+
+    def _space(self):
+        '''A view of the free end of the buffer, at least as large as a
+        record, after moving the rest of the input to the front.'''
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buffer) - self.end < self.framing.size:
+            rest = bytes(self._view[self.start:self.end])
+            self.buffer[:len(rest)] = rest
+            self.start, self.end = 0, len(rest)
+        return self._view[self.end:]
+
+    def _finish(self):
+        if self.start != self.end:
+            raise CodecError('truncated {}'.format(self.name))
+
+    def records(self, source):
+        '''Yield a view of every record of source, a binary file, a socket
+        or any object with a read method.'''
+        readinto = getattr(source, 'recv_into', None) or getattr(source, 'readinto', None)
+        while True:
+            record = self._record()
+            if record is not None:
+                yield record
+                continue
+            space = self._space()
+            if readinto is not None:
+                count = readinto(space)
+            else:
+                data = source.read(len(space))
+                count = len(data)
+                space[:count] = data
+            if not count:
+                self._finish()
+                return
+            self.end += count
+
+    def messages(self, source):
+        '''Yield every record of source decoded.'''
+        decode = self.codec.decode
+        name = self.name
+        for record in self.records(source):
+            yield decode(name, bytes(record) if self.copy else record)
+
+    async def amessages(self, reader):
+        '''Yield every record of an asyncio.StreamReader decoded.'''
+        decode = self.codec.decode
+        name = self.name
+        while True:
+            record = self._record()
+            if record is not None:
+                yield decode(name, bytes(record) if self.copy else record)
+                continue
+            space = self._space()
+            data = await reader.read(len(space))
+            if not data:
+                self._finish()
+                return
+            space[:len(data)] = data
+            self.end += len(data)
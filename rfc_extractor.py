@@ -0,0 +1,139 @@
+'''
+Extracts presentation language definitions from RFC text files.
+
+The file is read line by line. Prose, page footers, form feeds and page
+headers are dropped, and every definition is handed to the parser as soon
+as its last line has been read, so only the definition being collected is
+kept in memory:
+
+    with open('rfc5246.txt') as f:
+        for block, ast in iter_definitions(f):
+            print(compile_packet_representation(ast))
+'''
+import collections
+import re
+import sys
+
+import parsers
+
+_start = re.compile(r'''^\s*
+    (?:(?:digitally-signed|stream-ciphered|block-ciphered|aead-ciphered|
+          public-key-encrypted)\s+)?
+    (?:struct|enum)\s*\{''', re.X)
+# a single line declaration starts with a builtin type or a capitalized
+# type name followed by an identifier, so prose ending in ; is no match
+_declaration = re.compile(r'''^\s*
+    (?:opaque|uint\d+|[A-Z]\w*)\s+[A-Za-z_]\w*\s*
+    (?:\[\s*[\w^-]+\s*\]|<\s*[\w^-]+\s*\.\.\s*[\w^-]+\s*>)?
+    \s*;\s*$''', re.X)
+_footer = re.compile(r'\[Page \d+\]\s*$')
+_header = re.compile(r'^RFC \d+\s')
+_comment = re.compile(r'/\*.*?\*/')
+
+Block = collections.namedtuple('Block', ['lineno', 'text'])
+
+
+def _strip_comments(lines):
+    in_comment = False
+    for number, line in lines:
+        if in_comment:
+            end = line.find('*/')
+            if end < 0:
+                continue
+            line = line[end + 2:]
+            in_comment = False
+
+        line = _comment.sub('', line)
+        start = line.find('/*')
+        if start >= 0:
+            line = line[:start]
+            in_comment = True
+        yield number, line.rstrip()
+
+
+def _strip_page_breaks(lines):
+    '''Drop page footers, form feeds and the page header following them.'''
+    after_break = False
+    for number, line in lines:
+        if _footer.search(line):
+            after_break = True
+            continue
+        if after_break:
+            line = line.lstrip('\f')
+            if not line.strip():
+                continue
+            after_break = False
+            if _header.match(line):
+                continue
+        elif line.startswith('\f'):
+            after_break = True
+            continue
+        yield number, line
+
+
+def extract_blocks(lines, max_lines=1000):
+    '''Yield a Block for every struct, enum or single line vector or scalar
+    declaration in lines, with comments and page breaks removed.'''
+    lines = _strip_page_breaks(_strip_comments(enumerate(lines, 1)))
+
+    collected = []
+    depth = 0
+    lineno = 0
+    for number, line in lines:
+        if not collected:
+            if _declaration.match(line):
+                yield Block(number, line.strip())
+                continue
+            if not _start.match(line):
+                continue
+            lineno = number
+
+        if not line.strip():
+            continue
+        collected.append(line)
+        depth += line.count('{') - line.count('}')
+
+        if depth <= 0 and line.endswith(';'):
+            yield Block(lineno, _dedent(collected))
+            collected = []
+            depth = 0
+        elif len(collected) >= max_lines:
+            # an unbalanced brace in prose, give up on this block
+            collected = []
+            depth = 0
+
+
+def _dedent(lines):
+    indent = min(len(l) - len(l.lstrip()) for l in lines)
+    return '\n'.join(l[indent:] for l in lines)
+
+
+def iter_definitions(lines, backend=None, strict=False):
+    '''Yield (block, ast) for every block in lines that parses.
+
+    Blocks which do not follow the grammar, like examples containing
+    ellipses, are skipped unless strict is set.'''
+    for block in extract_blocks(lines):
+        try:
+            ast = parsers.parse(block.text, backend=backend)
+        except SyntaxError as e:
+            if strict:
+                e.lineno = (e.lineno or 1) + block.lineno - 1
+                raise
+            continue
+        yield block, ast
+
+
+def main(argv):
+    from rust_compiler import compile_packet_representation
+
+    for filename in argv[1:]:
+        with open(filename) as f:
+            for block, ast in iter_definitions(f, backend='fast'):
+                print('// {}:{}'.format(filename, block.lineno))
+                print(compile_packet_representation(ast))
+                print(flush=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
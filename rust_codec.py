@@ -0,0 +1,1344 @@
+'''
+Generates Rust code that decodes and encodes the wire format of the
+definitions.
+
+compile_packet_representation() only declares types. compile_decoders()
+declares them again with borrowed fields and implements the Parse trait of
+runtime for each of them:
+
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])>
+
+Decoding never allocates. Vectors of opaque or uint8 borrow the input as
+&'a [u8] (or &'a [u8; N] for constant vectors). Vectors of other types
+are views of the input: Uints<'a, T> for uint16, uint24, uint32 and
+uint64 elements and Array<'a, T, SIZE> for elements of another fixed size
+are checked to hold a whole number of elements once, have a len() and
+read an element in place by get(i) or iter(). The elements of a
+Vector<'a, T> differ in size and are decoded while iterating. The
+length prefix of a variable vector is as wide as its ceiling needs, and
+enums are as wide as their width or their largest value (RFC 5246 4.3 and
+4.5). Types that borrow from the input take a lifetime parameter, so
+references to types of other files need a symbols.SymbolTable of all of
+them.
+
+The Rust enum of an enum has the representation of its wire format,
+uint24 as u32, and converts from it with TryFrom: through a table indexed
+by the value if the values are dense, by a binary search of the sorted
+values if they are sparse, like the registry of cipher suites.
+
+The contents of cryptographically protected structures are not decoded:
+a digitally-signed structure is read as the DigitallySigned struct of RFC
+5246 4.7, a public-key-encrypted one as opaque<0..2^16-1>, and a ciphered
+one as the rest of the input, which the enclosing record delimits. The
+plaintext structure still gets its own parse() for use after decryption.
+
+A variant is selected by the last field before it whose type is the
+selector enum. Without such a field the structure has an inherent
+parse_with() taking the selector value instead of implementing Parse.
+The dispatch is a single match on the selector that lists every member
+of the enum, so rustc checks that it is exhaustive and compiles it to a
+jump table where the values are dense. Fall-through labels (case a: case
+b: T;) share one arm. A member without a case is a GenerationError, RFC
+5246 4.6.1 requires one for every member, unless partial_variants is set,
+then the members without a case are InvalidValue.
+
+An enum without values (enum { low, medium, high } Amount;) has no wire
+format: it still implements Parse, and Encode with encoders, so that
+structures can refer to it, but both fail with NoWireFormat.
+
+With encoders, every type also implements Encode:
+
+    fn encoded_len(&self) -> usize
+    fn encode_into(&self, buf: &mut [u8]) -> Result<usize>
+
+Neither allocates. Types of a fixed size have an ENCODED_LEN constant
+and an encode_array() writing into a [u8; ENCODED_LEN] without any
+further checks, encode_into() checks the length of buf once and calls it.
+The constant part of the length of other types is summed up when the
+code is generated.
+
+With views, every structure that implements Parse also gets a view, like
+
+    pub struct ClientHelloView<'a> { bytes: &'a [u8], ends: [usize; 3] }
+
+whose parse() only reads the length prefixes of the fields of a variable
+size and stores where they end, fields of a fixed size are at constant
+offsets. An accessor decodes its field from the bytes between them when
+it is called, the view of the field if it is a structure of a variable
+size. A variant is decoded with its case, whose bytes <variant>_bytes()
+returns for the view of its type.
+
+runtime has to be emitted once per Rust module.
+'''
+import collections
+
+from ir import StructDef, EnumDef, FieldDef, VectorField, lower
+from rust_compiler import implicit_types, typename, fieldname
+from symbols import SymbolTable, uncovered
+from wire_size import WireSizes, prefix_width, enum_width
+
+
+
+class GenerationError(Exception):
+    '''A definition that cannot be compiled to Rust.'''
+
+
+runtime = '''\
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub enum Error {
+    Truncated,
+    InvalidLength,
+    InvalidValue,
+    NoWireFormat,
+}
+
+pub type Result<T> = core::result::Result<T, Error>;
+
+pub trait Parse<'a>: Sized {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])>;
+}
+
+pub trait Encode {
+    fn encoded_len(&self) -> usize;
+    /// Write self to the start of buf and return the number of bytes written.
+    fn encode_into(&self, buf: &mut [u8]) -> Result<usize>;
+}
+
+#[inline]
+pub fn take(input: &[u8], len: usize) -> Result<(&[u8], &[u8])> {
+    if input.len() < len {
+        return Err(Error::Truncated);
+    }
+    Ok(input.split_at(len))
+}
+
+#[inline]
+pub fn take_array<const N: usize>(input: &[u8]) -> Result<(&[u8; N], &[u8])> {
+    let (bytes, input) = take(input, N)?;
+    Ok((bytes.try_into().unwrap(), input))
+}
+
+#[inline]
+pub fn read_uint(input: &[u8], width: usize) -> Result<(u64, &[u8])> {
+    let (bytes, input) = take(input, width)?;
+    Ok((bytes.iter().fold(0, |value, &b| value << 8 | b as u64), input))
+}
+
+#[inline]
+pub fn read_u8(input: &[u8]) -> Result<(u8, &[u8])> {
+    let (bytes, input) = take_array::<1>(input)?;
+    Ok((bytes[0], input))
+}
+
+#[inline]
+pub fn read_u16(input: &[u8]) -> Result<(u16, &[u8])> {
+    let (bytes, input) = take_array::<2>(input)?;
+    Ok((u16::from_be_bytes(*bytes), input))
+}
+
+#[inline]
+pub fn read_u24(input: &[u8]) -> Result<(u32, &[u8])> {
+    let (bytes, input) = take_array::<3>(input)?;
+    Ok((u32::from_be_bytes([0, bytes[0], bytes[1], bytes[2]]), input))
+}
+
+#[inline]
+pub fn read_u32(input: &[u8]) -> Result<(u32, &[u8])> {
+    let (bytes, input) = take_array::<4>(input)?;
+    Ok((u32::from_be_bytes(*bytes), input))
+}
+
+#[inline]
+pub fn read_u64(input: &[u8]) -> Result<(u64, &[u8])> {
+    let (bytes, input) = take_array::<8>(input)?;
+    Ok((u64::from_be_bytes(*bytes), input))
+}
+
+/// The contents of a variable vector: a length prefix of width bytes
+/// followed by floor to ceiling bytes.
+#[inline]
+pub fn take_vector(input: &[u8], width: usize, floor: u64, ceiling: u64)
+                   -> Result<(&[u8], &[u8])> {
+    let (len, input) = read_uint(input, width)?;
+    if len < floor || len > ceiling {
+        return Err(Error::InvalidLength);
+    }
+    take(input, len as usize)
+}
+
+/// The encoding of a T at the start of input and the rest of input.
+#[inline]
+pub fn skip<'a, T: Parse<'a>>(input: &'a [u8]) -> Result<(&'a [u8], &'a [u8])> {
+    let (_, rest) = T::parse(input)?;
+    Ok(input.split_at(input.len() - rest.len()))
+}
+
+#[inline]
+pub fn put_bytes(buf: &mut [u8], bytes: &[u8]) -> Result<usize> {
+    let dest = buf.get_mut(..bytes.len()).ok_or(Error::Truncated)?;
+    dest.copy_from_slice(bytes);
+    Ok(bytes.len())
+}
+
+#[inline]
+pub fn put_uint(buf: &mut [u8], value: u64, width: usize) -> Result<usize> {
+    put_bytes(buf, &value.to_be_bytes()[8 - width..])
+}
+
+#[inline]
+pub fn put_exact(buf: &mut [u8], bytes: &[u8], len: usize) -> Result<usize> {
+    if bytes.len() != len {
+        return Err(Error::InvalidLength);
+    }
+    put_bytes(buf, bytes)
+}
+
+/// A variable vector: its length as a prefix of width bytes and bytes.
+#[inline]
+pub fn put_vector(buf: &mut [u8], bytes: &[u8], width: usize, floor: u64, ceiling: u64)
+                  -> Result<usize> {
+    let len = bytes.len() as u64;
+    if len < floor || len > ceiling {
+        return Err(Error::InvalidLength);
+    }
+    let at = put_uint(buf, len, width)?;
+    Ok(at + put_bytes(&mut buf[at..], bytes)?)
+}
+
+impl<'a> Parse<'a> for u8 {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> { read_u8(input) }
+}
+
+impl<'a> Parse<'a> for u16 {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> { read_u16(input) }
+}
+
+impl<'a> Parse<'a> for u32 {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> { read_u32(input) }
+}
+
+impl<'a> Parse<'a> for u64 {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> { read_u64(input) }
+}
+
+/// A uint24 element of a vector.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub struct U24(pub u32);
+
+impl<'a> Parse<'a> for U24 {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {
+        let (value, input) = read_u24(input)?;
+        Ok((U24(value), input))
+    }
+}
+
+/// The encoded elements of a vector, decoded one by one while iterating.
+pub struct Vector<'a, T> {
+    bytes: &'a [u8],
+    element: core::marker::PhantomData<T>,
+}
+
+impl<'a, T> Vector<'a, T> {
+    pub fn new(bytes: &'a [u8]) -> Self {
+        Vector { bytes, element: core::marker::PhantomData }
+    }
+
+    pub fn as_bytes(&self) -> &'a [u8] {
+        self.bytes
+    }
+
+    pub fn iter(&self) -> VectorIter<'a, T> {
+        VectorIter { bytes: self.bytes, element: core::marker::PhantomData }
+    }
+}
+
+impl<'a, T> Clone for Vector<'a, T> {
+    fn clone(&self) -> Self {
+        *self
+    }
+}
+
+impl<'a, T> Copy for Vector<'a, T> {}
+
+impl<'a, T> PartialEq for Vector<'a, T> {
+    fn eq(&self, other: &Self) -> bool {
+        self.bytes == other.bytes
+    }
+}
+
+impl<'a, T> Eq for Vector<'a, T> {}
+
+impl<'a, T> core::fmt::Debug for Vector<'a, T> {
+    fn fmt(&self, f: &mut core::fmt::Formatter) -> core::fmt::Result {
+        f.debug_tuple("Vector").field(&self.bytes).finish()
+    }
+}
+
+pub struct VectorIter<'a, T> {
+    bytes: &'a [u8],
+    element: core::marker::PhantomData<T>,
+}
+
+impl<'a, T: Parse<'a>> Iterator for VectorIter<'a, T> {
+    type Item = Result<T>;
+
+    fn next(&mut self) -> Option<Result<T>> {
+        if self.bytes.is_empty() {
+            return None;
+        }
+        match T::parse(self.bytes) {
+            Ok((element, rest)) => {
+                self.bytes = rest;
+                Some(Ok(element))
+            }
+            Err(e) => {
+                self.bytes = &[];
+                Some(Err(e))
+            }
+        }
+    }
+}
+
+/// An unsigned integer element of a vector, read in place.
+pub trait Uint: Copy {
+    const SIZE: usize;
+    /// Decode the first SIZE bytes of bytes.
+    fn from_be(bytes: &[u8]) -> Self;
+}
+
+impl Uint for u16 {
+    const SIZE: usize = 2;
+    #[inline]
+    fn from_be(bytes: &[u8]) -> Self {
+        u16::from_be_bytes([bytes[0], bytes[1]])
+    }
+}
+
+impl Uint for U24 {
+    const SIZE: usize = 3;
+    #[inline]
+    fn from_be(bytes: &[u8]) -> Self {
+        U24(u32::from_be_bytes([0, bytes[0], bytes[1], bytes[2]]))
+    }
+}
+
+impl Uint for u32 {
+    const SIZE: usize = 4;
+    #[inline]
+    fn from_be(bytes: &[u8]) -> Self {
+        u32::from_be_bytes(bytes[..4].try_into().unwrap())
+    }
+}
+
+impl Uint for u64 {
+    const SIZE: usize = 8;
+    #[inline]
+    fn from_be(bytes: &[u8]) -> Self {
+        u64::from_be_bytes(bytes[..8].try_into().unwrap())
+    }
+}
+
+#[inline]
+fn whole_elements(bytes: &[u8], size: usize) -> Result<()> {
+    if bytes.len() % size != 0 {
+        return Err(Error::InvalidLength);
+    }
+    Ok(())
+}
+
+/// The elements of a vector of unsigned integers, read in place. Its
+/// length is a whole number of elements (RFC 5246 4.3).
+pub struct Uints<'a, T> {
+    bytes: &'a [u8],
+    element: core::marker::PhantomData<T>,
+}
+
+impl<'a, T: Uint + 'a> Uints<'a, T> {
+    pub fn new(bytes: &'a [u8]) -> Result<Self> {
+        whole_elements(bytes, T::SIZE)?;
+        Ok(Uints { bytes, element: core::marker::PhantomData })
+    }
+
+    pub fn as_bytes(&self) -> &'a [u8] {
+        self.bytes
+    }
+
+    pub fn len(&self) -> usize {
+        self.bytes.len() / T::SIZE
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.bytes.is_empty()
+    }
+
+    pub fn get(&self, index: usize) -> Option<T> {
+        let start = index.checked_mul(T::SIZE)?;
+        self.bytes.get(start..)?.get(..T::SIZE).map(T::from_be)
+    }
+
+    pub fn iter(&self) -> impl ExactSizeIterator<Item = T> + 'a {
+        self.bytes.chunks_exact(T::SIZE).map(T::from_be)
+    }
+}
+
+impl<'a, T> Clone for Uints<'a, T> {
+    fn clone(&self) -> Self {
+        *self
+    }
+}
+
+impl<'a, T> Copy for Uints<'a, T> {}
+
+impl<'a, T> PartialEq for Uints<'a, T> {
+    fn eq(&self, other: &Self) -> bool {
+        self.bytes == other.bytes
+    }
+}
+
+impl<'a, T> Eq for Uints<'a, T> {}
+
+impl<'a, T> core::fmt::Debug for Uints<'a, T> {
+    fn fmt(&self, f: &mut core::fmt::Formatter) -> core::fmt::Result {
+        f.debug_tuple("Uints").field(&self.bytes).finish()
+    }
+}
+
+/// The elements of a vector of a type of SIZE bytes, decoded when they
+/// are accessed. Its length is a whole number of elements.
+pub struct Array<'a, T, const SIZE: usize> {
+    bytes: &'a [u8],
+    element: core::marker::PhantomData<T>,
+}
+
+impl<'a, T: Parse<'a> + 'a, const SIZE: usize> Array<'a, T, SIZE> {
+    pub fn new(bytes: &'a [u8]) -> Result<Self> {
+        whole_elements(bytes, SIZE)?;
+        Ok(Array { bytes, element: core::marker::PhantomData })
+    }
+
+    pub fn as_bytes(&self) -> &'a [u8] {
+        self.bytes
+    }
+
+    pub fn len(&self) -> usize {
+        self.bytes.len() / SIZE
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.bytes.is_empty()
+    }
+
+    pub fn get(&self, index: usize) -> Option<Result<T>> {
+        let start = index.checked_mul(SIZE)?;
+        let bytes = self.bytes.get(start..)?.get(..SIZE)?;
+        Some(T::parse(bytes).map(|(element, _)| element))
+    }
+
+    pub fn iter(&self) -> impl ExactSizeIterator<Item = Result<T>> + 'a {
+        self.bytes.chunks_exact(SIZE).map(|bytes| T::parse(bytes).map(|(element, _)| element))
+    }
+}
+
+impl<'a, T, const SIZE: usize> Clone for Array<'a, T, SIZE> {
+    fn clone(&self) -> Self {
+        *self
+    }
+}
+
+impl<'a, T, const SIZE: usize> Copy for Array<'a, T, SIZE> {}
+
+impl<'a, T, const SIZE: usize> PartialEq for Array<'a, T, SIZE> {
+    fn eq(&self, other: &Self) -> bool {
+        self.bytes == other.bytes
+    }
+}
+
+impl<'a, T, const SIZE: usize> Eq for Array<'a, T, SIZE> {}
+
+impl<'a, T, const SIZE: usize> core::fmt::Debug for Array<'a, T, SIZE> {
+    fn fmt(&self, f: &mut core::fmt::Formatter) -> core::fmt::Result {
+        f.debug_tuple("Array").field(&self.bytes).finish()
+    }
+}
+
+/// A digitally-signed element, RFC 5246 section 4.7.
+#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+pub struct DigitallySigned<'a> {
+    pub hash_algorithm: u8,
+    pub signature_algorithm: u8,
+    pub signature: &'a [u8],
+}
+
+impl<'a> Parse<'a> for DigitallySigned<'a> {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {
+        let (hash_algorithm, input) = read_u8(input)?;
+        let (signature_algorithm, input) = read_u8(input)?;
+        let (signature, input) = take_vector(input, 2, 0, 65535)?;
+        Ok((DigitallySigned { hash_algorithm, signature_algorithm, signature }, input))
+    }
+}
+
+impl<'a> Encode for DigitallySigned<'a> {
+    fn encoded_len(&self) -> usize {
+        4 + self.signature.len()
+    }
+
+    fn encode_into(&self, buf: &mut [u8]) -> Result<usize> {
+        let mut at = put_uint(buf, self.hash_algorithm as u64, 1)?;
+        at += put_uint(&mut buf[at..], self.signature_algorithm as u64, 1)?;
+        at += put_vector(&mut buf[at..], self.signature, 2, 0, 65535)?;
+        Ok(at)
+    }
+}
+'''
+
+scalar_types = {
+    'uint8': ('u8', 'read_u8', 'u8'),
+    'opaque': ('u8', 'read_u8', 'u8'),
+    'uint16': ('u16', 'read_u16', 'u16'),
+    'uint24': ('u32', 'read_u24', 'U24'),
+    'uint32': ('u32', 'read_u32', 'u32'),
+    'uint64': ('u64', 'read_u64', 'u64'),
+}
+
+byte_types = {'opaque', 'uint8'}
+
+keywords = set('''as break const continue crate else enum extern false fn for
+if impl in let loop match mod move mut pub ref return self Self static struct
+super trait true type unsafe use where while async await dyn abstract become
+box do final macro override priv typeof unsized virtual yield try'''.split())
+
+derive = '#[derive(Clone, Copy, Debug, PartialEq, Eq)]\n'
+
+# an enum whose values span less than this many times its number of
+# values is validated with a table indexed by the value
+dense_enum_ratio = 4
+allow = '#[allow(non_camel_case_types)]\n'
+
+
+def ident(name):
+    if name in keywords:
+        return 'r#' + name
+    return name
+
+
+# size is the encoded size of a fixed size field, the length of other
+# fields is prefix plus the value of the length expression
+_Field = collections.namedtuple('_Field', ['rust_type', 'parse', 'size',
+                                           'length', 'put', 'put_fixed',
+                                           'prefix'], defaults=[0])
+
+
+def _repr(width):
+    '''The Rust type of the values of an enum of width bytes.'''
+    return {1: 'u8', 2: 'u16', 3: 'u32', 4: 'u32'}.get(width, 'u64')
+
+
+def _read(width):
+    read = {1: 'read_u8', 2: 'read_u16', 3: 'read_u24', 4: 'read_u32',
+            8: 'read_u64'}.get(width)
+    if read is None:
+        return 'read_uint(input, {})'.format(width)
+    return '{}(input)'.format(read)
+
+
+def _wrap(items, indent):
+    '''items separated by commas, as many on a line as fit in 80 columns.'''
+    lines = []
+    line = ''
+    for item in items:
+        if line and indent + len(line) + len(item) + 2 > 80:
+            lines.append(line.rstrip())
+            line = ''
+        line += item + ', '
+    lines.append(line.rstrip())
+    return ''.join(' ' * indent + l + '\n' for l in lines)
+
+
+def _alternatives(patterns):
+    '''patterns joined into an or-pattern, one per line if they do not fit
+    on the line of a match arm.'''
+    pattern = ' | '.join(patterns)
+    if len(pattern) <= 60:
+        return pattern
+    return '\n            | '.join(patterns)
+
+
+def _scalar_field(typ):
+    rust_type, read, _ = scalar_types[typ]
+    size = implicit_types[typ]['size']
+    if size == 1:
+        put_fixed = 'buf[{o}] = {v};'
+    elif size == 3:
+        put_fixed = 'buf[{o}..{e}].copy_from_slice(&{v}.to_be_bytes()[1..]);'
+    else:
+        put_fixed = 'buf[{o}..{e}].copy_from_slice(&{v}.to_be_bytes());'
+    return _Field(rust_type, '{}(input)'.format(read), size, str(size),
+                  'put_uint(&mut buf[at..], {{v}} as u64, {})'.format(size),
+                  put_fixed)
+
+
+def _encoded_field(rust_type, parse, size):
+    '''A field of a type that implements Encode.'''
+    if size is None:
+        return _Field(rust_type, parse, None, '{v}.encoded_len()',
+                      '{v}.encode_into(&mut buf[at..])', None)
+    return _Field(rust_type, parse, size, str(size),
+                  '{v}.encode_into(&mut buf[at..])',
+                  '{v}.encode_array((&mut buf[{o}..{e}]).try_into().unwrap());')
+
+
+class _Codec(object):
+    def __init__(self, table, encoders, views=False, partial_variants=False):
+        self.table = table
+        self.encoders = encoders
+        self.views = views
+        self.partial_variants = partial_variants
+        self.sizes = WireSizes(table)
+        self._borrows = {}
+        self._sizes = {}
+        self.items = []
+
+    # lifetimes
+
+    def borrows(self, name):
+        '''Whether the Rust type generated for the spec type name borrows
+        from the input.'''
+        if name in scalar_types:
+            return False
+        if name not in self._borrows:
+            definition = self.table.get(name)
+            # assume no borrowing while recursing, a type that contains
+            # itself borrows through its other fields or not at all
+            self._borrows[name] = False
+            if definition is None:
+                pass
+            elif type(definition.node) is StructDef:
+                # a reference by name is to the plaintext structure
+                self._borrows[name] = self._struct_borrows(definition.node)
+            else:
+                self._borrows[name] = self._field_borrows(definition.node)
+        return self._borrows[name]
+
+    def _field_borrows(self, node):
+        typ = type(node)
+        if typ is FieldDef:
+            return self.borrows(node.type)
+        elif typ is VectorField:
+            return True
+        elif typ is EnumDef:
+            return False
+        elif node.cryptographic_attribute is not None:
+            return True
+        return self._struct_borrows(node)
+
+    def _struct_borrows(self, node):
+        return (any(self._field_borrows(f) for f in node.encoded_fields) or
+                self._variant_borrows(node))
+
+    def _variant_borrows(self, node):
+        return node.variant is not None and any(self.borrows(c.type)
+                                                for c in node.variant.cases)
+
+    # sizes
+
+    def size(self, name):
+        '''The encoded size of the spec type name if it is fixed, else
+        None.'''
+        if name in scalar_types:
+            return implicit_types[name]['size']
+        if name not in self._sizes:
+            definition = self.table.get(name)
+            self._sizes[name] = None
+            if definition is None:
+                pass
+            elif type(definition.node) is StructDef:
+                self._sizes[name] = self._struct_size(definition.node)
+            elif type(definition.node) is EnumDef:
+                if definition.node.external:
+                    self._sizes[name] = enum_width(definition.node)
+            else:
+                self._sizes[name] = self._field_size(definition.node)
+        return self._sizes[name]
+
+    def _field_size(self, node):
+        typ = type(node)
+        if typ is FieldDef:
+            return self.size(node.type)
+        elif typ is VectorField:
+            # the size of a constant vector is in bytes already
+            return None if node.variable else node.size
+        elif node.cryptographic_attribute is not None:
+            return None
+        return self._struct_size(node)
+
+    def _struct_size(self, node):
+        if node.variant is not None:
+            return None
+        sizes = [self._field_size(f) for f in node.encoded_fields]
+        if None in sizes:
+            return None
+        return sum(sizes)
+
+    def type_ref(self, name):
+        if name in scalar_types:
+            return scalar_types[name][0]
+        if self.borrows(name):
+            return "{}<'a>".format(name)
+        return name
+
+    def element_ref(self, name):
+        if name in scalar_types:
+            return scalar_types[name][2]
+        return self.type_ref(name)
+
+    # fields
+
+    def field(self, node, parent):
+        '''Return the _Field of a structure field or of the target of an
+        alias.'''
+        typ = type(node)
+        if typ is FieldDef:
+            return self.named(node.type)
+        elif typ is VectorField:
+            return self.vector(node)
+        else:
+            return self.nested(node, parent)
+
+    def named(self, name):
+        if name in scalar_types:
+            return _scalar_field(name)
+        return _encoded_field(self.type_ref(name), '{}::parse(input)'.format(name),
+                              self.size(name))
+
+    def vector(self, node):
+        if node.variable:
+            width = prefix_width(node.ceiling)
+            bounds = '{}, {}, {}'.format(width, node.floor, node.ceiling)
+            take = 'take_vector(input, {})'.format(bounds)
+            if node.type in byte_types:
+                return _Field("&'a [u8]", take, None, '{v}.len()',
+                              'put_vector(&mut buf[at..], {{v}}, {})'.format(bounds),
+                              None, width)
+            length = '{v}.as_bytes().len()'
+            put = 'put_vector(&mut buf[at..], {{v}}.as_bytes(), {})'.format(bounds)
+        else:
+            if node.type in byte_types:
+                return _Field("&'a [u8; {}]".format(node.size),
+                              'take_array::<{}>(input)'.format(node.size),
+                              node.size, str(node.size),
+                              'put_bytes(&mut buf[at..], {v})',
+                              'buf[{o}..{e}].copy_from_slice({v});')
+            take = 'take(input, {})'.format(node.size)
+            width = None
+            length = str(node.size)
+            put = 'put_exact(&mut buf[at..], {{v}}.as_bytes(), {})'.format(node.size)
+        # a view of a constant vector decoded from the input has its size,
+        # encode_array() panics on one of another size
+        fixed = None if node.variable else node.size
+        put_fixed = None if node.variable else 'buf[{o}..{e}].copy_from_slice({v}.as_bytes());'
+        size = self.size(node.type)
+        if node.type in scalar_types:
+            view = 'Uints'
+            rust_type = "Uints<'a, {}>".format(self.element_ref(node.type))
+        elif size:
+            view = 'Array'
+            rust_type = "Array<'a, {}, {}>".format(self.type_ref(node.type), size)
+        else:
+            return _Field("Vector<'a, {}>".format(self.element_ref(node.type)),
+                          '{}.map(|(bytes, input)| (Vector::new(bytes), input))'.format(take),
+                          fixed, length, put, put_fixed, width or 0)
+        # new() checks that the length is a whole number of elements
+        parse = '{}.and_then(|(bytes, input)| Ok(({}::new(bytes)?, input)))'.format(
+            take, view)
+        return _Field(rust_type, parse, fixed, length, put, put_fixed, width or 0)
+
+    def nested(self, node, parent):
+        self.structure(node, parent)
+        attr = node.cryptographic_attribute
+        if attr is None:
+            name = typename(node, parent, with_crypto_attr=False)
+            lifetime = "<'a>" if self._struct_borrows(node) else ''
+            return _encoded_field(name + lifetime, '{}::parse(input)'.format(name),
+                                  self._struct_size(node))
+        elif attr == 'digitally-signed':
+            return _encoded_field("DigitallySigned<'a>",
+                                  'DigitallySigned::parse(input)', None)
+        elif attr == 'public-key-encrypted':
+            return _Field("&'a [u8]", 'take_vector(input, 2, 0, 65535)', None,
+                          '{v}.len()',
+                          'put_vector(&mut buf[at..], {v}, 2, 0, 65535)', None, 2)
+        else:
+            return _Field("&'a [u8]", 'Ok((input, &input[input.len()..]))', None,
+                          '{v}.len()', 'put_bytes(&mut buf[at..], {v})', None)
+
+    # views
+
+    def has_view(self, node):
+        '''Whether a structure gets a view, which is whether it parses
+        without the value of a selector.'''
+        if not self.views or node.cryptographic_attribute is not None:
+            return False
+        return node.variant is None or any(
+            type(f) is FieldDef and f.type == node.variant.selector for f in node.fields)
+
+    def skip(self, node, parent):
+        '''The expression reading the encoding of a field of a variable
+        size and the rest of the input without decoding the field.'''
+        typ = type(node)
+        if typ is FieldDef:
+            return self.skip_named(node.type)
+        elif typ is VectorField:
+            return 'take_vector(input, {}, {}, {})'.format(
+                prefix_width(node.ceiling), node.floor, node.ceiling)
+        attr = node.cryptographic_attribute
+        if attr is None:
+            name = typename(node, parent, with_crypto_attr=False)
+            return 'skip::<{}{}>(input)'.format(name, 'View' if self.has_view(node) else '')
+        elif attr == 'digitally-signed':
+            return 'skip::<DigitallySigned>(input)'
+        elif attr == 'public-key-encrypted':
+            return 'take_vector(input, 2, 0, 65535)'
+        return 'Ok(input.split_at(input.len()))'
+
+    def skip_named(self, name):
+        size = self.sizes.type_size(name)
+        if size.fixed:
+            return 'take(input, {})'.format(size.min)
+        definition = self.table.get(name)
+        if definition is not None:
+            node = definition.node
+            if type(node) in (FieldDef, VectorField):
+                return self.skip(node, None)
+            elif type(node) is StructDef and self.has_view(node):
+                return 'skip::<{}View>(input)'.format(name)
+        return 'skip::<{}>(input)'.format(name)
+
+    def view_field(self, node, parent, f):
+        '''The Rust type and parse of the accessor of a field, the view of
+        a structure of a variable size, else the value of the field.'''
+        if self.sizes.node_size(node).fixed:
+            return f.rust_type, f.parse
+        name = None
+        if type(node) is FieldDef:
+            definition = self.table.get(node.type)
+            if definition is not None and type(definition.node) is StructDef and \
+                    self.has_view(definition.node):
+                name = node.type
+        elif type(node) is StructDef and self.has_view(node):
+            name = typename(node, parent, with_crypto_attr=False)
+        if name is None:
+            return f.rust_type, f.parse
+        return "{}View<'a>".format(name), '{}View::parse(input)'.format(name)
+
+    def view(self, node, name, fields, selector):
+        '''The view of a structure: its encoding and the offsets of the
+        ends of its fields of a variable size, which parse() finds by
+        reading their length prefixes. The other offsets are constants.
+        fields are the (name, IR node, _Field) of its fields, selector the
+        index of the field selecting its variant.'''
+        view = name + 'View'
+        statements = []
+        # the start of every field and the end of the last, as the index
+        # of the last end stored before it and the constant after that
+        bounds = [(None, 0)]
+        ends = []
+
+        def offset(bound, stored):
+            last, constant = bound
+            if last is None:
+                return str(constant)
+            elif constant:
+                return '{} + {}'.format(stored.format(last), constant)
+            return stored.format(last)
+
+        pending = 0
+        parts = [(field_name, field, f, self.sizes.node_size(field))
+                 for field_name, field, f in fields]
+        for field_name, field, f, size in parts:
+            if size.fixed:
+                pending += size.min
+            else:
+                if pending:
+                    statements.append('let (_, input) = take(input, {})?;'.format(pending))
+                statements.append('let (_, input) = {}?;'.format(self.skip(field, node)))
+                statements.append('let end{} = bytes.len() - input.len();'.format(len(ends)))
+                ends.append('end{}'.format(len(ends)))
+                pending = 0
+            bounds.append((len(ends) - 1 if ends else None, pending))
+
+        variant = node.variant
+        if variant is not None:
+            variant_name = '{}Variant'.format(name)
+            variant_lifetime = "<'a>" if self._variant_borrows(node) else ''
+            if pending:
+                statements.append('let (_, input) = take(input, {})?;'.format(pending))
+            statements.append('let (selector, _) = {}::parse(&bytes[{}..{}])?;'.format(
+                variant.selector, offset(bounds[selector], 'end{}'),
+                offset(bounds[selector + 1], 'end{}')))
+            statements.append('let (_, input) = {}::skip(input, selector)?;'.format(
+                variant_name))
+            statements.append('let end{} = bytes.len() - input.len();'.format(len(ends)))
+            ends.append('end{}'.format(len(ends)))
+            bounds.append((len(ends) - 1, 0))
+        elif pending:
+            statements.append('let (_, input) = take(input, {})?;'.format(pending))
+
+        accessors = []
+        for i, (field_name, field, f, _) in enumerate(parts):
+            rust_type, parse = self.view_field(field, node, f)
+            accessors.append(
+                '\n'
+                '    pub fn {0}(&self) -> Result<{1}> {{\n'
+                '        let input = &self.bytes[{2}..{3}];\n'
+                '        let (value, _) = {4}?;\n'
+                '        Ok(value)\n'
+                '    }}\n'.format(field_name, rust_type,
+                                 offset(bounds[i], 'self.ends[{}]'),
+                                 offset(bounds[i + 1], 'self.ends[{}]'), parse))
+        if variant is not None:
+            accessors.append(
+                '\n'
+                '    pub fn {0}(&self) -> Result<{1}{2}> {{\n'
+                '        let (selector, _) = {3}::parse(&self.bytes[{4}..{5}])?;\n'
+                '        let input = &self.bytes[{6}..];\n'
+                '        let (value, _) = {1}::parse_select(input, selector)?;\n'
+                '        Ok(value)\n'
+                '    }}\n'
+                '\n'
+                '    /// The encoding of the case, for the view of its type.\n'
+                "    pub fn {7}_bytes(&self) -> &'a [u8] {{\n"
+                '        &self.bytes[{6}..]\n'
+                '    }}\n'.format(ident(variant.name), variant_name, variant_lifetime,
+                                 variant.selector,
+                                 offset(bounds[selector], 'self.ends[{}]'),
+                                 offset(bounds[selector + 1], 'self.ends[{}]'),
+                                 offset(bounds[-2], 'self.ends[{}]'), variant.name))
+
+        return ('\n'
+                '/// {0}, decoded field by field when the fields are accessed.\n'
+                '{1}'
+                "pub struct {2}<'a> {{\n"
+                "    bytes: &'a [u8],\n"
+                '    ends: [usize; {3}],\n'
+                '}}\n'
+                '\n'
+                "impl<'a> Parse<'a> for {2}<'a> {{\n"
+                "    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {{\n"
+                '        let bytes = input;\n'
+                '{4}'
+                '        let len = {5};\n'
+                '        Ok(({2} {{ bytes: &bytes[..len], ends: [{6}] }}, input))\n'
+                '    }}\n'
+                '}}\n'
+                '\n'
+                "impl<'a> {2}<'a> {{\n"
+                "    pub fn as_bytes(&self) -> &'a [u8] {{\n"
+                '        self.bytes\n'
+                '    }}\n'
+                '{7}'
+                '}}\n').format(name, derive + allow, view, len(ends),
+                               ''.join('        {}\n'.format(s) for s in statements),
+                               offset(bounds[-1], 'end{}'), ', '.join(ends),
+                               ''.join(accessors))
+
+    # encoders
+
+    def limits(self, name, lifetime, size):
+        '''The bounds of the encoded size as constants, MAX_LEN is usize::MAX
+        if it is not bounded.'''
+        return ('\n'
+                'impl{0} {1}{0} {{\n'
+                '    pub const MIN_LEN: usize = {2};\n'
+                '    pub const MAX_LEN: usize = {3};\n'
+                '}}\n').format(lifetime, name, size.min,
+                               'usize::MAX' if size.max is None else size.max)
+
+    def fixed_encoder(self, name, lifetime, size, statements):
+        '''The encoder of a type of size bytes. The statements write to the
+        array buf, whose size is known, so they need no checks.'''
+        return ('\n'
+                'impl{0} {1}{0} {{\n'
+                '    pub const ENCODED_LEN: usize = {2};\n'
+                '\n'
+                '    pub fn encode_array(&self, {3}: &mut [u8; {2}]) {{\n'
+                '{4}'
+                '    }}\n'
+                '}}\n'
+                '\n'
+                'impl{0} Encode for {1}{0} {{\n'
+                '    fn encoded_len(&self) -> usize {{\n'
+                '        Self::ENCODED_LEN\n'
+                '    }}\n'
+                '\n'
+                '    fn encode_into(&self, buf: &mut [u8]) -> Result<usize> {{\n'
+                '        let buf = buf.get_mut(..Self::ENCODED_LEN).ok_or(Error::Truncated)?;\n'
+                '        self.encode_array(buf.try_into().unwrap());\n'
+                '        Ok(Self::ENCODED_LEN)\n'
+                '    }}\n'
+                '}}\n').format(lifetime, name, size, 'buf' if statements else '_buf',
+                               ''.join('        {}\n'.format(s) for s in statements))
+
+    def variable_encoder(self, name, lifetime, fields):
+        '''The encoder of a type made of the (value, _Field) pairs fields.'''
+        constant = sum(f.prefix if f.size is None else f.size for _, f in fields)
+        lengths = [f.length.format(v=v) for v, f in fields
+                   if f.size is None and f.length is not None]
+        if constant or not lengths:
+            lengths.insert(0, str(constant))
+        puts = ''.join('        at += {}?;\n'.format(f.put.format(v=v))
+                       for v, f in fields)
+        return ('\n'
+                'impl{0} Encode for {1}{0} {{\n'
+                '    fn encoded_len(&self) -> usize {{\n'
+                '        {2}\n'
+                '    }}\n'
+                '\n'
+                '    fn encode_into(&self, buf: &mut [u8]) -> Result<usize> {{\n'
+                '        let mut at = 0;\n'
+                '{3}'
+                '        Ok(at)\n'
+                '    }}\n'
+                '}}\n').format(lifetime, name, ' + '.join(lengths), puts)
+
+    def encoder(self, name, lifetime, fields):
+        sizes = [f.size for _, f in fields]
+        if None in sizes:
+            return self.variable_encoder(name, lifetime, fields)
+        statements = []
+        offset = 0
+        for (v, f), size in zip(fields, sizes):
+            if size:
+                statements.append(f.put_fixed.format(v=v, o=offset, e=offset + size))
+            offset += size
+        return self.fixed_encoder(name, lifetime, offset, statements)
+
+    # definitions
+
+    def definition(self, node):
+        typ = type(node)
+        if typ is StructDef:
+            self.structure(node, None)
+        elif typ is EnumDef:
+            self.enum(node)
+        else:
+            self.alias(node)
+
+    def alias(self, node):
+        '''opaque SessionID<0..32>; declares a type SessionID.'''
+        field = self.field(node, None)
+        name = node.name
+        lifetime = "<'a>" if self.borrows(name) else ''
+        code = (derive + allow +
+                'pub struct {0}{1}(pub {2});\n'
+                '\n'
+                "impl<'a> Parse<'a> for {0}{1} {{\n"
+                "    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {{\n"
+                '        let (value, input) = {3}?;\n'
+                '        Ok(({0}(value), input))\n'
+                '    }}\n'
+                '}}\n').format(name, lifetime, field.rust_type, field.parse)
+        code += self.limits(name, lifetime, self.sizes.node_size(node))
+        if self.encoders:
+            code += self.encoder(name, lifetime, [('self.0', field)])
+        self.items.append(code)
+
+    def enum(self, node):
+        if node.name is None:
+            return
+        members = ''.join('    {}{},\n'.format(
+            ident(m.name), '' if m.value is None else ' = {}'.format(m.value))
+            for m in node.members)
+        code = derive + allow
+        if node.external and node.members:
+            code += '#[repr({})]\n'.format(_repr(enum_width(node)))
+        code += 'pub enum {} {{\n{}}}\n'.format(node.name, members)
+
+        if node.external:
+            width = enum_width(node)
+            code += self.enum_values(node, width)
+            code += ('\n'
+                     "impl<'a> Parse<'a> for {0} {{\n"
+                     "    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {{\n"
+                     '        let (value, input) = {1}?;\n'
+                     '        Ok(({0}::try_from(value)?, input))\n'
+                     '    }}\n'
+                     '}}\n').format(node.name, _read(width))
+            code += self.limits(node.name, '', self.sizes.node_size(node))
+            if self.encoders:
+                code += self.fixed_encoder(node.name, '', width, [
+                    'buf.copy_from_slice(&(*self as u64).to_be_bytes()[{}..]);'.format(
+                        8 - width)])
+        else:
+            code += ('\n'
+                     "impl<'a> Parse<'a> for {0} {{\n"
+                     "    fn parse(_input: &'a [u8]) -> Result<(Self, &'a [u8])> {{\n"
+                     '        Err(Error::NoWireFormat)\n'
+                     '    }}\n'
+                     '}}\n').format(node.name)
+            if self.encoders:
+                code += ('\n'
+                         'impl Encode for {0} {{\n'
+                         '    fn encoded_len(&self) -> usize {{\n'
+                         '        0\n'
+                         '    }}\n'
+                         '\n'
+                         '    fn encode_into(&self, _buf: &mut [u8]) -> Result<usize> {{\n'
+                         '        Err(Error::NoWireFormat)\n'
+                         '    }}\n'
+                         '}}\n').format(node.name)
+        self.items.append(code)
+
+    def enum_values(self, node, width):
+        '''The conversions of an external enum from and to its representation.
+        A value is validated by indexing a table of all values between the
+        smallest and the largest if they are dense, else by a binary search
+        of the sorted values.'''
+        name = node.name
+        value_type = _repr(width)
+        values = collections.OrderedDict()
+        for m in sorted(node.members, key=lambda m: m.value):
+            values.setdefault(m.value, '{}::{}'.format(name, ident(m.name)))
+        if not values:
+            lookup = 'let _ = value;\n        Err(Error::InvalidValue)'
+            code = ''
+        elif max(values) - min(values) < dense_enum_ratio * len(values):
+            low = min(values)
+            table = ['Some({})'.format(values[v]) if v in values else 'None'
+                     for v in range(low, max(values) + 1)]
+            code = ('\n'
+                    'impl {0} {{\n'
+                    '    const TABLE: [Option<{0}>; {1}] = [\n'
+                    '{2}'
+                    '    ];\n'
+                    '}}\n').format(name, len(table), _wrap(table, 8))
+            index = 'value as usize' if low == 0 else \
+                    'value.wrapping_sub({}) as usize'.format(low)
+            lookup = ('match Self::TABLE.get({}) {{\n'
+                      '            Some(&Some(value)) => Ok(value),\n'
+                      '            _ => Err(Error::InvalidValue),\n'
+                      '        }}').format(index)
+        else:
+            pairs = ['({}, {})'.format(v, m) for v, m in values.items()]
+            code = ('\n'
+                    'impl {0} {{\n'
+                    '    const VALUES: [({1}, {0}); {2}] = [\n'
+                    '{3}'
+                    '    ];\n'
+                    '}}\n').format(name, value_type, len(pairs), _wrap(pairs, 8))
+            lookup = ('match Self::VALUES.binary_search_by_key(&value, |&(v, _)| v) {\n'
+                      '            Ok(i) => Ok(Self::VALUES[i].1),\n'
+                      '            Err(_) => Err(Error::InvalidValue),\n'
+                      '        }')
+        code += ('\n'
+                 'impl TryFrom<{1}> for {0} {{\n'
+                 '    type Error = Error;\n'
+                 '\n'
+                 '    fn try_from(value: {1}) -> Result<Self> {{\n'
+                 '        {2}\n'
+                 '    }}\n'
+                 '}}\n').format(name, value_type, lookup)
+        if values:
+            code += ('\n'
+                     'impl From<{0}> for {1} {{\n'
+                     '    fn from(value: {0}) -> {1} {{\n'
+                     '        value as {1}\n'
+                     '    }}\n'
+                     '}}\n').format(name, value_type)
+        return code
+
+    def structure(self, node, parent):
+        name = typename(node, parent, with_crypto_attr=False)
+        lifetime = "<'a>" if self._struct_borrows(node) else ''
+
+        declarations = []
+        statements = []
+        values = []
+        encoded = []
+        fields = []
+        for field in node.fields:
+            if type(field) is EnumDef:
+                # declared in the structure, but a type like any other
+                self.enum(field)
+                continue
+            field_name = ident(fieldname(field))
+            # a binding cannot shadow a tuple struct, which an alias of
+            # the same name is, nor be called input
+            local = fieldname(field) + '_'
+            f = self.field(field, node)
+            declarations.append('    pub {}: {},\n'.format(field_name, f.rust_type))
+            statements.append('        let ({}, input) = {}?;\n'.format(local, f.parse))
+            values.append('{}: {}'.format(field_name, local))
+            encoded.append(('self.' + field_name, f))
+            fields.append((field_name, field, f))
+
+        variant = node.variant
+        selector = None
+        selector_index = None
+        if variant is not None:
+            variant_name = '{}Variant'.format(name)
+            variant_lifetime = "<'a>" if self._variant_borrows(node) else ''
+            self.variant(variant_name, variant_lifetime, variant)
+
+            for i, field in enumerate(node.encoded_fields):
+                if type(field) is FieldDef and field.type == variant.selector:
+                    selector = field.name + '_'
+                    selector_index = i
+            field_name = ident(variant.name)
+            local = variant.name + '_'
+            declarations.append('    pub {}: {}{},\n'.format(
+                field_name, variant_name, variant_lifetime))
+            statements.append(
+                '        let ({}, input) = {}::parse_select(input, {})?;\n'.format(
+                    local, variant_name, selector or 'selector'))
+            values.append('{}: {}'.format(field_name, local))
+            encoded.append(('self.' + field_name, _encoded_field(None, None, None)))
+
+        code = derive + allow + 'pub struct {}{} {{\n{}}}\n'.format(
+            name, lifetime, ''.join(declarations))
+
+        body = ('{}'
+                '        Ok(({} {{ {} }}, input))\n').format(
+                    ''.join(statements), name, ', '.join(values))
+        if variant is not None and selector is None:
+            code += ('\n'
+                     "impl<'a> {0}{1} {{\n"
+                     "    pub fn parse_with(input: &'a [u8], selector: {2})\n"
+                     "                      -> Result<(Self, &'a [u8])> {{\n"
+                     '{3}'
+                     '    }}\n'
+                     '}}\n').format(name, lifetime, variant.selector, body)
+        else:
+            code += ('\n'
+                     "impl<'a> Parse<'a> for {0}{1} {{\n"
+                     "    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {{\n"
+                     '{2}'
+                     '    }}\n'
+                     '}}\n').format(name, lifetime, body)
+        code += self.limits(name, lifetime, self.sizes.structure_size(node))
+        if self.encoders:
+            code += self.encoder(name, lifetime, encoded)
+        if self.has_view(node):
+            code += self.view(node, name, fields, selector_index)
+        self.items.append(code)
+
+    def variant(self, name, lifetime, variant):
+        members = []
+        arms = []
+        skips = []
+        lengths = []
+        puts = []
+        for case in variant.cases:
+            f = self.named(case.type)
+            labels = [ident(label) for label in case.labels]
+            members.extend('    {}({}),\n'.format(l, f.rust_type) for l in labels)
+            # fall-through labels share one arm, so the body decoder is
+            # inlined once
+            selectors = ['{}::{}'.format(variant.selector, l) for l in labels]
+            if len(labels) == 1:
+                arms.append('            {} => {}.map(|(value, input)| '
+                            '({}::{}(value), input)),\n'.format(
+                                selectors[0], f.parse, name, labels[0]))
+            else:
+                wraps = ''.join('                    {} => {}::{}(value),\n'.format(
+                    s if i < len(labels) - 1 else '_', name, l)
+                    for i, (s, l) in enumerate(zip(selectors, labels)))
+                arms.append('            {} => {{\n'
+                            '                let (value, input) = {}?;\n'
+                            '                let value = match selector {{\n'
+                            '{}'
+                            '                }};\n'
+                            '                Ok((value, input))\n'
+                            '            }}\n'.format(_alternatives(selectors),
+                                                     f.parse, wraps))
+            skips.append('            {} => {},\n'.format(_alternatives(selectors),
+                                                          self.skip_named(case.type)))
+
+            if f.size is None:
+                length = f.length.format(v='(*value)')
+                binding = 'value'
+            else:
+                length = str(f.size)
+                binding = '_'
+            lengths.append('            {} => {},\n'.format(_alternatives(
+                ['{}::{}({})'.format(name, l, binding) for l in labels]), length))
+            puts.append('            {} => {},\n'.format(_alternatives(
+                ['{}::{}(value)'.format(name, l) for l in labels]),
+                f.put.format(v='(*value)').replace('buf[at..]', 'buf[..]')))
+
+        # with the members of the selector known the match lists all of
+        # them, so rustc checks it covers the enum it is compiled against
+        enum = self.table.enum(variant.selector)
+        if enum is None:
+            invalid = ('            #[allow(unreachable_patterns)]\n'
+                       '            _ => Err(Error::InvalidValue),\n')
+        else:
+            missing = uncovered(variant, enum.members)
+            invalid = ''
+            if missing and not self.partial_variants:
+                raise GenerationError('select ({}) of {} has no case for {}'.format(
+                    variant.selector, name[:-len('Variant')], ', '.join(missing)))
+            elif missing:
+                invalid = '            {} => Err(Error::InvalidValue),\n'.format(
+                    _alternatives(['{}::{}'.format(variant.selector, ident(m))
+                                   for m in missing]))
+        arms.append(invalid)
+        skips.append(invalid)
+
+        code = derive + allow + 'pub enum {}{} {{\n{}}}\n'.format(
+            name, lifetime, ''.join(members))
+        code += ('\n'
+                 "impl<'a> {0}{1} {{\n"
+                 "    pub fn parse_select(input: &'a [u8], selector: {2})\n"
+                 "                        -> Result<(Self, &'a [u8])> {{\n"
+                 '        match selector {{\n'
+                 '{3}'
+                 '        }}\n'
+                 '    }}\n'
+                 '{4}'
+                 '}}\n').format(name, lifetime, variant.selector, ''.join(arms),
+                                '' if not self.views else (
+                                    '\n'
+                                    '    /// The encoding of the case of selector.\n'
+                                    "    pub fn skip(input: &'a [u8], selector: {0})\n"
+                                    "                -> Result<(&'a [u8], &'a [u8])> {{\n"
+                                    '        match selector {{\n'
+                                    '{1}'
+                                    '        }}\n'
+                                    '    }}\n').format(variant.selector, ''.join(skips)))
+        code += self.limits(name, lifetime, self.sizes.variant_size(variant))
+        if self.encoders:
+            code += ('\n'
+                     'impl{0} Encode for {1}{0} {{\n'
+                     '    fn encoded_len(&self) -> usize {{\n'
+                     '        match self {{\n'
+                     '{2}'
+                     '        }}\n'
+                     '    }}\n'
+                     '\n'
+                     '    fn encode_into(&self, buf: &mut [u8]) -> Result<usize> {{\n'
+                     '        match self {{\n'
+                     '{3}'
+                     '        }}\n'
+                     '    }}\n'
+                     '}}\n').format(lifetime, name, ''.join(lengths), ''.join(puts))
+        self.items.append(code)
+
+
+def compile_decoders(definitions, table=None, encoders=False, views=False,
+                     partial_variants=False):
+    '''Return the Rust types and decoders of definitions, given as IR or as
+    a parse tree, with encoders their encoders as well and with views the
+    views of their structures. table has to contain all types definitions
+    refer to, by default it is built from definitions alone. Raise a
+    GenerationError for a variant without a case for every member of its
+    selector, unless partial_variants allows them.'''
+    if not isinstance(definitions, tuple):
+        definitions = lower(definitions)
+    if table is None:
+        table = SymbolTable().add(definitions)
+
+    codec = _Codec(table, encoders, views, partial_variants)
+    for node in definitions:
+        codec.definition(node)
+    return '\n'.join(codec.items).strip()
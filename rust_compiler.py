@@ -1,7 +1,8 @@
 import collections
-import itertools
+import io
 
-from grammar import *
+from ir import StructDef, EnumDef, EnumMember, FieldDef, VectorField, \
+               VariantCaseDef, lower
 
 implicit_types = {
     'uint8': {
@@ -46,9 +47,9 @@ def cryptographic_attribute_to_container(cryptographic_attribute):
 
 
 def fieldname(ast):
-    if hasattr(ast, 'name'):
+    if ast.name is not None:
         return ast.name
-    elif not hasattr(ast, 'cryptographic_attribute'):
+    elif ast.cryptographic_attribute is None:
         return 'container'
     elif ast.cryptographic_attribute == 'digitally-signed':
         return 'signed'
@@ -63,9 +64,9 @@ def fieldname(ast):
 def typename(ast, parent, with_crypto_attr):
     prefix = '' if parent is None else typename(parent, None, with_crypto_attr) # BUG: we need the parent's parent, too!
 
-    if hasattr(ast, 'name'):
+    if ast.name is not None:
         return ast.name
-    elif not hasattr(ast, 'cryptographic_attribute'):
+    elif ast.cryptographic_attribute is None:
         return prefix+'Container'
     elif ast.cryptographic_attribute == 'digitally-signed':
         typ = '{}Signed'.format(prefix)
@@ -93,121 +94,153 @@ def typename(ast, parent, with_crypto_attr):
         raise NotImplementedError
 
 
+def rust_type(typ):
+    if typ in implicit_types:
+        return implicit_types[typ]['rust_type']
+    return typ
+
+
+# the code of a definition: its declaration as a field, and the types it
+# needs declared before it
 Pair = collections.namedtuple('Pair', ['decl', 'spec'])
-def merge_pairs(decl, *pairs, spec_delimiter=None):
-    if spec_delimiter is None:
-        spec_delimiter = '\n'
-    return Pair(spec=spec_delimiter.join(p.spec for p in pairs),
-                decl=decl)
 
 
-def _compile_enum_packet_representation(ast, in_named_structure, parent=None):
-    assert not hasattr(ast, 'cryptographic_attribute')
-    entries = map(compile_packet_representation, ast.data.values())
-    contents = ',\n    '.join(e.decl for e in entries)
+class _Stripped(object):
+    '''Passes on to out what str.strip() would leave of everything
+    written.'''
+    def __init__(self, out):
+        self.out = out
+        self.started = False
+        self.pending = ''
+
+    def write(self, text):
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started = True
+        stripped = text.rstrip()
+        if stripped:
+            if self.pending:
+                self.out.write(self.pending)
+            self.out.write(stripped)
+            self.pending = text[len(stripped):]
+        else:
+            self.pending += text
+
+
+def join_definitions(pair_list):
+    '''The code of the Pairs of top level definitions.'''
+    out = io.StringIO()
+    stripped = _Stripped(out)
+    stripped.write('\n'.join(p.spec for p in pair_list))
+    stripped.write('\n'.join(p.decl for p in pair_list))
+    return out.getvalue()
+
+
+def _compile_enum_packet_representation(ast, out, parent=None):
+    entries = [_compile(e, out) for e in ast.members]
+    contents = ',\n    '.join(entries)
     code = '''enum {} {{
     {},
 }}
 '''
-    return merge_pairs(code.format(ast.name, contents),
-                       *entries)
+    # an enum is declared in place, it is not written ahead
+    return code.format(ast.name, contents)
 
 
-def _compile_structure_packet_representation(ast, in_named_structure, parent=None):
-    fields = map(compile_packet_representation, list(ast.data.values())[0])
-    fields = [compile_packet_representation(f, in_named_structure=True, parent=ast)
-              for f in list(ast.data.values())[0]]
+def _compile_structure_packet_representation(ast, out, parent=None):
+    # the types the fields need come first, each followed by a newline
+    fields = []
+    for f in ast.fields:
+        fields.append(_compile(f, out, parent=ast))
+        out.write('\n')
 
     name = fieldname(ast)
     decl_typ = typename(ast, parent, with_crypto_attr=True)
     spec_typ = typename(ast, parent, with_crypto_attr=False)
 
-    if not hasattr(ast, 'cryptographic_attribute'):
-        container = None
-    else:
-        attr = ast.cryptographic_attribute
-        container = cryptographic_attribute_to_container(attr)
-
-    if not hasattr(ast, 'structure_variant'):
-        enum = ''
-    else:
-        var = ast.structure_variant
-        variants = [compile_packet_representation(c, parent=ast)
-                    for c in var.variant_cases]
-        variants = list(itertools.chain(*variants))
-        variant_decls = ',\n    '.join(v.decl for v in variants)
+    if ast.variant is not None:
+        var = ast.variant
+        variants = []
+        for c in var.cases:
+            variants.extend(_compile(c, out, parent=ast))
         spec = '''enum {}Variant {{
     {},
 }}
 '''
-        decl = '{}: {}Variant'.format(var.name, ast.name)
-        var = Pair(decl=decl, spec=spec.format(ast.name, variant_decls))
-        fields.append(var)
+        out.write(spec.format(ast.name, ',\n    '.join(variants)))
+        out.write('\n')
+        fields.append('{}: {}Variant'.format(var.name, ast.name))
 
     code = '''struct {} {{
     {},
 }}
 '''
-    decl = '{}: {}'.format(name, decl_typ) if parent else ''
-    spec = code.format(spec_typ, ',\n    '.join(f.decl for f in fields))
-    struct = Pair(decl='', spec=spec)
-    return merge_pairs(decl, *fields+[struct])
-
-
-def compile_packet_representation(ast, in_named_structure=False, parent=None):
-    if type(ast) == Symbol:
-        return Pair(spec='',
-                    decl='{}'.format(ast))
-    elif type(ast) == ScalarField:
-        assert not hasattr(ast, 'cryptographic_attribute')
-        field_type = ast.type
-        if field_type in implicit_types:
-            desc = implicit_types[ast.type]
-            field_type = desc['rust_type']
-
-        return Pair(spec='',
-                    decl='{}: {}'.format(ast.name, field_type))
-    elif type(ast) == Definitions:
-        pair_list = [compile_packet_representation(a, parent=parent) for a in ast]
-        decl = '\n'.join(p.decl for p in pair_list)
-        pair = merge_pairs(decl, *pair_list)
-        return (pair.spec + pair.decl).strip()
-
-    elif type(ast) is ConstantVectorField:
-        assert not hasattr(ast, 'cryptographic_attribute')
-        field_type = ast.vector_type
-        if field_type in implicit_types:
-            desc = implicit_types[ast.vector_type]
-            field_type = desc['rust_type']
-
-        return Pair(spec='',
-                    decl='{}: {}[{}]'.format(ast.name, field_type, ast.vector_size))
-    elif type(ast) is VariableVectorField:
-        assert not hasattr(ast, 'cryptographic_attribute')
-        field_type = ast.vector_type
-        if field_type in implicit_types:
-            desc = implicit_types[ast.vector_type]
-            field_type = desc['rust_type']
-
-        decl = '{}: Vec<{}>'.format(ast.name, field_type, ast.vector_bounds.ceiling)
-        return Pair(spec='',
-                    decl=decl)
-    elif type(ast) is ExternalEnumEntry:
-        return Pair(spec='',
-                    decl='{} = {}'.format(ast.name, ast.value))
-    elif type(ast) is InternalEnumEntry:
-        return Pair(spec='',
-                    decl='{}'.format(ast.name))
-    elif type(ast) in [ExternalEnum, InternalEnum]:
-        return _compile_enum_packet_representation(ast, in_named_structure,
-                                                   parent=parent)
-    elif type(ast) is VariantCase:
-        return [Pair(spec='',
-                     decl='{}({})'.format(c, ast.type))
-                for c in ast.cases]
-    elif type(ast) in [NamedStructure, UnnamedStructure]:
-        return _compile_structure_packet_representation(ast, in_named_structure,
+    out.write(code.format(spec_typ, ',\n    '.join(fields)))
+    return '{}: {}'.format(name, decl_typ) if parent else ''
+
+
+def _compile(ast, out, parent=None):
+    '''Write the types ast needs to out and return its declaration.'''
+    typ = type(ast)
+    if typ is tuple:
+        decls = []
+        for i, a in enumerate(ast):
+            if i:
+                out.write('\n')
+            decls.append(_compile(a, out, parent=parent))
+        out.write('\n'.join(decls))
+        return ''
+    elif typ is FieldDef:
+        if ast.cryptographic_attribute is not None:
+            raise NotImplementedError('{} field {} is not supported'.format(
+                ast.cryptographic_attribute, ast.name))
+        return '{}: {}'.format(ast.name, rust_type(ast.type))
+    elif typ is VectorField:
+        if ast.variable:
+            return '{}: Vec<{}>'.format(ast.name, rust_type(ast.type))
+        return '{}: {}[{}]'.format(ast.name, rust_type(ast.type), ast.size)
+    elif typ is EnumMember:
+        if ast.value is None:
+            return '{}'.format(ast.name)
+        return '{} = {}'.format(ast.name, ast.value)
+    elif typ is EnumDef:
+        return _compile_enum_packet_representation(ast, out, parent=parent)
+    elif typ is VariantCaseDef:
+        return ['{}({})'.format(c, ast.type) for c in ast.labels]
+    elif typ is StructDef:
+        return _compile_structure_packet_representation(ast, out,
                                                         parent=parent)
     else:
         raise NotImplementedError
 
+
+def compile_definition(node):
+    '''The Pair of one top level definition of the IR, join_definitions()
+    of the Pairs of all definitions is their compiled code.'''
+    out = io.StringIO()
+    decl = _compile(node, out)
+    return Pair(decl=decl, spec=out.getvalue())
+
+
+def write_packet_representation(ast, out):
+    '''Write the code of IR from ir.lower(), or of a parse tree which is
+    lowered first, to the text stream out in a single pass.'''
+    if not isinstance(ast, tuple):
+        ast = lower(ast)
+    _compile(ast, _Stripped(out))
+
+
+def compile_packet_representation(ast, in_named_structure=False, parent=None):
+    '''Compile IR from ir.lower(), or a parse tree which is lowered first.'''
+    if not isinstance(ast, tuple):
+        ast = lower(ast)
+    if type(ast) is not tuple:
+        # a single definition of the IR
+        out = io.StringIO()
+        decl = _compile(ast, out, parent=parent)
+        return Pair(decl=decl, spec=out.getvalue())
+    out = io.StringIO()
+    write_packet_representation(ast, out)
+    return out.getvalue()
@@ -0,0 +1,81 @@
+'''
+Compiles many specifications in one long-running process.
+
+    compiler = Compiler(backend='fast')
+    for result in compiler.compile_many(sources):
+        if result.error is None:
+            write(result.code)
+
+A Compiler splits every source into its top level definitions and keeps
+the IR and the Rust code of the most recently used max_definitions of
+them, keyed by their text. A build daemon sees the same definitions over
+and over, and those are neither parsed nor compiled again. The code is
+the same as compile_packet_representation(parsers.parse(source)).
+
+pypeg2 keeps no state between parse() calls that could be reused: its
+regular expressions are compiled once, with the grammar classes, and its
+memory is per call.
+'''
+import collections
+
+import ir
+import parsers
+from grammar import Definitions
+from incremental import split_definitions
+from rust_compiler import compile_definition, join_definitions
+
+Result = collections.namedtuple('Result', ['code', 'ir', 'error'])
+
+_Entry = collections.namedtuple('_Entry', ['nodes', 'pairs'])
+
+
+class Compiler(object):
+    def __init__(self, backend=None, max_definitions=65536):
+        self.backend = backend
+        self.parse = parsers.backends[backend or parsers.default_backend]
+        self.max_definitions = max_definitions
+        self._definitions = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _definition(self, text):
+        key = text.strip()
+        entry = self._definitions.get(key)
+        if entry is not None:
+            self._definitions.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        nodes = ir.lower(self.parse(text, Definitions))
+        entry = _Entry(nodes, [compile_definition(n) for n in nodes])
+        self._definitions[key] = entry
+        if len(self._definitions) > self.max_definitions:
+            self._definitions.popitem(last=False)
+        return entry
+
+    def compile(self, source):
+        '''Return the Result of source, raise SyntaxError if it does not
+        parse.'''
+        try:
+            entries = [self._definition(text)
+                       for text in split_definitions(source)]
+        except SyntaxError:
+            # report the position in source, not in the definition
+            self.parse(source, Definitions)
+            raise
+        nodes = tuple(n for e in entries for n in e.nodes)
+        code = join_definitions([p for e in entries for p in e.pairs])
+        return Result(code, nodes, None)
+
+    def compile_many(self, sources):
+        '''Yield the Result of every source in sources, in order. A source
+        that does not parse gives a Result with its SyntaxError as error.'''
+        for source in sources:
+            try:
+                yield self.compile(source)
+            except SyntaxError as e:
+                yield Result(None, None, e)
+
+    def clear(self):
+        self._definitions.clear()
@@ -0,0 +1,154 @@
+'''
+An index of the named types of a whole specification.
+
+    table = SymbolTable()
+    table.add(ast, 'rfc5246.txt')
+    table.add(other_ast, 'rfc8446.txt')
+    table['ClientHello'].node    # the StructDef
+    for problem in table.check():
+        print(problem)
+
+Every named enum and structure, nested ones included, and every top level
+field or vector declaration (opaque SessionID<0..32>; declares the type
+SessionID) is indexed in a single walk over the IR of each file. The first
+definition of a name wins; later ones with a different body are kept in
+conflicts. The member names of enums are indexed as well, so validating a
+variant selector does not walk the enum again.
+'''
+import collections
+
+from ir import StructDef, EnumDef, FieldDef, VectorField, lower
+from rust_compiler import implicit_types
+
+Definition = collections.namedtuple('Definition', ['name', 'node', 'filename',
+                                                   'members'])
+
+
+class Problem(collections.namedtuple('Problem', ['filename', 'definition',
+                                                 'message'])):
+    __slots__ = ()
+
+    def __str__(self):
+        where = self.definition or '<top level>'
+        if self.filename:
+            where = '{}: {}'.format(self.filename, where)
+        return '{}: {}'.format(where, self.message)
+
+
+def uncovered(variant, members):
+    '''The names in members that no case of variant is labelled with, in
+    order. RFC 5246 4.6.1 requires a case arm for every member.'''
+    labels = set(label for case in variant.cases for label in case.labels)
+    return [name for name in members if name not in labels]
+
+
+class SymbolTable(object):
+    def __init__(self, builtins=implicit_types):
+        self.builtins = builtins
+        self.definitions = {}
+        self.conflicts = []
+        self._files = []
+
+    def __contains__(self, name):
+        return name in self.definitions or name in self.builtins
+
+    def __getitem__(self, name):
+        return self.definitions[name]
+
+    def get(self, name, default=None):
+        return self.definitions.get(name, default)
+
+    def __iter__(self):
+        return iter(self.definitions.values())
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def add(self, definitions, filename=None):
+        '''Index the top level definitions of one file, given as IR or as a
+        parse tree.'''
+        if not isinstance(definitions, tuple):
+            definitions = lower(definitions)
+        self._files.append((filename, definitions))
+        for node in definitions:
+            self._add(node, filename)
+        return self
+
+    def _add(self, node, filename):
+        typ = type(node)
+        if typ is StructDef:
+            for field in node.fields:
+                if type(field) is StructDef or type(field) is EnumDef:
+                    self._add(field, filename)
+            if node.name is None:
+                return
+            members = None
+        elif typ is EnumDef:
+            if node.name is None:
+                return
+            members = {m.name: m.value for m in node.members}
+        else:
+            members = None
+
+        definition = Definition(node.name, node, filename, members)
+        previous = self.definitions.setdefault(node.name, definition)
+        if previous is not definition and previous.node != node:
+            self.conflicts.append(definition)
+
+    def enum(self, name):
+        '''The Definition of the enum called name, or None.'''
+        definition = self.definitions.get(name)
+        if definition is not None and definition.members is not None:
+            return definition
+        return None
+
+    def check(self):
+        '''Return a Problem for every reference to an undefined type, every
+        variant whose selector is not an enum, whose labels are not its
+        members or that misses one of them, and every conflicting
+        redefinition.'''
+        problems = []
+        for filename, definitions in self._files:
+            for node in definitions:
+                self._check(node, filename, node.name, problems)
+        for definition in self.conflicts:
+            first = self.definitions[definition.name]
+            problems.append(Problem(definition.filename, definition.name,
+                                    'redefinition of {} from {}'.format(
+                                        definition.name, first.filename)))
+        return problems
+
+    def _check(self, node, filename, outer, problems):
+        typ = type(node)
+        if typ is FieldDef or typ is VectorField:
+            if node.type not in self:
+                problems.append(Problem(filename, outer,
+                                        'undefined type {}'.format(node.type)))
+        elif typ is StructDef:
+            for field in node.fields:
+                self._check(field, filename, outer, problems)
+            if node.variant is not None:
+                self._check_variant(node.variant, filename, outer, problems)
+
+    def _check_variant(self, variant, filename, outer, problems):
+        enum = self.enum(variant.selector)
+        if enum is None:
+            problems.append(Problem(filename, outer,
+                                    'select ({}) is not an enum'.format(
+                                        variant.selector)))
+        for case in variant.cases:
+            if enum is not None:
+                for label in case.labels:
+                    if label not in enum.members:
+                        problems.append(Problem(
+                            filename, outer,
+                            '{} is not a member of {}'.format(label, enum.name)))
+            if case.type not in self:
+                problems.append(Problem(filename, outer,
+                                        'undefined type {}'.format(case.type)))
+        if enum is not None:
+            missing = uncovered(variant, enum.members)
+            if missing:
+                problems.append(Problem(filename, outer,
+                                        'select ({}) has no case for {}'.format(
+                                            variant.selector, ', '.join(missing))))
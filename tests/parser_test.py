@@ -91,12 +91,13 @@ def recursive_del(obj, attr, condition=None):
 
 class ParserTest(unittest.TestCase):
     maxDiff = None
+    parse = staticmethod(parse)
 
     def assert_parse_equal(self, code, expected, obj=None):
         if obj is None:
             obj = self.test_obj
 
-        actual = parse(code, obj)
+        actual = self.parse(code, obj)
         actual = recursive_to_dict(actual)
 
         if type(expected) is list:
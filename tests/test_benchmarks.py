@@ -0,0 +1,68 @@
+import unittest
+
+import fast_parser
+from ir import lower
+from symbols import SymbolTable
+from benchmarks import specs, startup, suite
+
+
+class BenchmarkSpecsTest(unittest.TestCase):
+    def test_cases_parse(self):
+        for name, code in suite.generate(scale=0.01):
+            ast = fast_parser.parse(code)
+            self.assertTrue(len(ast), name)
+
+    def test_rfc5246(self):
+        table = SymbolTable().add(fast_parser.parse(specs.rfc5246()))
+        self.assertEqual(table.check(), [])
+        self.assertEqual(len(table['ClientHello'].node.fields), 6)
+
+    def test_sizes(self):
+        self.assertEqual(len(lower(fast_parser.parse(specs.many_structs(7)))), 7)
+        enum, = lower(fast_parser.parse(specs.wide_enum(5)))
+        self.assertEqual(len(enum.members), 5)
+        self.assertEqual(enum.width, 9)
+        enum, struct = lower(fast_parser.parse(specs.many_variant_cases(4)))
+        self.assertEqual(len(struct.variant.cases), 4)
+
+
+class CompareTest(unittest.TestCase):
+    def results(self, **case):
+        case.setdefault('chars', 100)
+        return {'meta': {}, 'cases': {'case': case}}
+
+    def test_compare(self):
+        baseline = self.results(parse_s=1.0, compile_s=0.5, peak_bytes=1000)
+        current = self.results(parse_s=1.05, compile_s=0.6, peak_bytes=900)
+        self.assertEqual(suite.compare(baseline, current),
+                         [('case', 'compile_s', 0.5, 0.6)])
+        self.assertEqual(suite.compare(baseline, current, threshold=0.25), [])
+
+    def test_compare_different_inputs(self):
+        baseline = self.results(parse_s=1.0, compile_s=0.5, peak_bytes=1000)
+        current = self.results(chars=200, parse_s=2.0, compile_s=1.0,
+                               peak_bytes=2000)
+        self.assertEqual(suite.compare(baseline, current), [])
+        self.assertEqual(suite.compare({'cases': {}}, current), [])
+
+    def test_compare_startup(self):
+        baseline = {'cases': {'startup': {'import_s': 0.03, 'cli_s': 0.05}}}
+        current = {'cases': {'startup': {'import_s': 0.06}}}
+        self.assertEqual(suite.compare(baseline, current),
+                         [('startup', 'import_s', 0.03, 0.06)])
+
+
+class StartupTest(unittest.TestCase):
+    def test_import_times(self):
+        times = startup.import_times('compile_specs')
+        own, cumulative = times['compile_specs']
+        self.assertLessEqual(own, cumulative)
+        self.assertIn('grammar', times)
+        # only imported by the options that need them
+        for module in ['build_cache', 'rust_codec', 'concurrent.futures',
+                       'profiling', 'incremental', 'json']:
+            self.assertNotIn(module, times)
+
+
+if __name__ == '__main__':
+    unittest.main()
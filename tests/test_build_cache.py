@@ -0,0 +1,115 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+import build_cache
+import compile_specs
+import fast_parser
+from rust_compiler import compile_packet_representation
+from tests.test_fast_parser import FastParserTest, dump
+from tests.test_rfc_extractor import RFC_TEXT
+
+
+class CacheTest(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = build_cache.Cache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        code = FastParserTest.code
+        ast = fast_parser.parse(code)
+        rust = compile_packet_representation(ast)
+
+        key = self.cache.key(code, backend='fast')
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, ast, rust)
+
+        entry = self.cache.get(key)
+        self.assertEqual(entry.code, rust)
+        self.assertEqual(dump(entry.ast, positions=True), dump(ast, positions=True))
+        self.assertEqual(compile_packet_representation(entry.ast), rust)
+
+    def test_key(self):
+        key = self.cache.key('uint8 a;', backend='fast')
+        self.assertEqual(key, self.cache.key('uint8 a;', backend='fast'))
+        self.assertNotEqual(key, self.cache.key('uint8 a;', backend='pypeg2'))
+        self.assertNotEqual(key, self.cache.key('uint8 b;', backend='fast'))
+
+    def test_new_version_invalidates(self):
+        key = self.cache.key('uint8 a;')
+        self.cache.put(key, None, 'a: u8')
+
+        old_version = build_cache._version
+        build_cache._version = 'changed'
+        try:
+            cache = build_cache.Cache(self.directory)
+            self.assertNotEqual(cache.key('uint8 a;'), key)
+            self.assertIsNone(cache.get(key))
+
+            cache.prune()
+            self.assertEqual(os.listdir(self.directory), [])
+        finally:
+            build_cache._version = old_version
+
+    def test_evict_least_recently_used(self):
+        keys = [self.cache.key(str(i)) for i in range(4)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, None, 'x' * 1000)
+            os.utime(self.cache._path(key), (i, i))
+        size = self.cache.size()
+
+        # reading an entry makes it the most recently used one
+        self.cache.get(keys[0])
+        self.cache.evict(size // 2)
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNone(self.cache.get(keys[2]))
+        self.assertIsNotNone(self.cache.get(keys[3]))
+
+    def test_put_evicts(self):
+        cache = build_cache.Cache(self.directory, max_size=3000)
+        for i in range(10):
+            cache.put(cache.key(str(i)), None, 'x' * 1000)
+
+        self.assertLessEqual(cache.size(), 3000)
+
+
+class CompileSpecsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, 'cache')
+        self.path = os.path.join(self.directory, 'rfc5246.txt')
+        with open(self.path, 'w') as f:
+            f.write(RFC_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_warm_build_skips_parsing(self):
+        cold = compile_specs.compile_file(self.path, cache_dir=self.cache_dir)
+        warm = compile_specs.compile_file(self.path, cache_dir=self.cache_dir)
+
+        self.assertEqual(cold.cached, 0)
+        # the block that does not parse is remembered as well
+        self.assertEqual(warm.cached, 5)
+        self.assertEqual(warm.parse_time, 0.0)
+        self.assertEqual(warm.code, cold.code)
+        self.assertEqual(warm.definitions, 4)
+
+    def test_main(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(io.StringIO()):
+            compile_specs.main(['-j', '1', '--cache-dir', self.cache_dir, self.path])
+            compile_specs.main(['-j', '1', '--cache-dir', self.cache_dir, self.path])
+
+        first, second = stdout.getvalue().split('// module rfc5246')[1:]
+        self.assertEqual(first, second)
@@ -0,0 +1,190 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import tempfile
+import unittest
+
+import build_server
+import fast_parser
+from rust_compiler import compile_packet_representation
+from benchmarks.specs import many_definitions
+from tests.test_incremental import SPEC
+
+
+class Client(object):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, **request):
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+
+    async def receive(self):
+        return json.loads((await self.reader.readline()).decode())
+
+    async def request(self, **request):
+        await self.send(**request)
+        return await self.receive()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class BuildServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = build_server.BuildServer(
+            workers=1, executor=concurrent.futures.ThreadPoolExecutor(1))
+        self.listener = await self.server.start()
+        self.port = self.listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.server.close()
+
+    async def connect(self):
+        return Client(*await asyncio.open_connection('127.0.0.1', self.port))
+
+    async def test_compile(self):
+        client = await self.connect()
+        response = await client.request(id=1, op='compile', source=SPEC)
+        self.assertEqual(response, {
+            'id': 1,
+            'code': compile_packet_representation(fast_parser.parse(SPEC)),
+        })
+
+        response = await client.request(id=2, source=SPEC, emit='codecs',
+                                         parser='pypeg2')
+        self.assertIn("impl<'a> Parse<'a> for Paint<'a> {", response['code'])
+        self.assertIn('impl Encode for Frame {', response['code'])
+        await client.close()
+
+    async def test_errors(self):
+        client = await self.connect()
+        response = await client.request(id=1, source='struct {\n  uint8 a;\n}')
+        self.assertEqual(response['error']['lineno'], 3)
+
+        response = await client.request(id=2, source=SPEC, emit='python')
+        self.assertEqual(response['error'], {'message': "unknown emit 'python'"})
+        response = await client.request(id=3, op='frobnicate')
+        self.assertEqual(response['error'], {'message': "unknown op 'frobnicate'"})
+
+        client.writer.write(b'{"id": \n')
+        response = await client.receive()
+        self.assertTrue(response['error']['message'].startswith('bad request'))
+        await client.close()
+
+    async def test_cancel_and_stats(self):
+        client = await self.connect()
+        # the first request keeps the only worker busy, the second waits
+        await client.send(id=1, source=many_definitions(20), parser='pypeg2')
+        await client.send(id=2, source=SPEC)
+        for _ in range(100):
+            stats = await client.request(id=3, op='stats')
+            if stats['queued']:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual((stats['queued'], stats['running']), (1, 1))
+        self.assertEqual(await client.request(id=4, op='cancel', target=2),
+                         {'id': 4, 'cancelled': True})
+        self.assertEqual(await client.receive(),
+                         {'id': 2, 'error': {'message': 'cancelled'}})
+
+        response = await client.receive()
+        self.assertEqual(response['id'], 1)
+        self.assertIn('struct ClientHello19 {', response['code'])
+
+        stats = await client.request(id=5, op='stats')
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['running'], 0)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['cancelled'], 1)
+        self.assertGreater(stats['latency_ms']['p99'], 0)
+        self.assertEqual(await client.request(id=6, op='cancel', target=2),
+                         {'id': 6, 'cancelled': False})
+        await client.close()
+
+    async def test_cancel_running(self):
+        client = await self.connect()
+        await client.send(id=1, source=many_definitions(60), parser='pypeg2')
+        for _ in range(100):
+            stats = await client.request(id='stats', op='stats')
+            if stats['running']:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(await client.request(id=2, op='cancel', target=1),
+                         {'id': 2, 'cancelled': True})
+        self.assertEqual(await client.receive(),
+                         {'id': 1, 'error': {'message': 'cancelled'}})
+
+        # the worker is still busy, so the next request waits for it
+        await client.send(id=3, source='opaque Datum[3];')
+        for _ in range(100):
+            stats = await client.request(id='stats', op='stats')
+            if stats['queued']:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual((stats['queued'], stats['running']), (1, 1))
+        self.assertEqual(await client.receive(), {'id': 3, 'code': 'Datum: u8[3]'})
+        stats = await client.request(id='stats', op='stats')
+        self.assertEqual((stats['queued'], stats['running']), (0, 0))
+        await client.close()
+
+    async def test_bad_ids(self):
+        client = await self.connect()
+        for request in [{'id': [1], 'source': SPEC},
+                        {'id': 1, 'op': 'cancel', 'target': {'id': 2}}]:
+            response = await client.request(**request)
+            self.assertEqual(response['id'], None)
+            self.assertTrue(response['error']['message'].startswith('bad request'))
+
+        # the second line is read before the first request is answered
+        client.writer.write(b'{"id": 1, "source": "opaque Datum[3];"}\n' * 2)
+        self.assertEqual(await client.receive(), {
+            'id': None, 'error': {'message': 'bad request: id 1 is in progress'}})
+        self.assertEqual(await client.receive(), {'id': 1, 'code': 'Datum: u8[3]'})
+        await client.close()
+
+    async def test_concurrent_clients(self):
+        clients = [await self.connect() for _ in range(3)]
+        responses = await asyncio.gather(*[
+            c.request(id=i, source='opaque Datum{}[3];'.format(i))
+            for i, c in enumerate(clients)])
+        self.assertEqual([r['code'] for r in responses],
+                         ['Datum{}: u8[3]'.format(i) for i in range(3)])
+        for client in clients:
+            await client.close()
+
+
+class ProcessPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def test_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), 'build.sock')
+        server = build_server.BuildServer(workers=2)
+        listener = await server.start(path=path)
+        try:
+            client = Client(*await asyncio.open_unix_connection(path))
+            response = await client.request(id='a', source='opaque Datum[3];')
+            self.assertEqual(response, {'id': 'a', 'code': 'Datum: u8[3]'})
+            await client.close()
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+
+class PercentilesTest(unittest.TestCase):
+    def test_percentiles(self):
+        self.assertEqual(dict(build_server.percentiles(range(1, 101))),
+                         {'p50': 50, 'p90': 90, 'p99': 99})
+        self.assertEqual(dict(build_server.percentiles([3.0])),
+                         {'p50': 3.0, 'p90': 3.0, 'p99': 3.0})
+        self.assertEqual(build_server.percentiles([])['p50'], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+import fast_parser
+from python_codec import CodecError
+from python_compiler import CompiledCodec
+from bulk_decode import BulkDecoder, record_offsets
+from record_stream import Framing
+from tests.test_record_stream import RECORDS
+
+
+def fragment_length(record):
+    return len(record.fragment)
+
+
+def count_types(counter, record):
+    counter[int(record.type)] += 1
+    return counter
+
+
+class BulkDecodeTest(unittest.TestCase):
+    def setUp(self):
+        codec = CompiledCodec(fast_parser.parse(RECORDS))
+        content_type = codec.python_type('ContentType')
+        record = codec.python_type('Record')
+        self.values = [record(content_type.handshake if i % 3 else content_type.alert,
+                              b'\x03\x03', bytes(i % 301)) for i in range(1000)]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.bin')
+        with open(self.path, 'wb') as f:
+            for value in self.values:
+                f.write(codec.encode('Record', value))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_offsets(self):
+        framing = Framing(3, 2, 300)
+        data = b'\x16\x03\x03\x00\x02ab\x15\x03\x03\x00\x00'
+        self.assertEqual(list(record_offsets(data, framing)), [0, 7, 12])
+        self.assertEqual(list(record_offsets(b'', framing)), [0])
+        for data in [data[:-1], data[:9]]:
+            with self.assertRaises(CodecError):
+                record_offsets(data, framing)
+        with self.assertRaises(CodecError):
+            record_offsets(b'\x16\x03\x03\x01\x2d', framing)
+
+    def test_map(self):
+        lengths = [i % 301 for i in range(1000)]
+        for processes in [1, 2]:
+            decoder = BulkDecoder(self.path, RECORDS, 'Record', processes, shard_size=64)
+            self.assertEqual(len(decoder), 1000)
+            self.assertEqual(len(decoder.shards()), 16)
+            self.assertEqual(list(decoder.map(fragment_length)), lengths)
+            self.assertEqual(sorted(decoder.map(fragment_length, ordered=False)),
+                             sorted(lengths))
+
+    def test_interleaved(self):
+        short = os.path.join(self.directory, 'short.bin')
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(short, 'wb') as f:
+            offsets = record_offsets(data, Framing(3, 2, 300))
+            f.write(data[offsets[500]:offsets[510]])
+        first = BulkDecoder(self.path, RECORDS, 'Record', 1, shard_size=4)
+        second = BulkDecoder(short, RECORDS, 'Record', 1, shard_size=4)
+        pairs = list(zip(first.map(fragment_length), second.map(fragment_length)))
+        self.assertEqual(pairs, [(i, (500 + i) % 301) for i in range(10)])
+
+    def test_reduce(self):
+        decoder = BulkDecoder(self.path, RECORDS, 'Record', 2, shard_size=300)
+        counters = decoder.reduce(count_types, collections.Counter)
+        self.assertEqual(len(counters), 4)
+        self.assertEqual(sum(counters, collections.Counter()),
+                         collections.Counter({22: 666, 21: 334}))
+
+    def test_empty(self):
+        open(self.path, 'wb').close()
+        self.assertEqual(list(BulkDecoder(self.path, RECORDS, 'Record').map(len)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+import compile_specs
+from tests.test_rfc_extractor import RFC_TEXT
+
+
+class CompileSpecsTest(unittest.TestCase):
+    maxDiff = None
+
+    files = {
+        'tls.spec': 'enum { red(3), blue(5), white(7) } Color;',
+        'other/tls.spec': 'struct { uint8 f1; } T;',
+        'draft-ietf-tls-esni-13.spec': 'opaque Datum[3];',
+        'rfc5246.txt': RFC_TEXT,
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+        for name, content in self.files.items():
+            path = os.path.join(self.directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_module_name(self):
+        self.assertEqual(compile_specs.module_name('a/draft-ietf-tls-esni-13.spec'),
+                         'draft_ietf_tls_esni_13')
+        self.assertEqual(compile_specs.module_name('8446.txt'), '_8446')
+
+    def test_parallel_output_is_deterministic(self):
+        serial = compile_specs.merge_modules(compile_specs.compile_files(self.paths, jobs=1))
+        parallel = compile_specs.merge_modules(compile_specs.compile_files(self.paths, jobs=2))
+
+        self.assertEqual(serial, parallel)
+        self.assertEqual(list(parallel), ['draft_ietf_tls_esni_13', 'rfc5246', 'tls'])
+
+    def test_same_module(self):
+        modules = compile_specs.merge_modules(compile_specs.compile_files(self.paths, jobs=2))
+        expected_code = '''// {}
+
+enum Color {{
+    red = 3,
+    blue = 5,
+    white = 7,
+}}
+
+// {}
+
+struct T {{
+    f1: u8,
+}}
+'''.format(*self.paths[:2])
+
+        self.assertEqual(expected_code, modules['tls'])
+
+    def test_rfc_definitions(self):
+        result = compile_specs.compile_file(self.paths[3])
+
+        self.assertIsNone(result.error)
+        self.assertEqual(result.definitions, 4)
+        self.assertIn('struct ClientHello {', result.code)
+
+    def test_main(self):
+        output_dir = os.path.join(self.directory, 'out')
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = compile_specs.main(['-j', '2', '-o', output_dir] + self.paths)
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(os.listdir(output_dir)),
+                         ['draft_ietf_tls_esni_13.rs', 'rfc5246.rs', 'tls.rs'])
+        self.assertIn('4 files in', stderr.getvalue())
+
+    def test_syntax_error(self):
+        path = os.path.join(self.directory, 'broken.spec')
+        with open(path, 'w') as f:
+            f.write('struct { uint8 a; }')
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = compile_specs.main(['-j', '1', path, self.paths[0]])
+
+        self.assertEqual(status, 1)
+        self.assertIn('broken.spec error:', stderr.getvalue())
+        self.assertIn('enum Color {', stdout.getvalue())
+
+    def test_compile_error(self):
+        path = os.path.join(self.directory, 'rfc5246-7.4.7.1.txt')
+        with open(path, 'w') as f:
+            f.write('''7.4.7.1.  RSA-Encrypted Premaster Secret Message
+
+      struct {
+          public-key-encrypted PreMasterSecret pre_master_secret;
+      } EncryptedPreMasterSecret;
+''')
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = compile_specs.main(['-j', '2', '--emit', 'codecs', path,
+                                         self.paths[0]])
+
+        self.assertEqual(status, 1)
+        self.assertIn('rfc5246-7.4.7.1.txt error: public-key-encrypted field '
+                      'pre_master_secret is not supported', stderr.getvalue())
+        self.assertIn('pub enum Color {', stdout.getvalue())
+
+    def test_check(self):
+        path = os.path.join(self.directory, 'ciphers.spec')
+        with open(path, 'w') as f:
+            f.write('struct { CipherSuite suite; Color color; } T;')
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = compile_specs.main(['-j', '2', '-q', '--check', path,
+                                         self.paths[0]])
+
+        self.assertEqual(status, 1)
+        self.assertEqual(stderr.getvalue(),
+                         '{}: T: undefined type CipherSuite\n'.format(path))
+
+    def test_emit_decoders(self):
+        output_dir = os.path.join(self.directory, 'out')
+        with redirect_stderr(io.StringIO()):
+            status = compile_specs.main(['-j', '2', '-q', '--emit', 'decoders',
+                                         '-o', output_dir] + self.paths)
+
+        self.assertEqual(status, 0)
+        with open(os.path.join(output_dir, 'rfc5246.rs')) as f:
+            code = f.read()
+        self.assertTrue(code.startswith('#[derive(Clone, Copy, Debug, PartialEq, Eq)]\npub enum Error {'))
+        self.assertIn("impl<'a> Parse<'a> for ClientHello<'a> {", code)
+        self.assertNotIn('View', code)
+
+        with redirect_stderr(io.StringIO()):
+            status = compile_specs.main(['-j', '2', '-q', '--emit', 'views',
+                                         '-o', output_dir] + self.paths)
+
+        self.assertEqual(status, 0)
+        with open(os.path.join(output_dir, 'rfc5246.rs')) as f:
+            code = f.read()
+        self.assertIn("impl<'a> Encode for ClientHello<'a> {", code)
+        self.assertIn("impl<'a> Parse<'a> for ClientHelloView<'a> {", code)
+
+    def test_partial_variants(self):
+        path = os.path.join(self.directory, 'variant.spec')
+        with open(path, 'w') as f:
+            f.write('enum { a(0), b(1), (255) } Kind;\n'
+                    'struct { Kind kind; select (Kind) { case a: uint8; } body; } T;')
+        output_dir = os.path.join(self.directory, 'out')
+
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            status = compile_specs.main(['-j', '1', '-q', '--emit', 'decoders',
+                                         '-o', output_dir, path])
+        self.assertEqual(status, 1)
+        self.assertEqual(stderr.getvalue(),
+                         'error: select (Kind) of T has no case for b\n')
+
+        with redirect_stderr(io.StringIO()):
+            status = compile_specs.main(['-j', '1', '-q', '--emit', 'decoders',
+                                         '--partial-variants', '-o', output_dir, path])
+        self.assertEqual(status, 0)
+        with open(os.path.join(output_dir, 'variant.rs')) as f:
+            self.assertIn('Kind::b => Err(Error::InvalidValue),', f.read())
+
+    def test_size_report(self):
+        report = os.path.join(self.directory, 'sizes.json')
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            status = compile_specs.main(['-j', '1', '-q', '--size-report', report]
+                                        + self.paths)
+
+        self.assertEqual(status, 0)
+        with open(report) as f:
+            sizes = json.load(f)
+        self.assertEqual(sizes['Color']['max'], 1)
+        self.assertEqual(sizes['ProtocolVersion']['file'], self.paths[3])
+        self.assertTrue(sizes['ProtocolVersion']['fixed'])
+
+    def test_profile(self):
+        stats = os.path.join(self.directory, 'build.prof')
+        folded = os.path.join(self.directory, 'build.folded')
+        stderr = io.StringIO()
+        with redirect_stdout(io.StringIO()), redirect_stderr(stderr):
+            status = compile_specs.main(['--profile', stats, '--flamegraph',
+                                         folded, '--slowest', '2'] + self.paths)
+
+        self.assertEqual(status, 0)
+        self.assertTrue(os.path.getsize(stats))
+        with open(folded) as f:
+            self.assertIn('compile;tuple;StructDef', f.read())
+        self.assertIn('slowest definitions', stderr.getvalue())
+        self.assertIn('lower NamedStructure', stderr.getvalue())
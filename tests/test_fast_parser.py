@@ -0,0 +1,142 @@
+import unittest
+
+import pypeg2
+from pypeg2 import Namespace
+
+import fast_parser
+import parsers
+from grammar import Definitions, ScalarField, NamedStructure
+from rust_compiler import compile_packet_representation
+
+import tests.test_parse_constant_vector_field as constant_vector_field
+import tests.test_parse_crypto_attributes as crypto_attributes
+import tests.test_parse_enum as enum
+import tests.test_parse_structure as structure
+import tests.test_parse_variable_vector_field as variable_vector_field
+import tests.test_parse_variant_structure as variant_structure
+
+
+def fast(cls):
+    return type('Fast' + cls.__name__, (cls,),
+                {'parse': staticmethod(fast_parser.parse)})
+
+FastParseConstantVectorFieldTest = fast(constant_vector_field.ParseConstantVectorFieldTest)
+FastParseCryptographicAttributesTest = fast(crypto_attributes.ParseCryptographicAttributesTest)
+FastParseExternalEnumTest = fast(enum.ParseExternalEnumTest)
+FastParseInternalEnumTest = fast(enum.ParseInternalEnumTest)
+FastParseNamedStructureTest = fast(structure.ParseNamedStructureTest)
+FastParseUnnamedStructureTest = fast(structure.ParseUnnamedStructureTest)
+FastParseVariableVectorFieldTest = fast(variable_vector_field.ParseVariableVectorFieldTest)
+FastParseNamedVariantStructureTest = fast(variant_structure.ParseNamedVariantStructureTest)
+
+
+def dump(obj, positions=False):
+    '''Flatten a syntax tree into comparable tuples.
+
+    Positions are left out by default: pypeg2 does not advance them when it
+    reuses a memoized result, so they drift after the first backtracked
+    structure.
+    '''
+    position = getattr(obj, 'position_in_text', None) if positions else None
+    if isinstance(obj, str):
+        return (type(obj).__name__, str(obj), position)
+    if isinstance(obj, list):
+        return (type(obj).__name__, [dump(o, positions) for o in obj], position)
+
+    attrs = sorted((k, dump(v, positions)) for k, v in vars(obj).items()
+                   if k not in ('data', 'namespace', 'position_in_text'))
+    if isinstance(obj, Namespace):
+        attrs.append(('data', [dump(v, positions) for v in obj.data.values()]))
+    return (type(obj).__name__, attrs, position)
+
+
+class FastParserTest(unittest.TestCase):
+    maxDiff = None
+
+    code = '''
+      enum { red(3), blue(5), white(7) } Color;
+      enum { sweet(1), sour(2), bitter(4), (32000) } Taste;
+      enum { low, medium, high } Amount;
+      opaque Datum[3];
+      Datum Data[9];
+      uint16 longer<0..800>;
+
+      stream-ciphered struct {
+          uint8 field1;
+          uint8 field2;
+          digitally-signed struct {
+            uint8 field3<0..255>;
+            uint8 field4;
+          };
+      } UserType;
+
+      struct {
+          HandshakeType msg_type;
+          uint24 length;
+          select (HandshakeType) {
+              case hello_request:       HelloRequest;
+              case client_hello:        ClientHello;
+              case orange:
+              case banana:              V2;
+          } body;
+      } Handshake;
+    '''
+
+    def test_same_tree_as_pypeg2(self):
+        expected = pypeg2.parse(self.code, Definitions)
+        actual = fast_parser.parse(self.code, Definitions)
+
+        self.assertEqual(dump(expected), dump(actual))
+
+    def test_same_rust_code_as_pypeg2(self):
+        expected = compile_packet_representation(pypeg2.parse(self.code, Definitions))
+        actual = compile_packet_representation(fast_parser.parse(self.code, Definitions))
+
+        self.assertEqual(expected, actual)
+
+    def test_empty_input(self):
+        self.assertEqual(dump(pypeg2.parse('', Definitions)),
+                         dump(fast_parser.parse('', Definitions)))
+
+    def test_positions(self):
+        ast = fast_parser.parse(self.code, Definitions)
+        handshake = ast[-1]
+        body = handshake.structure_variant
+
+        self.assertEqual(handshake.position_in_text,
+                         (18, self.code.index('struct {\n          Handshake')))
+        self.assertEqual(body.variant_cases[2].position_in_text,
+                         (24, self.code.index('case orange')))
+
+    def test_syntax_error_position(self):
+        code = 'uint8 a;\nuint8 b<0..1;\n'
+        with self.assertRaises(SyntaxError) as cm:
+            fast_parser.parse(code, Definitions)
+
+        self.assertEqual(cm.exception.lineno, 2)
+        self.assertEqual(cm.exception.text, 'uint8 b<0..1;')
+
+    def test_trailing_input(self):
+        with self.assertRaises(SyntaxError):
+            fast_parser.parse('uint8 a; }', Definitions)
+
+    def test_wrong_production(self):
+        with self.assertRaises(SyntaxError):
+            fast_parser.parse('uint8 a<0..1>;', ScalarField)
+
+    def test_variant_requires_name(self):
+        with self.assertRaises(SyntaxError):
+            fast_parser.parse('struct { select (T) { case a: A; } body; };',
+                              Definitions)
+
+
+class ParserBackendsTest(unittest.TestCase):
+    def test_select_backend(self):
+        code = 'struct { uint8 a; } T;'
+        for backend in ['pypeg2', 'packrat', 'fast']:
+            ast = parsers.parse(code, backend=backend)
+            self.assertIs(type(ast[0]), NamedStructure)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            parsers.parse('', backend='yacc')
@@ -0,0 +1,148 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+import compile_specs
+from incremental import IncrementalBuild, split_definitions
+from tests.test_rfc_extractor import RFC_TEXT
+
+SPEC = '''enum { red(3), blue(5), (255) } Color;
+
+opaque SessionID<0..32>;
+
+struct {
+    Color color;
+    SessionID session_id;
+    digitally-signed struct {
+        uint8 data<0..255>;
+    };
+} Paint;
+
+struct {
+    Paint paint;
+    select (Color) {
+        case red: Red;
+        case blue: Blue;
+    } body;
+} Picture;
+
+struct { uint16 width; } Frame;
+'''
+
+
+class IncrementalTest(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.state = os.path.join(self.directory, 'out', '.incremental.json')
+        self.spec = self.write('tls.spec', SPEC)
+        self.rfc = self.write('rfc5246.txt', RFC_TEXT)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def build(self, backend='fast'):
+        build = IncrementalBuild(self.state, backend)
+        results = build.compile_files([self.spec, self.rfc])
+        build.save()
+        return build, results
+
+    def assertSameAsFullBuild(self, results):
+        for result in results:
+            full = compile_specs.compile_file(result.path, backend='fast')
+            self.assertIsNone(result.error)
+            self.assertEqual(full.code, result.code)
+
+    def test_split_definitions(self):
+        chunks = split_definitions(SPEC)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(''.join(chunks), SPEC.rstrip())
+        self.assertTrue(chunks[2].strip().startswith('struct {'))
+        self.assertTrue(chunks[2].strip().endswith('} Paint;'))
+        self.assertEqual(split_definitions('struct { $ } T;'), ['struct { $ } T;'])
+
+    def test_unchanged(self):
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.reused, 0)
+
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.parsed, 0)
+        self.assertEqual([r.cached for r in results], [5, 5])
+
+    def test_changed_definition(self):
+        self.build()
+        self.write('tls.spec', SPEC.replace('uint16 width', 'uint32 width'))
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.parsed, 1)
+        self.assertIn('width: u32', results[0].code)
+
+    def test_dependents(self):
+        self.build()
+        # Paint and Picture refer to Color
+        self.write('tls.spec', SPEC.replace('blue(5)', 'blue(6)'))
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.parsed, 3)
+
+        # Picture refers to Paint
+        self.write('tls.spec', SPEC.replace('blue(5)', 'blue(6)')
+                                   .replace('uint8 data', 'uint16 data'))
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.parsed, 2)
+
+    def test_removed_definition(self):
+        self.build()
+        self.write('tls.spec', SPEC.replace('opaque SessionID<0..32>;', ''))
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+        # Paint, Picture and the ClientHello of the RFC
+        self.assertEqual(build.parsed, 3)
+        self.assertNotIn('SessionID: Vec<u8>', results[0].code)
+
+    def test_backend_changed(self):
+        self.build()
+        build, results = self.build(backend='pypeg2')
+        self.assertSameAsFullBuild(results)
+        self.assertEqual(build.parsed, 10)
+
+    def test_syntax_error(self):
+        self.build()
+        self.write('tls.spec', SPEC + 'struct {')
+        build, results = self.build()
+        self.assertIsNotNone(results[0].error)
+        self.assertEqual(results[1].cached, 5)
+
+        self.write('tls.spec', SPEC)
+        build, results = self.build()
+        self.assertSameAsFullBuild(results)
+
+    def test_main(self):
+        output_dir = os.path.dirname(self.state)
+        args = ['-q', '--incremental', '-o', output_dir, self.spec, self.rfc]
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            self.assertEqual(compile_specs.main(args), 0)
+            path = os.path.join(output_dir, 'tls.rs')
+            os.utime(path, (0, 0))
+            self.assertEqual(compile_specs.main(args), 0)
+            self.assertEqual(os.path.getmtime(path), 0)
+
+            with self.assertRaises(SystemExit):
+                compile_specs.main(['--incremental', self.spec])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import pypeg2
+
+import fast_parser
+from grammar import Definitions
+from ir import *
+from rust_compiler import compile_packet_representation
+from tests import test_fast_parser
+
+
+class LowerTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_struct(self):
+        ast = pypeg2.parse('''struct {
+            uint8 major;
+            opaque random[32];
+            opaque session_id<0..2^8-1>;
+            select (HandshakeType) {
+                case hello_request: HelloRequest;
+                case client_hello: case server_hello: Hello;
+            } body;
+        } T;''', Definitions)
+
+        self.assertEqual(lower(ast), (
+            StructDef('T', None, (
+                FieldDef('major', 'uint8', None),
+                VectorField('random', 'opaque', 32, None, None),
+                VectorField('session_id', 'opaque', None, 0, 255),
+            ), VariantDef('body', 'HandshakeType', (
+                VariantCaseDef(('hello_request',), 'HelloRequest'),
+                VariantCaseDef(('client_hello', 'server_hello'), 'Hello'),
+            ))),
+        ))
+
+    def test_enums(self):
+        ast = pypeg2.parse('''enum { red(3), blue(0x10), (255) } Color;
+            enum { low, high } Amount;''', Definitions)
+
+        color, amount = lower(ast)
+        self.assertEqual(color, EnumDef('Color', (EnumMember('red', 3),
+                                                  EnumMember('blue', 16)), 255))
+        self.assertTrue(color.external)
+        self.assertEqual(amount, EnumDef('Amount', (EnumMember('low', None),
+                                                    EnumMember('high', None)), None))
+        self.assertFalse(amount.external)
+
+    def test_unnamed_structures(self):
+        ast = pypeg2.parse('''struct {
+            struct { uint8 a; };
+            digitally-signed struct { uint8 b; };
+        } T;''', Definitions)
+
+        (outer,) = lower(ast)
+        self.assertEqual(outer.fields, (
+            StructDef(None, None, (FieldDef('a', 'uint8', None),), None),
+            StructDef(None, 'digitally-signed', (FieldDef('b', 'uint8', None),), None),
+        ))
+
+    def test_same_ir_from_all_backends(self):
+        code = test_fast_parser.FastParserTest.code
+        self.assertEqual(lower(fast_parser.parse(code)),
+                         lower(pypeg2.parse(code, Definitions)))
+
+    def test_compile(self):
+        ast = fast_parser.parse(test_fast_parser.FastParserTest.code)
+        self.assertEqual(compile_packet_representation(lower(ast)),
+                         compile_packet_representation(ast))
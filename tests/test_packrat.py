@@ -0,0 +1,77 @@
+import unittest
+
+import pypeg2
+
+import fast_parser
+import packrat
+from grammar import Definitions, NamedStructure
+from benchmarks.specs import nested_structures
+from rust_compiler import compile_packet_representation
+
+import tests.test_parse_constant_vector_field as constant_vector_field
+import tests.test_parse_crypto_attributes as crypto_attributes
+import tests.test_parse_enum as enum
+import tests.test_parse_structure as structure
+import tests.test_parse_variable_vector_field as variable_vector_field
+import tests.test_parse_variant_structure as variant_structure
+from tests.test_fast_parser import FastParserTest, dump
+
+
+def packrat_test(cls):
+    return type('Packrat' + cls.__name__, (cls,),
+                {'parse': staticmethod(packrat.parse)})
+
+PackratParseConstantVectorFieldTest = packrat_test(constant_vector_field.ParseConstantVectorFieldTest)
+PackratParseCryptographicAttributesTest = packrat_test(crypto_attributes.ParseCryptographicAttributesTest)
+PackratParseExternalEnumTest = packrat_test(enum.ParseExternalEnumTest)
+PackratParseInternalEnumTest = packrat_test(enum.ParseInternalEnumTest)
+PackratParseNamedStructureTest = packrat_test(structure.ParseNamedStructureTest)
+PackratParseUnnamedStructureTest = packrat_test(structure.ParseUnnamedStructureTest)
+PackratParseVariableVectorFieldTest = packrat_test(variable_vector_field.ParseVariableVectorFieldTest)
+PackratParseNamedVariantStructureTest = packrat_test(variant_structure.ParseNamedVariantStructureTest)
+
+
+class PackratParserTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_same_tree_as_pypeg2(self):
+        code = FastParserTest.code
+        self.assertEqual(dump(pypeg2.parse(code, Definitions)),
+                         dump(packrat.parse(code, Definitions)))
+
+    def test_positions_do_not_drift(self):
+        code = FastParserTest.code
+        self.assertEqual(dump(fast_parser.parse(code, Definitions), positions=True),
+                         dump(packrat.parse(code, Definitions), positions=True))
+
+    def test_deeply_nested_crypto_structures(self):
+        '4.7.  Cryptographic Attributes'
+        code = nested_structures(32)
+        expected = compile_packet_representation(pypeg2.parse(code, Definitions))
+        actual = compile_packet_representation(packrat.parse(code, Definitions))
+
+        self.assertEqual(expected, actual)
+
+    def test_memory_is_per_parse_call(self):
+        parser = packrat.PackratParser()
+        parser.parse('struct { uint8 a; } T;', Definitions)
+        self.assertTrue(parser._memory)
+
+        parser.clear_memory()
+        self.assertFalse(parser._memory)
+
+        ast = packrat.parse('struct { uint8 b; } U;', Definitions)
+        self.assertIs(type(ast[0]), NamedStructure)
+        self.assertEqual(ast[0].name, 'U')
+
+    def test_reused_parser(self):
+        parser = packrat.PackratParser()
+        for text, name in [('struct { uint8 a; } T;', 'T'),
+                           ('struct { uint8 b; } U;', 'U')]:
+            t, ast = parser.parse(text, Definitions)
+            self.assertEqual(t, '')
+            self.assertEqual(ast[0].name, name)
+
+    def test_syntax_error(self):
+        with self.assertRaises(SyntaxError):
+            packrat.parse('struct { uint8 a; } T', Definitions)
@@ -0,0 +1,71 @@
+import io
+import unittest
+
+import fast_parser
+import ir
+import rust_compiler
+from profiling import Profile
+
+
+class ProfileTest(unittest.TestCase):
+    code = '''
+        enum { red(3), blue(5), (255) } Color;
+        struct {
+            Color color;
+            select (Color) {
+                case red: Red;
+                case blue: Blue;
+            } body;
+        } Paint;
+    '''
+
+    def test_counts(self):
+        ast = fast_parser.parse(self.code)
+        with Profile() as profile:
+            code = rust_compiler.compile_packet_representation(ast)
+
+        self.assertEqual(code, rust_compiler.compile_packet_representation(ast))
+        phases = profile.phase_timings()
+        self.assertEqual(list(phases), ['lower', 'compile'])
+        self.assertEqual(phases['compile'].count, 1)
+        self.assertGreaterEqual(phases['compile'].total, phases['compile'].own)
+
+        nodes = profile.node_timings()
+        self.assertEqual(nodes['lower', 'NamedStructure'].count, 1)
+        self.assertEqual(nodes['compile', 'EnumMember'].count, 2)
+        self.assertEqual(nodes['compile', 'VariantCaseDef'].count, 2)
+        self.assertEqual(nodes['compile', 'typename'].count, 2)
+
+        self.assertEqual(sorted(name for name, _ in profile.slowest()),
+                         ['Color', 'Paint'])
+
+    def test_hooks_removed(self):
+        compile_ = rust_compiler._compile
+        lower = ir.lower
+        with Profile():
+            self.assertIsNot(rust_compiler._compile, compile_)
+        self.assertIs(rust_compiler._compile, compile_)
+        self.assertIs(ir.lower, lower)
+
+    def test_output(self):
+        with Profile() as profile:
+            rust_compiler.compile_packet_representation(
+                fast_parser.parse(self.code))
+        out = io.StringIO()
+        profile.write(out, slowest=1)
+        self.assertIn('compile StructDef', out.getvalue())
+        self.assertEqual(len(out.getvalue().split('slowest definitions\n')[1]
+                             .splitlines()), 1)
+
+        folded = io.StringIO()
+        profile.write_folded(folded)
+        for line in folded.getvalue().splitlines():
+            stack, microseconds = line.rsplit(' ', 1)
+            self.assertIn(stack.split(';')[0], ('lower', 'compile'))
+            self.assertGreater(int(microseconds), 0)
+        with self.assertRaises(ValueError):
+            profile.dump('unused.prof')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+
+import fast_parser
+from python_codec import Codec, CodecError, DigitallySigned
+from benchmarks import codec_throughput
+from benchmarks.specs import rfc5246
+from tests.test_rust_codec import HANDSHAKE, FALL_THROUGH, LISTS
+
+RECORD = bytes([
+    1, 0, 0, 45,                        # client_hello, length
+    3, 3,                               # client_version
+    7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+    7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+    2, 0xab, 0xcd,                      # session_id
+    0, 4, 0x13, 0x01, 0xc0, 0x2f,       # cipher_suites
+    1, 0,                               # compression_methods
+])
+
+
+class PythonCodecTest(unittest.TestCase):
+    def setUp(self):
+        self.codec = Codec(fast_parser.parse(HANDSHAKE))
+
+    def test_decode(self):
+        handshake = self.codec.decode('Handshake', RECORD)
+        self.assertEqual(handshake.msg_type,
+                         self.codec.python_type('HandshakeType').client_hello)
+        self.assertEqual(handshake.length, 45)
+
+        hello = handshake.body
+        self.assertEqual(hello.client_version, (3, 3))
+        self.assertEqual(type(hello.client_version).__name__, 'ProtocolVersion')
+        self.assertEqual(bytes(hello.session_id), b'\xab\xcd')
+        self.assertEqual([bytes(s) for s in hello.cipher_suites],
+                         [b'\x13\x01', b'\xc0\x2f'])
+        self.assertEqual(bytes(hello.compression_methods), b'\x00')
+        # vectors of bytes are views of the input
+        self.assertIsInstance(hello.random, memoryview)
+        self.assertIs(hello.random.obj, RECORD)
+
+    def test_encode(self):
+        handshake = self.codec.decode('Handshake', RECORD)
+        self.assertEqual(self.codec.encode('Handshake', handshake), RECORD)
+
+        hello = handshake.body._replace(session_id=b'', cipher_suites=[b'\x00\x01'])
+        data = self.codec.encode('ClientHello', hello)
+        self.assertEqual(len(data), 45 - 2 - 2)
+        self.assertEqual(self.codec.decode('ClientHello', data).cipher_suites[0],
+                         b'\x00\x01')
+
+        with self.assertRaises(CodecError):
+            self.codec.encode('ClientHello', hello._replace(cipher_suites=[]))
+        with self.assertRaises(CodecError):
+            self.codec.encode('ClientHello', hello._replace(random=b'short'))
+        with self.assertRaises(CodecError):
+            self.codec.encode('ProtocolVersion', (3, 256))
+
+    def test_errors(self):
+        for data, message in [
+                (RECORD[:20], 'truncated Handshake'),
+                (RECORD[:44], 'truncated cipher_suites'),
+                (RECORD + b'\xff', '1 trailing bytes after Handshake'),
+                (b'\x07\x00\x00\x00', 'invalid value 7 of HandshakeType')]:
+            with self.assertRaises(CodecError) as raised:
+                self.codec.decode('Handshake', data)
+            self.assertEqual(str(raised.exception), message)
+
+        with self.assertRaises(CodecError) as raised:
+            self.codec.decode('SessionID', bytes([33]) + bytes(33))
+        self.assertEqual(str(raised.exception), 'invalid length 33 of SessionID')
+        with self.assertRaises(CodecError):
+            self.codec.decode('Unknown', b'')
+
+    def test_decode_from(self):
+        value, end = self.codec.decode_from('ProtocolVersion', b'\x00\x03\x01\xff', 1)
+        self.assertEqual((value, end), ((3, 1), 3))
+
+    def test_vectors(self):
+        codec = Codec(fast_parser.parse(LISTS))
+        data = bytes([
+            0, 4, 0x13, 0x01, 0xc0, 0x2f,       # suites
+            6, 0, 0, 1, 1, 0, 0,                # lengths
+            4, 3, 255, 5, 128,                  # pixels
+            5, 1, 0x61, 2, 0x62, 0x63,          # names
+            0, 0, 0, 1, 0xff, 0xff, 0xff, 0xff, # pair
+        ])
+        lists = codec.decode('Lists', data)
+        self.assertEqual(lists.suites, (0x1301, 0xc02f))
+        self.assertEqual(lists.lengths, (1, 65536))
+        color = codec.python_type('Color')
+        self.assertEqual(lists.pixels, ((color.red, 255), (color.blue, 128)))
+        self.assertEqual([bytes(n) for n in lists.names], [b'a', b'bc'])
+        self.assertEqual(lists.pair, (1, 2**32 - 1))
+        self.assertEqual(codec.encode('Lists', lists), data)
+
+        for data in [bytes([0, 3, 0, 1, 2]), bytes([0, 2, 0, 1, 1, 0])]:
+            with self.assertRaises(CodecError) as raised:
+                codec.decode('Lists', data)
+            self.assertTrue(str(raised.exception).startswith('invalid length'))
+        # a name extending beyond the vector of names
+        with self.assertRaises(CodecError):
+            codec.decode('Lists', bytes([0, 2, 0, 1, 0, 0, 2, 5, 0x61]))
+
+    def test_variant(self):
+        codec = Codec(fast_parser.parse(FALL_THROUGH))
+        kind = codec.python_type('Kind')
+        self.assertEqual(codec.decode('T', b'\x00\x01\x02'), (kind.a, 258))
+        self.assertEqual(codec.decode('T', b'\x01\x01\x02'), (kind.b, 258))
+        self.assertEqual(codec.decode('T', b'\x02\x09'), (kind.c, 9))
+        self.assertEqual(codec.encode('T', (kind.c, 9)), b'\x02\x09')
+        with self.assertRaises(CodecError):
+            codec.decode('T', b'\x03\x00')
+        with self.assertRaises(CodecError):
+            codec.encode('T', (kind.d, 0))
+
+        codec = Codec(fast_parser.parse('''
+            enum { a(0), (255) } Kind;
+            struct { Kind kind; select (Kind) { case a: case e: uint8; } body; } T;'''))
+        with self.assertRaises(CodecError) as raised:
+            codec.decode('T', b'\x00\x01')
+        self.assertEqual(str(raised.exception), 'e is not a member of Kind')
+
+    def test_external_selector(self):
+        codec = Codec(fast_parser.parse('''
+            enum { a(0), b(1), (255) } Kind;
+            struct { uint8 x; select (Kind) { case a: uint8; case b: uint16; } body; } T;'''))
+        kind = codec.python_type('Kind')
+        self.assertEqual(codec.decode('T', b'\x05\x01\x02', selector=kind.b),
+                         (5, 258))
+        self.assertEqual(codec.encode('T', (5, 258), selector=kind.b), b'\x05\x01\x02')
+        with self.assertRaises(CodecError):
+            codec.decode('T', b'\x05\x01\x02')
+
+    def test_cryptographic_attributes(self):
+        codec = Codec(fast_parser.parse('''struct {
+            uint8 type;
+            digitally-signed struct { uint8 data<0..255>; };
+            stream-ciphered struct { uint16 counter; };
+        } T;'''))
+        value = codec.decode('T', b'\x09\x04\x03\x00\x02\xaa\xbbsecret')
+        self.assertEqual(value._fields, ('type', 'signed', 'ciphered'))
+        self.assertEqual(value.signed, DigitallySigned(4, 3, b'\xaa\xbb'))
+        self.assertEqual(bytes(value.ciphered), b'secret')
+        self.assertEqual(codec.encode('T', value), b'\x09\x04\x03\x00\x02\xaa\xbbsecret')
+        # the plaintexts have their own types
+        self.assertEqual(codec.python_type('TSigned')._fields, ('data',))
+        self.assertEqual(codec.python_type('TCiphered')._fields, ('counter',))
+
+    def test_keywords(self):
+        codec = Codec(fast_parser.parse('struct { uint8 from; uint16 pass; } T;'))
+        self.assertEqual(codec.python_type('T')._fields, ('from_', 'pass_'))
+
+    def test_rfc5246(self):
+        codec = Codec(fast_parser.parse(rfc5246()))
+        record = codec_throughput.client_hello(codec)
+        handshake = codec.decode('Handshake', record)
+        self.assertEqual(len(handshake.body.cipher_suites), 16)
+        self.assertEqual(len(handshake.body.extensions), 4)
+        self.assertEqual(codec.encode('Handshake', handshake), record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+
+import fast_parser
+import python_compiler
+from python_codec import Codec, CodecError
+from python_compiler import CompiledCodec, compile_python_decoders, load
+from benchmarks import codec_throughput
+from benchmarks.specs import rfc5246
+from tests.test_rust_codec import HANDSHAKE, FALL_THROUGH, LISTS
+from tests.test_python_codec import RECORD
+
+CRYPTO = '''struct {
+    uint8 type;
+    digitally-signed struct { uint8 data<0..255>; };
+    stream-ciphered struct { uint16 counter; };
+} T;'''
+
+
+class PythonCompilerTest(unittest.TestCase):
+    def assertSameDecode(self, spec, name, samples, **kwargs):
+        '''Check that both codecs decode the samples alike, or fail alike.'''
+        definitions = fast_parser.parse(spec)
+        codec, compiled = Codec(definitions), CompiledCodec(definitions)
+        for data in samples:
+            try:
+                expected = codec.decode(name, data, **kwargs)
+            except CodecError as error:
+                with self.assertRaises(CodecError) as raised:
+                    compiled.decode(name, data, **kwargs)
+                self.assertEqual(str(raised.exception), str(error))
+                continue
+            value = compiled.decode(name, data, **kwargs)
+            self.assertEqual(value, expected)
+            self.assertEqual(type(value).__name__, type(expected).__name__)
+        return compiled
+
+    def test_handshake(self):
+        compiled = self.assertSameDecode(HANDSHAKE, 'Handshake', [
+            RECORD, RECORD[:20], RECORD[:44], RECORD + b'\xff',
+            b'\x07\x00\x00\x00', b'\x00\x00\x00\x00'])
+        self.assertSameDecode(HANDSHAKE, 'SessionID', [bytes([33]) + bytes(33)])
+        hello = compiled.decode('Handshake', RECORD).body
+        self.assertIs(hello.random.obj, RECORD)
+        # the compiled codec encodes its own values
+        self.assertEqual(compiled.encode('Handshake', compiled.decode('Handshake', RECORD)),
+                         RECORD)
+        with self.assertRaises(CodecError):
+            compiled.decode('Unknown', b'')
+
+    def test_fixed_layouts(self):
+        source = compile_python_decoders(fast_parser.parse(HANDSHAKE))
+        # client_version and random are read by one unpack
+        self.assertIn("_Struct('>BB32x')", source)
+        self.assertIn('_arms_Handshake = {0: _decode_HelloRequest, '
+                      '1: _decode_ClientHello}', source)
+        self.assertIs(load(source), load(source))
+
+    def test_module_cache(self):
+        source = compile_python_decoders(fast_parser.parse(HANDSHAKE))
+        namespace = load(source)
+        for i in range(python_compiler.max_modules):
+            load(compile_python_decoders(fast_parser.parse('opaque D{}[3];'.format(i))))
+        self.assertEqual(len(python_compiler._modules), python_compiler.max_modules)
+        # the least recently used module was dropped
+        self.assertIsNot(load(source), namespace)
+
+    def test_vectors(self):
+        self.assertSameDecode(LISTS, 'Lists', [
+            bytes([0, 4, 0x13, 0x01, 0xc0, 0x2f, 6, 0, 0, 1, 1, 0, 0, 4, 3, 255,
+                   5, 128, 5, 1, 0x61, 2, 0x62, 0x63, 0, 0, 0, 1, 0xff, 0xff,
+                   0xff, 0xff]),
+            bytes([0, 3, 0, 1, 2]), bytes([0, 2, 0, 1, 1, 0]),
+            bytes([0, 2, 0, 1, 0, 0, 2, 5, 0x61]),
+            # a pixel of an invalid color
+            bytes([0, 0, 0, 2, 9, 0])])
+
+    def test_variant(self):
+        self.assertSameDecode(FALL_THROUGH, 'T', [
+            b'\x00\x01\x02', b'\x01\x01\x02', b'\x02\x09', b'\x03\x00', b'\x00'])
+        spec = '''
+            enum { a(0), b(1), (255) } Kind;
+            struct { uint8 x; select (Kind) { case a: uint8; case b: uint16; } body; } T;'''
+        self.assertSameDecode(spec, 'T', [b'\x05\x01\x02'], selector=1)
+        self.assertSameDecode(spec, 'T', [b'\x05\x01\x02'])
+        # a label that is not a member fails the type, not the codec
+        compiled = self.assertSameDecode(spec.replace('case b:', 'case e:'), 'T',
+                                         [b'\x05\x01\x02'], selector=1)
+        self.assertEqual(compiled.decode('Kind', b'\x01'), 1)
+
+    def test_cryptographic_attributes(self):
+        compiled = self.assertSameDecode(CRYPTO, 'T', [
+            b'\x09\x04\x03\x00\x02\xaa\xbbsecret', b'\x09\x04\x03\x00\x09\xaa'])
+        self.assertEqual(compiled.python_type('TSigned')._fields, ('data',))
+
+    def test_rfc5246(self):
+        definitions = fast_parser.parse(rfc5246())
+        record = codec_throughput.client_hello(Codec(definitions))
+        compiled = self.assertSameDecode(rfc5246(), 'Handshake',
+                                         [record, record[:100], record[:-1]])
+        self.assertEqual(len(compiled.decode('Handshake', record).body.extensions), 4)
+
+    def test_views(self):
+        compiled = CompiledCodec(fast_parser.parse(HANDSHAKE))
+        handshake = compiled.view('Handshake', RECORD)
+        decoded = compiled.decode('Handshake', RECORD)
+        self.assertEqual((handshake.msg_type, handshake.length), decoded[:2])
+        hello = handshake.body
+        self.assertEqual(repr(hello), '<ClientHello view of 45 bytes>')
+        for field in hello._fields:
+            self.assertEqual(getattr(hello, field), getattr(decoded.body, field))
+        self.assertEqual(bytes(hello.as_bytes()), RECORD[4:])
+
+        for data, message in [
+                (RECORD[:20], 'truncated Handshake'),
+                (RECORD[:44], 'truncated cipher_suites'),
+                (RECORD + b'\xff', '1 trailing bytes after Handshake'),
+                (b'\x07\x00\x00\x00', 'invalid value 7 of HandshakeType')]:
+            with self.assertRaises(CodecError) as raised:
+                compiled.view('Handshake', data)
+            self.assertEqual(str(raised.exception), message)
+        with self.assertRaises(CodecError):
+            compiled.view('SessionID', b'\x00')
+
+    def test_lazy_validation(self):
+        compiled = CompiledCodec(fast_parser.parse(LISTS))
+        # a pixel of an invalid color
+        lists = compiled.view('Lists', bytes([0, 2, 0, 1, 0, 2, 9, 0, 0]) + bytes(8))
+        self.assertEqual(lists.suites, (1,))
+        self.assertEqual(lists.pair, (0, 0))
+        with self.assertRaises(CodecError):
+            lists.pixels
+
+        t = CompiledCodec(fast_parser.parse(FALL_THROUGH)).view('T', b'\x01\x01\x02')
+        self.assertEqual((t.kind, t.body), (1, 258))
+
+        # the data of the first extension covers the second
+        t = CompiledCodec(fast_parser.parse('''
+            struct { uint16 type; opaque data<0..255>; } Extension;
+            struct { Extension extensions<0..255>; } T;''')).view(
+                'T', b'\x05\x00\x01\x00\x00\x01')
+        with self.assertRaises(CodecError) as raised:
+            t.extensions
+        self.assertEqual(str(raised.exception), 'truncated extensions')
+
+    def test_rfc5246_views(self):
+        definitions = fast_parser.parse(rfc5246())
+        record = codec_throughput.client_hello(Codec(definitions))
+        compiled = CompiledCodec(definitions)
+        hello = compiled.view('Handshake', record).body
+        self.assertEqual(len(hello.cipher_suites), 16)
+        self.assertEqual(hello.extensions, compiled.decode('Handshake', record).body.extensions)
+
+
+if __name__ == '__main__':
+    unittest.main()
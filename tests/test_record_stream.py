@@ -0,0 +1,109 @@
+import asyncio
+import io
+import socket
+import threading
+import unittest
+
+import fast_parser
+from python_codec import Codec, CodecError
+from python_compiler import CompiledCodec
+from record_stream import RecordStream, Framing, framing
+from benchmarks.specs import rfc5246
+
+RECORDS = '''
+enum { alert(21), handshake(22), (255) } ContentType;
+struct { ContentType type; uint8 version[2]; opaque fragment<0..300>; } Record;
+struct { uint8 a; opaque data<0..2^16-1>; uint8 b; } Trailer;
+'''
+
+
+class Chunks(object):
+    '''A file returning at most size bytes per read.'''
+    def __init__(self, data, size):
+        self.file = io.BytesIO(data)
+        self.size = size
+
+    def readinto(self, buffer):
+        return self.file.readinto(buffer[:self.size])
+
+
+class RecordStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.codec = CompiledCodec(fast_parser.parse(RECORDS))
+        content_type = self.codec.python_type('ContentType')
+        record = self.codec.python_type('Record')
+        self.values = [record(content_type.handshake if i % 3 else content_type.alert,
+                              b'\x03\x03', bytes([i]) * (i * 7 % 301))
+                       for i in range(100)]
+        self.data = b''.join(self.codec.encode('Record', v) for v in self.values)
+
+    def stream(self, **kwargs):
+        return RecordStream(self.codec, 'Record', **kwargs)
+
+    def test_framing(self):
+        self.assertEqual(framing(self.codec.table, 'Record'), Framing(3, 2, 300))
+        self.assertEqual(Framing(3, 2, 300).size, 305)
+        with self.assertRaises(CodecError):
+            framing(self.codec.table, 'Trailer')
+        with self.assertRaises(CodecError):
+            framing(self.codec.table, 'ContentType')
+        table = Codec(fast_parser.parse(rfc5246())).table
+        self.assertEqual(framing(table, 'TLSPlaintext'), Framing(5, 2, 2**14))
+
+    def test_messages(self):
+        for size in [1, 7, 300, 100000]:
+            stream = self.stream(copy=True)
+            messages = list(stream.messages(Chunks(self.data, size)))
+            self.assertEqual(messages, self.values)
+            # the buffer does not grow with the input
+            self.assertEqual(len(stream.buffer), 2 * 305)
+
+    def test_views(self):
+        stream = self.stream()
+        for value, message in zip(self.values, stream.messages(io.BytesIO(self.data))):
+            self.assertEqual(message, value)
+            self.assertIs(message.fragment.obj, stream.buffer)
+
+    def test_read(self):
+        class Reader(object):
+            def __init__(self, data):
+                self.file = io.BytesIO(data)
+
+            def read(self, size):
+                return self.file.read(min(size, 11))
+        records = list(bytes(r) for r in self.stream().records(Reader(self.data)))
+        self.assertEqual(b''.join(records), self.data)
+        self.assertEqual(len(records), 100)
+
+    def test_socket(self):
+        left, right = socket.socketpair()
+        thread = threading.Thread(target=lambda: (right.sendall(self.data), right.close()))
+        thread.start()
+        try:
+            self.assertEqual(list(self.stream(copy=True).messages(left)), self.values)
+        finally:
+            thread.join()
+            left.close()
+
+    def test_asyncio(self):
+        async def decode():
+            reader = asyncio.StreamReader()
+            reader.feed_data(self.data)
+            reader.feed_eof()
+            return [m async for m in self.stream(copy=True).amessages(reader)]
+        self.assertEqual(asyncio.run(decode()), self.values)
+
+    def test_errors(self):
+        with self.assertRaises(CodecError) as raised:
+            list(self.stream().messages(io.BytesIO(self.data[:-1])))
+        self.assertEqual(str(raised.exception), 'truncated Record')
+        # a prefix beyond the ceiling is rejected before its record is read
+        with self.assertRaises(CodecError) as raised:
+            list(self.stream().messages(io.BytesIO(b'\x16\x03\x03\x01\x2d')))
+        self.assertEqual(str(raised.exception), 'invalid length 301 of Record')
+        with self.assertRaises(CodecError):
+            list(self.stream().messages(io.BytesIO(b'\x17\x03\x03\x00\x00')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+
+from grammar import ExternalEnum, NamedStructure, VariableVectorField
+from rfc_extractor import extract_blocks, iter_definitions, Block
+from rust_compiler import compile_packet_representation
+
+RFC_TEXT = '''\
+6.2.1.  Fragmentation
+
+   The record layer fragments information blocks into TLSPlaintext
+   records carrying data in chunks of 2^14 bytes or less.
+
+      struct {
+          uint8 major;
+          uint8 minor;
+      } ProtocolVersion;
+
+      enum {
+          change_cipher_spec(20), alert(21), handshake(22),
+          application_data(23), (255)
+      } ContentType;
+
+      struct {
+          ContentType type;
+          ProtocolVersion version;
+          uint16 length;
+          opaque fragment[TLSPlaintext.length];
+      } TLSPlaintext;
+
+   type
+      The higher-level protocol used to process the enclosed fragment.
+
+
+
+Dierks & Rescorla           Standards Track                    [Page 19]
+\f
+RFC 5246                          TLS                        August 2008
+
+
+      opaque SessionID<0..32>;   /* a session identifier */
+
+      struct {
+          ProtocolVersion client_version;
+          /* the random
+             structure */
+          Random random;
+          SessionID session_id;
+
+
+
+Dierks & Rescorla           Standards Track                    [Page 20]
+\f
+RFC 5246                          TLS                        August 2008
+
+
+          opaque compression_methods<1..2^8-1>;
+      } ClientHello;
+'''
+
+
+class ExtractBlocksTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_blocks(self):
+        blocks = list(extract_blocks(RFC_TEXT.splitlines(True)))
+
+        self.assertEqual([b.lineno for b in blocks], [6, 11, 16, 34, 36])
+        self.assertEqual(blocks[0], Block(6, '''struct {
+    uint8 major;
+    uint8 minor;
+} ProtocolVersion;'''))
+        self.assertEqual(blocks[3], Block(34, 'opaque SessionID<0..32>;'))
+
+    def test_page_break_and_comments_inside_block(self):
+        blocks = list(extract_blocks(RFC_TEXT.splitlines(True)))
+
+        self.assertEqual(blocks[4].text, '''struct {
+    ProtocolVersion client_version;
+    Random random;
+    SessionID session_id;
+    opaque compression_methods<1..2^8-1>;
+} ClientHello;''')
+
+    def test_lazy(self):
+        def lines():
+            yield '   opaque SessionID<0..32>;\n'
+            raise AssertionError('read past the first definition')
+
+        block = next(extract_blocks(lines()))
+        self.assertEqual(block.text, 'opaque SessionID<0..32>;')
+
+
+    def test_prose(self):
+        blocks = list(extract_blocks([
+            '   the client;\n',
+            '   see 7.4;\n',
+            '   Finished 12;\n',
+            '   uint8 2nd;\n',
+            '      Random random;\n',
+            '      uint16 lengths<0..2^16-1>;\n',
+        ]))
+
+        self.assertEqual([b.text for b in blocks],
+                         ['Random random;', 'uint16 lengths<0..2^16-1>;'])
+
+
+class IterDefinitionsTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_definitions(self):
+        for backend in ['pypeg2', 'fast']:
+            definitions = list(iter_definitions(RFC_TEXT.splitlines(True),
+                                                backend=backend))
+
+            # TLSPlaintext refers to a field in its vector size and is skipped
+            self.assertEqual([type(ast[0]) for _, ast in definitions],
+                             [NamedStructure, ExternalEnum,
+                              VariableVectorField, NamedStructure])
+
+    def test_compile(self):
+        _, ast = list(iter_definitions(RFC_TEXT.splitlines(True)))[-1]
+        expected_code = '''struct ClientHello {
+    client_version: ProtocolVersion,
+    random: Random,
+    session_id: SessionID,
+    compression_methods: Vec<u8>,
+}'''
+        self.assertEqual(expected_code, compile_packet_representation(ast))
+
+    def test_strict(self):
+        with self.assertRaises(SyntaxError) as cm:
+            list(iter_definitions(RFC_TEXT.splitlines(True), backend='fast',
+                                  strict=True))
+
+        self.assertEqual(cm.exception.lineno, 20)
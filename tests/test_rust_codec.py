@@ -0,0 +1,501 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import fast_parser
+from python_codec import Codec
+from rust_codec import (compile_decoders, prefix_width, enum_width, runtime,
+                        GenerationError)
+from ir import lower
+from symbols import SymbolTable
+from benchmarks import codec_throughput
+from benchmarks.specs import rfc5246
+
+HANDSHAKE = '''
+  enum { hello_request(0), client_hello(1), (255) } HandshakeType;
+  struct { } HelloRequest;
+  struct { uint8 major; uint8 minor; } ProtocolVersion;
+  opaque Random[32];
+  opaque SessionID<0..32>;
+  uint8 CipherSuite[2];
+
+  struct {
+      ProtocolVersion client_version;
+      Random random;
+      SessionID session_id;
+      CipherSuite cipher_suites<2..2^16-2>;
+      opaque compression_methods<1..2^8-1>;
+  } ClientHello;
+
+  struct {
+      HandshakeType msg_type;
+      uint24 length;
+      select (HandshakeType) {
+          case hello_request: HelloRequest;
+          case client_hello:  ClientHello;
+      } body;
+  } Handshake;
+'''
+
+FALL_THROUGH = '''
+  enum { a(0), b(1), c(2), d(3), (255) } Kind;
+  struct {
+      Kind kind;
+      select (Kind) {
+          case a: case b: uint16;
+          case c: uint8;
+      } body;
+  } T;
+'''
+
+ENUMS = '''
+  enum { red(3), blue(5), white(7), (255) } Color;
+  enum { a(1), b(300), c(70000) } Suite;
+  enum { sweet, sour } Taste;
+'''
+
+LISTS = '''
+  enum { red(3), blue(5), (255) } Color;
+  struct { Color color; uint8 alpha; } Pixel;
+  opaque Name<1..255>;
+  struct {
+      uint16 suites<2..2^16-2>;
+      uint24 lengths<0..2^8-1>;
+      Pixel pixels<0..2^8-1>;
+      Name names<0..2^8-1>;
+      uint32 pair[8];
+  } Lists;
+'''
+
+
+class RustCodecTest(unittest.TestCase):
+    maxDiff = None
+
+    def test_widths(self):
+        self.assertEqual([prefix_width(c) for c in [32, 255, 256, 2**16 - 2, 2**24]],
+                         [1, 1, 2, 2, 4])
+        color, taste = lower(fast_parser.parse('''
+            enum { red(3), blue(5), white(7) } Color;
+            enum { sweet(1), sour(2), bitter(4), (32000) } Taste;'''))
+        self.assertEqual(enum_width(color), 1)
+        self.assertEqual(enum_width(taste), 2)
+
+    def test_struct(self):
+        code = compile_decoders(fast_parser.parse('''struct {
+            uint8 type;
+            opaque random[32];
+            uint16 lengths<0..2^16-1>;
+        } T;'''))
+
+        self.assertEqual(code, '''#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+#[allow(non_camel_case_types)]
+pub struct T<'a> {
+    pub r#type: u8,
+    pub random: &'a [u8; 32],
+    pub lengths: Uints<'a, u16>,
+}
+
+impl<'a> Parse<'a> for T<'a> {
+    fn parse(input: &'a [u8]) -> Result<(Self, &'a [u8])> {
+        let (type_, input) = read_u8(input)?;
+        let (random_, input) = take_array::<32>(input)?;
+        let (lengths_, input) = take_vector(input, 2, 0, 65535).and_then(|(bytes, input)| Ok((Uints::new(bytes)?, input)))?;
+        Ok((T { r#type: type_, random: random_, lengths: lengths_ }, input))
+    }
+}
+
+impl<'a> T<'a> {
+    pub const MIN_LEN: usize = 35;
+    pub const MAX_LEN: usize = 65570;
+}''')
+
+    def test_lifetimes_follow_references(self):
+        code = compile_decoders(fast_parser.parse(HANDSHAKE))
+
+        self.assertIn('pub struct ProtocolVersion {', code)
+        self.assertIn("pub struct ClientHello<'a> {", code)
+        self.assertIn("pub enum HandshakeVariant<'a> {", code)
+        self.assertIn('    hello_request(HelloRequest),', code)
+
+    def test_fixed_size_encoder(self):
+        code = compile_decoders(fast_parser.parse('''
+            enum { a(1), (2^16-1) } Kind;
+            struct { uint8 major; uint24 length; Kind kind; opaque random[4]; } T;'''),
+            encoders=True)
+
+        self.assertIn('''impl<'a> T<'a> {
+    pub const ENCODED_LEN: usize = 10;
+
+    pub fn encode_array(&self, buf: &mut [u8; 10]) {
+        buf[0] = self.major;
+        buf[1..4].copy_from_slice(&self.length.to_be_bytes()[1..]);
+        self.kind.encode_array((&mut buf[4..6]).try_into().unwrap());
+        buf[6..10].copy_from_slice(self.random);
+    }
+}''', code)
+
+    def test_variable_size_encoder(self):
+        code = compile_decoders(fast_parser.parse(HANDSHAKE), encoders=True)
+
+        self.assertIn('''    fn encoded_len(&self) -> usize {
+        37 + self.session_id.encoded_len() + self.cipher_suites.as_bytes().len() + self.compression_methods.len()
+    }''', code)
+
+    def test_external_selector(self):
+        code = compile_decoders(fast_parser.parse('''
+            enum { a(0), (255) } Kind;
+            struct { select (Kind) { case a: uint8; } body; } T;'''))
+
+        self.assertIn("pub fn parse_with(input: &'a [u8], selector: Kind)", code)
+        self.assertNotIn('Parse<\'a> for T', code)
+
+    def test_variant_dispatch(self):
+        # RFC 5246 4.6.1 requires a case for d
+        with self.assertRaises(GenerationError) as raised:
+            compile_decoders(fast_parser.parse(FALL_THROUGH))
+        self.assertEqual(str(raised.exception), 'select (Kind) of T has no case for d')
+
+        code = compile_decoders(fast_parser.parse(FALL_THROUGH), encoders=True,
+                                partial_variants=True)
+
+        self.assertIn('''        match selector {
+            Kind::a | Kind::b => {
+                let (value, input) = read_u16(input)?;
+                let value = match selector {
+                    Kind::a => TVariant::a(value),
+                    _ => TVariant::b(value),
+                };
+                Ok((value, input))
+            }
+            Kind::c => read_u8(input).map(|(value, input)| (TVariant::c(value), input)),
+            Kind::d => Err(Error::InvalidValue),
+        }''', code)
+        self.assertIn('            TVariant::a(_) | TVariant::b(_) => 2,\n', code)
+        self.assertNotIn('_ => Err', code[code.index('fn parse_select'):])
+
+        # the selector is not known, so the match cannot list its members
+        struct = lower(fast_parser.parse(FALL_THROUGH))[1:]
+        code = compile_decoders(struct, SymbolTable().add(struct))
+        self.assertIn('            _ => Err(Error::InvalidValue),\n', code)
+
+    def test_enum_validation(self):
+        code = compile_decoders(fast_parser.parse(ENUMS))
+
+        self.assertIn("""#[repr(u8)]
+pub enum Color {""", code)
+        self.assertIn("""    const TABLE: [Option<Color>; 5] = [
+        Some(Color::red), None, Some(Color::blue), None, Some(Color::white),
+    ];""", code)
+        self.assertIn('match Self::TABLE.get(value.wrapping_sub(3) as usize) {', code)
+        self.assertIn("""#[repr(u32)]
+pub enum Suite {""", code)
+        self.assertIn("""    const VALUES: [(u32, Suite); 3] = [
+        (1, Suite::a), (300, Suite::b), (70000, Suite::c),
+    ];""", code)
+        self.assertIn('impl TryFrom<u32> for Suite {', code)
+        self.assertIn('let (value, input) = read_u24(input)?;', code)
+        self.assertIn('impl From<Suite> for u32 {', code)
+        # internal enums have no wire format
+        self.assertIn("""#[allow(non_camel_case_types)]
+pub enum Taste {""", code)
+        self.assertNotIn('TryFrom<u8> for Taste', code)
+
+    def test_vector_views(self):
+        code = compile_decoders(fast_parser.parse(LISTS))
+
+        self.assertIn("""    pub suites: Uints<'a, u16>,
+    pub lengths: Uints<'a, U24>,
+    pub pixels: Array<'a, Pixel, 2>,
+    pub names: Vector<'a, Name<'a>>,
+    pub pair: Uints<'a, u32>,""", code)
+        self.assertIn('let (pair_, input) = take(input, 8).and_then('
+                      '|(bytes, input)| Ok((Uints::new(bytes)?, input)))?;', code)
+
+    def test_views(self):
+        code = compile_decoders(fast_parser.parse(HANDSHAKE), views=True)
+
+        # fixed fields are taken at once and have constant offsets
+        self.assertIn("""        let bytes = input;
+        let (_, input) = take(input, 34)?;
+        let (_, input) = take_vector(input, 1, 0, 32)?;
+        let end0 = bytes.len() - input.len();""", code)
+        self.assertIn("""    pub fn session_id(&self) -> Result<SessionID<'a>> {
+        let input = &self.bytes[34..self.ends[0]];""", code)
+        self.assertIn('HandshakeType::client_hello => skip::<ClientHelloView>(input),', code)
+        self.assertNotIn('View', compile_decoders(fast_parser.parse(HANDSHAKE)))
+
+
+@unittest.skipUnless(shutil.which('rustc'), 'rustc is not installed')
+class RustCodecBuildTest(unittest.TestCase):
+    main = r'''
+fn main() {
+    let record: &[u8] = &[
+        1, 0, 0, 45,                        // client_hello, length
+        3, 3,                               // client_version
+        7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+        7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+        2, 0xab, 0xcd,                      // session_id
+        0, 4, 0x13, 0x01, 0xc0, 0x2f,       // cipher_suites
+        1, 0,                               // compression_methods
+        0xff,                               // trailing byte
+    ];
+    let (handshake, rest) = Handshake::parse(record).unwrap();
+    println!("{:?} {} {:?}", handshake.msg_type, handshake.length, rest);
+    if let HandshakeVariant::client_hello(hello) = handshake.body {
+        println!("{:?}", hello.client_version);
+        println!("{:?}", hello.session_id.0);
+        for suite in hello.cipher_suites.iter() {
+            println!("{:?}", suite.unwrap().0);
+        }
+        println!("{:?}", hello.compression_methods);
+    }
+    let mut buf = [0u8; 64];
+    let len = handshake.encode_into(&mut buf).unwrap();
+    println!("{} {}", len == handshake.encoded_len(), &buf[..len] == &record[..len]);
+    println!("{:?}", handshake.encode_into(&mut buf[..20]).err());
+    let mut version = [0u8; ProtocolVersion::ENCODED_LEN];
+    ProtocolVersion { major: 3, minor: 1 }.encode_array(&mut version);
+    println!("{:?}", version);
+    println!("{:?}", SessionID(&[0; 33]).encode_into(&mut buf).err());
+    println!("{:?}", Handshake::parse(&record[..20]).err());
+    println!("{:?}", Handshake::parse(&[7, 0, 0, 0]).err());
+    println!("{:?}", SessionID::parse(&[33]).err());
+}
+'''
+
+    def build(self, spec, main, **kwargs):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'decode.rs')
+        with open(source, 'w') as f:
+            f.write('#![allow(dead_code)]\n')
+            f.write(runtime)
+            f.write(compile_decoders(fast_parser.parse(spec), encoders=True, **kwargs))
+            f.write(main)
+
+        binary = os.path.join(directory, 'decode')
+        subprocess.run(['rustc', '--edition', '2021', '-o', binary, source],
+                       check=True, stderr=subprocess.PIPE)
+        return subprocess.run([binary], check=True, stdout=subprocess.PIPE,
+                              universal_newlines=True).stdout
+
+    def test_decode(self):
+        output = self.build(HANDSHAKE, self.main)
+
+        self.assertEqual(output, '''client_hello 45 [255]
+ProtocolVersion { major: 3, minor: 3 }
+[171, 205]
+[19, 1]
+[192, 47]
+[0]
+true true
+Some(Truncated)
+[3, 1]
+Some(InvalidLength)
+Some(Truncated)
+Some(InvalidValue)
+Some(InvalidLength)
+''')
+
+    def test_variant_dispatch(self):
+        output = self.build(FALL_THROUGH, r'''
+fn main() {
+    for record in [&[0u8, 1, 2][..], &[1, 1, 2], &[2, 9], &[3, 0], &[4, 0]] {
+        match T::parse(record) {
+            Ok((t, _)) => println!("{:?} {:?}", t.body, t.encoded_len()),
+            Err(e) => println!("{:?}", e),
+        }
+    }
+}
+''', partial_variants=True)
+
+        self.assertEqual(output, '''a(258) 3
+b(258) 3
+c(9) 2
+InvalidValue
+InvalidValue
+''')
+
+    def test_rfc5246(self):
+        record = codec_throughput.client_hello(Codec(fast_parser.parse(rfc5246())))
+        output = self.build(rfc5246(), r'''
+fn main() {
+    let record: &[u8] = &[%s];
+    let (handshake, _) = Handshake::parse(record).unwrap();
+    if let HandshakeVariant::client_hello(hello) = handshake.body {
+        println!("{} {}", hello.cipher_suites.len(), hello.extensions.iter().count());
+    }
+    let mut buf = [0u8; %d];
+    println!("{:?} {}", handshake.encode_into(&mut buf), &buf[..] == record);
+    let (view, _) = HandshakeView::parse(record).unwrap();
+    println!("{}", view.body() == Ok(handshake.body));
+    // the internal enums of SecurityParameters have no wire format
+    println!("{:?}", SecurityParameters::parse(&[0; 200]).err());
+}
+''' % (', '.join(map(str, record)), len(record)), views=True)
+
+        self.assertEqual(output, '''16 4
+Ok(%d) true
+true
+Some(NoWireFormat)
+''' % len(record))
+
+    def test_enum_validation(self):
+        output = self.build(ENUMS, r'''
+fn main() {
+    for value in [0u8, 3, 4, 5, 7, 8, 255] {
+        println!("{:?}", Color::try_from(value));
+    }
+    for value in [0u32, 1, 300, 301, 70000] {
+        println!("{:?}", Suite::try_from(value));
+    }
+    println!("{:?}", Suite::parse(&[1, 0x11, 0x70, 9]));
+    println!("{} {}", u8::from(Color::white), u32::from(Suite::b));
+}
+''')
+
+        self.assertEqual(output, '''Err(InvalidValue)
+Ok(red)
+Err(InvalidValue)
+Ok(blue)
+Ok(white)
+Err(InvalidValue)
+Err(InvalidValue)
+Err(InvalidValue)
+Ok(a)
+Ok(b)
+Err(InvalidValue)
+Ok(c)
+Ok((c, [9]))
+7 300
+''')
+
+    def test_vector_views(self):
+        output = self.build(LISTS, r'''
+fn main() {
+    let record: &[u8] = &[
+        0, 4, 0x13, 0x01, 0xc0, 0x2f,       // suites
+        6, 0, 0, 1, 1, 0, 0,                // lengths
+        4, 3, 255, 5, 128,                  // pixels
+        5, 1, 0x61, 2, 0x62, 0x63,          // names
+        0, 0, 0, 1, 0xff, 0xff, 0xff, 0xff, // pair
+    ];
+    let (lists, rest) = Lists::parse(record).unwrap();
+    println!("{} {:?} {:?}", lists.suites.len(), lists.suites.get(1), lists.suites.get(2));
+    println!("{:?}", lists.suites.iter().collect::<Vec<_>>());
+    println!("{:?}", lists.lengths.iter().map(|l| l.0).collect::<Vec<_>>());
+    println!("{} {:?}", lists.pixels.len(), lists.pixels.get(1));
+    println!("{}", lists.names.iter().count());
+    println!("{:?} {:?}", lists.pair.iter().collect::<Vec<_>>(), rest);
+    // a length that is not a whole number of elements
+    println!("{:?}", Lists::parse(&[0, 3, 0, 1, 2]).err());
+    println!("{:?}", Lists::parse(&[0, 2, 0, 1, 1, 0]).err());
+    println!("{:?}", Array::<Pixel, 2>::new(&[4]).err());
+    // elements are only validated when they are read
+    println!("{:?}", Array::<Pixel, 2>::new(&[4, 0]).unwrap().get(0));
+}
+''')
+
+        self.assertEqual(output, '''2 Some(49199) None
+[4865, 49199]
+[1, 65536]
+2 Some(Ok(Pixel { color: blue, alpha: 128 }))
+2
+[1, 4294967295] []
+Some(InvalidLength)
+Some(InvalidLength)
+Some(InvalidLength)
+Some(Err(InvalidValue))
+''')
+
+    def test_views(self):
+        output = self.build(HANDSHAKE, r'''
+fn main() {
+    let record: &[u8] = &[
+        1, 0, 0, 45,                        // client_hello, length
+        3, 3,                               // client_version
+        7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+        7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+        2, 0xab, 0xcd,                      // session_id
+        0, 4, 0x13, 0x01, 0xc0, 0x2f,       // cipher_suites
+        1, 0,                               // compression_methods
+        0xff,                               // trailing byte
+    ];
+    let (handshake, _) = Handshake::parse(record).unwrap();
+    let (view, rest) = HandshakeView::parse(record).unwrap();
+    println!("{} {:?}", view.as_bytes().len(), rest);
+    println!("{} {}", view.msg_type() == Ok(handshake.msg_type),
+             view.length() == Ok(handshake.length));
+    println!("{}", view.body() == Ok(handshake.body));
+    if let HandshakeVariant::client_hello(hello) = handshake.body {
+        let (view, _) = ClientHelloView::parse(view.body_bytes()).unwrap();
+        println!("{} {} {}", view.client_version() == Ok(hello.client_version),
+                 view.random() == Ok(hello.random),
+                 view.session_id() == Ok(hello.session_id));
+        println!("{} {}", view.cipher_suites() == Ok(hello.cipher_suites),
+                 view.compression_methods() == Ok(hello.compression_methods));
+    }
+    println!("{:?}", HandshakeView::parse(&record[..20]).err());
+    println!("{:?}", HandshakeView::parse(&[7, 0, 0, 0]).err());
+}
+''', views=True)
+
+        self.assertEqual(output, '''49 [255]
+true true
+true
+true true true
+true true
+Some(Truncated)
+Some(InvalidValue)
+''')
+
+    def test_lazy_validation(self):
+        output = self.build(LISTS, r'''
+fn main() {
+    let record: &[u8] = &[
+        0, 4, 0x13, 0x01, 0xc0, 0x2f,       // suites
+        6, 0, 0, 1, 1, 0, 0,                // lengths
+        4, 3, 255, 5, 128,                  // pixels
+        5, 1, 0x61, 2, 0x62, 0x63,          // names
+        0, 0, 0, 1, 0xff, 0xff, 0xff, 0xff, // pair
+    ];
+    let (lists, _) = Lists::parse(record).unwrap();
+    let (view, rest) = ListsView::parse(record).unwrap();
+    println!("{} {:?}", view.as_bytes() == record, rest);
+    println!("{} {} {}", view.suites() == Ok(lists.suites),
+             view.lengths() == Ok(lists.lengths), view.pixels() == Ok(lists.pixels));
+    println!("{} {}", view.names() == Ok(lists.names), view.pair() == Ok(lists.pair));
+    // suites is not a whole number of elements, which only its accessor checks
+    let record: &[u8] = &[0, 3, 0, 1, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0];
+    println!("{:?}", Lists::parse(record).err());
+    let (view, _) = ListsView::parse(record).unwrap();
+    println!("{:?} {:?}", view.suites().err(), view.pair().map(|pair| pair.len()));
+}
+''', views=True)
+
+        self.assertEqual(output, '''true []
+true true true
+true true
+Some(InvalidLength)
+Some(InvalidLength) Ok(2)
+''')
+
+    def test_constant_vectors(self):
+        output = self.build('''
+            uint16 Pair[4];
+            struct { uint16 suites[4]; Pair pair; uint8 tag; } Fixed;''', r'''
+fn main() {
+    let record: &[u8] = &[0x13, 0x01, 0xc0, 0x2f, 0, 1, 0, 2, 9];
+    let (fixed, rest) = Fixed::parse(record).unwrap();
+    println!("{} {} {:?}", Fixed::ENCODED_LEN, Pair::ENCODED_LEN, rest);
+    let mut buf = [0u8; Fixed::ENCODED_LEN];
+    fixed.encode_array(&mut buf);
+    println!("{}", &buf[..] == record);
+}
+''')
+
+        self.assertEqual(output, '''9 4 []
+true
+''')
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 import pypeg2
@@ -5,7 +6,10 @@ import pypeg2
 from tests.parser_test import recursive_to_dict
 
 from grammar import Definitions
-from rust_compiler import compile_packet_representation
+from ir import lower
+from rust_compiler import compile_packet_representation, \
+                          write_packet_representation, compile_definition, \
+                          join_definitions
 
 class RustCompilerTest(unittest.TestCase):
     maxDiff = None
@@ -238,3 +242,49 @@ struct UserType {
 
         self.assertEqual(expected_code, actual_code)
 
+
+
+    def test_unnamed_struct_with_one_field(self):
+        input_code = '''struct {
+              uint8 field1;
+              struct {
+                uint16 field2;
+              };
+          } UserType;
+        '''
+        expected_code = '''struct UserTypeContainer {
+    field2: u16,
+}
+
+struct UserType {
+    field1: u8,
+    container: UserTypeContainer,
+}'''
+
+        ast = pypeg2.parse(input_code, Definitions)
+        actual_code = compile_packet_representation(ast)
+
+        self.assertEqual(expected_code, actual_code)
+
+
+    def test_write_packet_representation(self):
+        input_code = '''
+          enum { red(3), blue(5) } Color;
+          opaque Datum[3];
+          stream-ciphered struct {
+              uint8 field1;
+              digitally-signed struct {
+                uint8 field3<0..255>;
+              };
+          } UserType;
+        '''
+        ast = pypeg2.parse(input_code, Definitions)
+        out = io.StringIO()
+        write_packet_representation(ast, out)
+
+        self.assertEqual(compile_packet_representation(ast), out.getvalue())
+        self.assertTrue(out.getvalue().startswith('struct UserTypeSigned {'))
+        self.assertTrue(out.getvalue().endswith('Datum: u8[3]'))
+        self.assertEqual(join_definitions([compile_definition(d)
+                                           for d in lower(ast)]),
+                         out.getvalue())
@@ -0,0 +1,49 @@
+import unittest
+
+import fast_parser
+from rust_compiler import compile_packet_representation
+from session import Compiler
+from tests.test_incremental import SPEC
+
+
+class CompilerTest(unittest.TestCase):
+    def test_same_code(self):
+        compiler = Compiler('fast')
+        result = compiler.compile(SPEC)
+        self.assertIsNone(result.error)
+        self.assertEqual(result.code,
+                         compile_packet_representation(fast_parser.parse(SPEC)))
+        self.assertEqual([n.name for n in result.ir],
+                         ['Color', 'SessionID', 'Paint', 'Picture', 'Frame'])
+
+    def test_definitions_are_reused(self):
+        compiler = Compiler('fast')
+        changed = SPEC.replace('uint16 width', 'uint32 width')
+        results = list(compiler.compile_many([SPEC, changed, SPEC]))
+
+        self.assertEqual(compiler.misses, 6)
+        self.assertEqual(compiler.hits, 9)
+        self.assertEqual(results[0], results[2])
+        self.assertIn('width: u32', results[1].code)
+
+    def test_max_definitions(self):
+        compiler = Compiler('pypeg2', max_definitions=2)
+        compiler.compile(SPEC)
+        compiler.compile(SPEC)
+        self.assertEqual(compiler.hits, 0)
+        self.assertEqual(compiler.misses, 10)
+
+    def test_syntax_error(self):
+        compiler = Compiler('fast')
+        broken = SPEC + '\nstruct { uint8 a; } T'
+        results = list(compiler.compile_many([broken, SPEC]))
+
+        self.assertIsInstance(results[0].error, SyntaxError)
+        self.assertEqual(results[0].error.lineno, 23)
+        self.assertIsNone(results[1].error)
+        with self.assertRaises(SyntaxError):
+            compiler.compile(broken)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import fast_parser
+from ir import EnumDef, StructDef
+from symbols import SymbolTable, Problem
+from tests import test_fast_parser
+
+HANDSHAKE = '''
+  enum { hello_request(0), client_hello(1), (255) } HandshakeType;
+  struct { } HelloRequest;
+  struct {
+      uint8 random[32];
+      struct { uint8 a; } Nested;
+  } ClientHello;
+'''
+
+
+class SymbolTableTest(unittest.TestCase):
+    maxDiff = None
+
+    def setUp(self):
+        self.table = SymbolTable()
+        self.table.add(fast_parser.parse(test_fast_parser.FastParserTest.code),
+                       'a.spec')
+
+    def test_lookup(self):
+        self.assertEqual(sorted(d.name for d in self.table),
+                         ['Amount', 'Color', 'Data', 'Datum', 'Handshake',
+                          'Taste', 'UserType', 'longer'])
+        self.assertIs(type(self.table['Color'].node), EnumDef)
+        self.assertEqual(self.table['Color'].members,
+                         {'red': 3, 'blue': 5, 'white': 7})
+        self.assertEqual(self.table['Datum'].filename, 'a.spec')
+        self.assertIn('uint8', self.table)
+        self.assertNotIn('HandshakeType', self.table)
+        self.assertIsNone(self.table.enum('Handshake'))
+
+    def test_undefined(self):
+        self.assertEqual([str(p) for p in self.table.check()], [
+            'a.spec: Handshake: undefined type HandshakeType',
+            'a.spec: Handshake: select (HandshakeType) is not an enum',
+            'a.spec: Handshake: undefined type HelloRequest',
+            'a.spec: Handshake: undefined type ClientHello',
+            'a.spec: Handshake: undefined type V2',
+        ])
+
+    def test_across_files(self):
+        self.table.add(fast_parser.parse(HANDSHAKE), 'b.spec')
+
+        self.assertIs(type(self.table['Nested'].node), StructDef)
+        self.assertEqual(self.table.check(), [
+            Problem('a.spec', 'Handshake', 'orange is not a member of HandshakeType'),
+            Problem('a.spec', 'Handshake', 'banana is not a member of HandshakeType'),
+            Problem('a.spec', 'Handshake', 'undefined type V2'),
+        ])
+
+    def test_nested_enum(self):
+        table = SymbolTable().add(fast_parser.parse('''
+            struct {
+                enum { a(0), b(1), (255) } Kind;
+                Kind kind;
+                select (Kind) { case a: uint8; case b: uint16; } body;
+            } T;'''), 'c.spec')
+
+        self.assertEqual(table.enum('Kind').members, {'a': 0, 'b': 1})
+        self.assertEqual(table['Kind'].filename, 'c.spec')
+        self.assertEqual(table.check(), [])
+
+    def test_conflicts(self):
+        self.table.add(fast_parser.parse('opaque Datum[3]; opaque Data[8];'),
+                       'b.spec')
+
+        self.assertEqual(self.table['Data'].filename, 'a.spec')
+        self.assertEqual(self.table.check()[-1],
+                         Problem('b.spec', 'Data', 'redefinition of Data from a.spec'))
+
+    def test_missing_case(self):
+        table = SymbolTable().add(fast_parser.parse('''
+            enum { a(0), b(1), c(2), d(3), (255) } Kind;
+            struct { select (Kind) { case a: case c: uint8; } body; } T;'''))
+
+        self.assertEqual(table.check(), [
+            Problem(None, 'T', 'select (Kind) has no case for b, d'),
+        ])
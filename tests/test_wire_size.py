@@ -0,0 +1,85 @@
+import unittest
+
+import fast_parser
+from symbols import SymbolTable
+from wire_size import WireSizes, Size, report
+from tests.test_rust_codec import HANDSHAKE
+
+
+class WireSizesTest(unittest.TestCase):
+    maxDiff = None
+
+    def sizes(self, code):
+        return WireSizes(SymbolTable().add(fast_parser.parse(code)))
+
+    def test_rfc_examples(self):
+        sizes = self.sizes('''
+            enum { red(3), blue(5), white(7) } Color;
+            enum { sweet(1), sour(2), bitter(4), (32000) } Taste;
+            opaque Datum[3];
+            Datum Data[9];
+            uint16 longer<0..800>;
+            opaque mandatory<300..400>;''')
+
+        self.assertEqual(sizes.type_size('Color'), Size(1, 1))
+        self.assertEqual(sizes.type_size('Taste'), Size(2, 2))
+        self.assertEqual(sizes.type_size('Data'), Size(9, 9))
+        self.assertEqual(sizes.type_size('longer'), Size(2, 802))
+        self.assertEqual(sizes.type_size('mandatory'), Size(302, 402))
+        self.assertTrue(sizes.type_size('Data').fixed)
+        self.assertFalse(sizes.type_size('longer').fixed)
+
+    def test_structures(self):
+        sizes = self.sizes(HANDSHAKE)
+
+        self.assertEqual(sizes.type_size('ProtocolVersion'), Size(2, 2))
+        self.assertEqual(sizes.type_size('ClientHello'),
+                         Size(2 + 32 + 1 + 4 + 2, 2 + 32 + 33 + 65536 + 256))
+        self.assertEqual(sizes.type_size('Handshake'),
+                         Size(4, 4 + sizes.type_size('ClientHello').max))
+
+    def test_nested_enum(self):
+        sizes = self.sizes('''
+            struct {
+                enum { a(0), b(1), (255) } Kind;
+                Kind kind;
+                select (Kind) { case a: uint8; case b: uint16; } body;
+            } T;''')
+
+        # the declaration of Kind takes no room
+        self.assertEqual(sizes.type_size('T'), Size(2, 3))
+
+    def test_unbounded(self):
+        sizes = self.sizes('''
+            struct { uint8 a; stream-ciphered struct { uint8 b; }; } Record;
+            struct { uint8 a; digitally-signed struct { uint8 b; }; } Signed;
+            struct { uint8 a; Undefined b; } T;
+            struct { uint8 a; Recursive b; } Recursive;''')
+
+        self.assertEqual(sizes.type_size('Record'), Size(1, None))
+        self.assertEqual(sizes.type_size('Signed'), Size(5, 65540))
+        self.assertEqual(sizes.type_size('T'), Size(1, None))
+        self.assertEqual(sizes.type_size('Recursive'), Size(1, None))
+
+    def test_mutual_references(self):
+        sizes = self.sizes('''
+            struct { uint8 tag; B b; } A;
+            struct { uint16 length; A a; } B;''')
+
+        self.assertEqual(sizes.type_size('A'), Size(3, None))
+        # B was sized while A was, but is not left at that size
+        self.assertEqual(sizes.type_size('B'), Size(5, None))
+
+    def test_report(self):
+        entries = report(SymbolTable().add(fast_parser.parse(HANDSHAKE), 'a.spec'))
+
+        self.assertEqual(list(entries), [
+            'CipherSuite', 'ClientHello', 'HandshakeVariant', 'Handshake',
+            'HandshakeType', 'HelloRequest', 'ProtocolVersion', 'Random',
+            'SessionID'])
+        self.assertEqual(entries['HandshakeType'], {
+            'kind': 'enum', 'min': 1, 'max': 1, 'fixed': True, 'file': 'a.spec'})
+        self.assertEqual(entries['HandshakeVariant']['cases']['hello_request'],
+                         {'min': 0, 'max': 0})
+        self.assertEqual(entries['ClientHello']['fields']['session_id'],
+                         {'min': 1, 'max': 33})
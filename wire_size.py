@@ -0,0 +1,192 @@
+'''
+Static bounds of the encoded size of every type of a specification.
+
+    sizes = WireSizes(table)
+    sizes.type_size('ClientHello')    # Size(min=41, max=65615)
+    json.dump(report(table), f)
+
+The sizes follow RFC 5246: scalars from implicit_types, a constant vector
+T v[n] has n bytes, a variable vector T v<floor..ceiling> a length prefix
+as wide as the ceiling needs plus floor to ceiling bytes (section 4.3),
+and an enum is as wide as its width or its largest value (4.5). A
+structure is the sum of its fields and a variant as small as its smallest
+and as large as its largest case. Cryptographically protected structures
+are encoded the way rust_codec reads them.
+
+max is None if the size is not bounded: a ciphered structure extends to
+the end of its record, and the size of undefined and recursive types is
+not known.
+'''
+import collections
+
+from ir import StructDef, EnumDef, FieldDef, VectorField
+from rust_compiler import implicit_types, typename, fieldname
+
+
+class Size(collections.namedtuple('Size', ['min', 'max'])):
+    __slots__ = ()
+
+    @property
+    def fixed(self):
+        return self.min == self.max
+
+    def __add__(self, other):
+        return Size(self.min + other.min,
+                    None if None in (self.max, other.max) else self.max + other.max)
+
+
+unknown = Size(0, None)
+
+# see rust_codec
+cryptographic_sizes = {
+    'digitally-signed': Size(4, 4 + 2**16 - 1),
+    'public-key-encrypted': Size(2, 2 + 2**16 - 1),
+    'stream-ciphered': unknown,
+    'block-ciphered': unknown,
+    'aead-ciphered': unknown,
+}
+
+
+def prefix_width(ceiling):
+    '''The number of bytes of the length prefix of a vector, RFC 5246 4.3.'''
+    width = 1
+    while ceiling >= 1 << (8 * width):
+        width += 1
+    return width
+
+
+def enum_width(enum):
+    '''The number of bytes of an enum, RFC 5246 4.5.'''
+    largest = enum.width
+    if largest is None:
+        largest = max([m.value for m in enum.members] + [0])
+    return prefix_width(largest)
+
+
+class WireSizes(object):
+    def __init__(self, table):
+        self.table = table
+        self._sizes = {}
+        # the types being sized, and the index in it of the outermost one
+        # reached again through a cycle
+        self._sizing = []
+        self._cycle = 0
+
+    def type_size(self, name):
+        '''The Size of the type called name.'''
+        if name in implicit_types:
+            size = implicit_types[name]['size']
+            return Size(size, size)
+        if name in self._sizes:
+            return self._sizes[name]
+        if name in self._sizing:
+            # a type containing itself is unknown while it is being sized
+            self._cycle = min(self._cycle, self._sizing.index(name))
+            return unknown
+
+        depth = len(self._sizing)
+        outer, self._cycle = self._cycle, depth
+        self._sizing.append(name)
+        size = unknown
+        definition = self.table.get(name)
+        if definition is not None:
+            node = definition.node
+            if type(node) is StructDef:
+                # a reference by name is to the plaintext structure
+                size = self.structure_size(node)
+            else:
+                size = self.node_size(node)
+        self._sizing.pop()
+        # a size that took that of an enclosing type as unknown is
+        # understated, it is computed again once that type is sized
+        if self._cycle >= depth:
+            self._sizes[name] = size
+        self._cycle = min(outer, self._cycle)
+        return size
+
+    def node_size(self, node):
+        '''The Size of a field, enum or structure of the IR.'''
+        typ = type(node)
+        if typ is FieldDef:
+            return self.type_size(node.type)
+        elif typ is VectorField:
+            if not node.variable:
+                return Size(node.size, node.size)
+            width = prefix_width(node.ceiling)
+            return Size(width + node.floor, width + node.ceiling)
+        elif typ is EnumDef:
+            if not node.external:
+                return unknown
+            width = enum_width(node)
+            return Size(width, width)
+        elif node.cryptographic_attribute is not None:
+            return cryptographic_sizes[node.cryptographic_attribute]
+        return self.structure_size(node)
+
+    def structure_size(self, node):
+        '''The Size of the plaintext of a structure.'''
+        size = Size(0, 0)
+        for field in node.encoded_fields:
+            size += self.node_size(field)
+        if node.variant is not None:
+            size += self.variant_size(node.variant)
+        return size
+
+    def variant_size(self, variant):
+        sizes = [self.type_size(c.type) for c in variant.cases]
+        if not sizes:
+            return Size(0, 0)
+        maxima = [s.max for s in sizes]
+        return Size(min(s.min for s in sizes),
+                    None if None in maxima else max(maxima))
+
+
+def _entry(kind, size, **extra):
+    entry = collections.OrderedDict([('kind', kind), ('min', size.min),
+                                     ('max', size.max), ('fixed', size.fixed)])
+    entry.update(extra)
+    return entry
+
+
+def report(table, sizes=None):
+    '''The sizes of all types in table, and of the nested structures and
+    variants they declare, as a dict of JSON serializable entries keyed by
+    the Rust type name.'''
+    if sizes is None:
+        sizes = WireSizes(table)
+    entries = collections.OrderedDict()
+
+    def bounds(size):
+        return collections.OrderedDict([('min', size.min), ('max', size.max)])
+
+    def structure(node, name, filename):
+        fields = collections.OrderedDict()
+        for field in node.encoded_fields:
+            if type(field) is StructDef:
+                structure(field, typename(field, node, with_crypto_attr=False),
+                          filename)
+            fields[fieldname(field)] = bounds(sizes.node_size(field))
+        if node.variant is not None:
+            size = sizes.variant_size(node.variant)
+            entries['{}Variant'.format(name)] = _entry(
+                'variant', size, file=filename,
+                cases=collections.OrderedDict(
+                    (label, bounds(sizes.type_size(case.type)))
+                    for case in node.variant.cases for label in case.labels))
+        entries[name] = _entry('struct', sizes.structure_size(node),
+                               file=filename, fields=fields)
+
+    for definition in sorted(table, key=lambda d: d.name):
+        node = definition.node
+        typ = type(node)
+        if typ is StructDef:
+            structure(node, definition.name, definition.filename)
+        elif typ is EnumDef:
+            if node.external:
+                entries[definition.name] = _entry('enum', sizes.node_size(node),
+                                                  file=definition.filename)
+        else:
+            kind = 'vector' if typ is VectorField else 'alias'
+            entries[definition.name] = _entry(kind, sizes.node_size(node),
+                                              file=definition.filename)
+    return entries